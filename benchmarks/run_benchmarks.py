@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+"""
+Offline benchmarks for the hot paths of the ACE send pipeline.
+
+Every benchmark runs against the test templates and in-memory
+:class:`~edx_ace.test_utils.StubChannel` instances, so nothing leaves the
+machine. For each benchmark this reports throughput, p50/p99 latency per
+operation and peak memory allocated while running, and compares the
+throughput with a baseline saved on the same machine, if there is one.
+
+Usage::
+
+    # Run everything, and compare against benchmarks/baseline.json if it has been saved
+    python benchmarks/run_benchmarks.py
+
+    # Only run some benchmarks, with more iterations
+    python benchmarks/run_benchmarks.py --iterations 10000 render_email send
+
+    # Record the current results as the new baseline
+    python benchmarks/run_benchmarks.py --save-baseline
+
+Baselines are machine specific, so none is committed: record one on the machine you compare on. Until then,
+runs only report their results.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from django.test import override_settings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_settings')
+
+import django  # pylint: disable=wrong-import-position
+
+django.setup()
+
+# pylint: disable=wrong-import-position
+from edx_ace import ace, presentation
+from edx_ace.channel import ChannelMap, ChannelType, get_channel_for_message
+from edx_ace.message import Message, MessageType
+from edx_ace.recipient import Recipient
+from edx_ace.test_utils import StubChannel
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+DEFAULT_ITERATIONS = 2000
+DEFAULT_TOLERANCE = 0.2
+MEMORY_ITERATIONS = 200
+RENDER_MANY_BATCH_SIZE = 256
+
+BENCHMARKS = {}
+
+CONTEXT = {
+    'course_name': 'Demonstration Course',
+    'course_url': 'https://example.com/courses/demo',
+    'items': [f'Unit {i}' for i in range(20)],
+}
+
+
+def benchmark(name, scale=1.0):
+    """
+    Register a benchmark.
+
+    The decorated function receives an :class:`~contextlib.ExitStack` for any patches it needs and
+    returns the operation to time, a callable taking the iteration number. ``scale`` adjusts the
+    number of iterations for slow operations.
+    """
+    def register(func):
+        BENCHMARKS[name] = (func, scale)
+        return func
+    return register
+
+
+def make_message(index, **kwargs):
+    return Message(
+        app_label='testapp',
+        name='testmessage',
+        recipient=Recipient(lms_user_id=index, email_address=f'learner{index}@example.com'),
+        context=dict(CONTEXT),
+        **kwargs
+    )
+
+
+def use_channels(stack, *channels):
+    """
+    Route all messages to the given stub channels and disable policies.
+    """
+    channel_map = ChannelMap([
+        [f'stub_{channel.channel_type}', channel]
+        for channel in channels
+    ])
+    # Plain functions rather than mocks, so that recorded calls don't skew time and memory.
+    stack.enter_context(patch('edx_ace.channel.channels', new=lambda: channel_map))
+    stack.enter_context(patch('edx_ace.policy.policies', new=lambda: []))
+
+
+@benchmark('message_construction')
+def bench_message_construction(_stack):
+    return make_message
+
+
+@benchmark('personalize')
+def bench_personalize(_stack):
+    msg_type = MessageType(app_label='testapp', name='testmessage', context=dict(CONTEXT))
+
+    def run(index):
+        msg_type.personalize(Recipient(lms_user_id=index), 'en', {'first_name': 'Learner'})
+    return run
+
+
+@benchmark('serialize')
+def bench_serialize(_stack):
+    msg = make_message(1)
+    return lambda _index: str(msg)
+
+
+@benchmark('deserialize')
+def bench_deserialize(_stack):
+    serialized = str(make_message(1))
+    return lambda _index: Message.from_string(serialized)
+
+
+@benchmark('render_email')
+def bench_render_email(_stack):
+    channel = StubChannel()
+    msg = make_message(1)
+    return lambda _index: presentation.render(channel, msg)
+
+
+@benchmark('render_email_single')
+def bench_render_email_single(_stack):
+    channel = StubChannel()
+    msg = make_message(1)
+    msg.name = 'singlemessage'
+    return lambda _index: presentation.render(channel, msg)
+
+
+def use_template_engine(stack, engine):
+    """
+    Render the benchmark templates (which both engines understand) with the given template engine.
+    """
+    templates_dir = os.path.join(BENCHMARKS_DIR, 'templates')
+    stack.enter_context(override_settings(
+        TEMPLATES=[
+            {
+                'NAME': 'django',
+                'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                'DIRS': [templates_dir],
+            },
+            {
+                'NAME': 'jinja2',
+                'BACKEND': 'django.template.backends.jinja2.Jinja2',
+                'DIRS': [templates_dir],
+                'OPTIONS': {'environment': 'edx_ace.jinja2_environment.environment'},
+            },
+        ],
+        ACE_TEMPLATE_ENGINE=engine,
+    ))
+
+
+def bench_render_digest(stack, engine):
+    use_template_engine(stack, engine)
+    channel = StubChannel()
+    msg = make_message(1)
+    msg.app_label = 'benchapp'
+    msg.name = 'digest'
+    return lambda _index: presentation.render(channel, msg)
+
+
+@benchmark('render_digest_django')
+def bench_render_digest_django(stack):
+    return bench_render_digest(stack, 'django')
+
+
+@benchmark('render_digest_jinja2')
+def bench_render_digest_jinja2(stack):
+    return bench_render_digest(stack, 'jinja2')
+
+
+@benchmark('render_many_digest', scale=0.01)
+def bench_render_many_digest(stack):
+    """
+    Render batches of messages with one render process per core (in process on a single core machine).
+    """
+    use_template_engine(stack, 'django')
+    stack.enter_context(override_settings(ACE_RENDER_PROCESSES=os.cpu_count()))
+    channel = StubChannel()
+    batch = []
+    for index in range(RENDER_MANY_BATCH_SIZE):
+        msg = make_message(index)
+        msg.app_label = 'benchapp'
+        msg.name = 'digest'
+        batch.append((channel, msg))
+    return lambda _index: presentation.render_many(batch)
+
+
+@benchmark('get_channel_for_message')
+def bench_get_channel_for_message(stack):
+    use_channels(stack, StubChannel())
+    msg = make_message(1)
+    return lambda _index: get_channel_for_message(ChannelType.EMAIL, msg)
+
+
+@benchmark('send')
+def bench_send(stack):
+    use_channels(stack, StubChannel())
+    return lambda index: ace.send(make_message(index))
+
+
+@benchmark('send_many')
+def bench_send_many(stack):
+    use_channels(stack, StubChannel())
+    results = ace.send_many(make_message(index) for index in range(sys.maxsize))
+    return lambda _index: next(results)
+
+
+@benchmark('send_with_latency', scale=0.1)
+def bench_send_with_latency(stack):
+    use_channels(stack, StubChannel(latency=0.002))
+    return lambda index: ace.send(make_message(index))
+
+
+@benchmark('send_with_rate_limits', scale=0.25)
+def bench_send_with_rate_limits(stack):
+    use_channels(stack, StubChannel(rate_limit_every=10, retry_delay=0.002))
+    return lambda index: ace.send(make_message(index))
+
+
+def percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_benchmark(name, iterations):
+    """
+    Time ``iterations`` operations of a benchmark, then measure its peak memory separately.
+
+    Returns:
+        dict: The results of the benchmark.
+    """
+    func, scale = BENCHMARKS[name]
+    iterations = max(10, int(iterations * scale))
+
+    with ExitStack() as stack:
+        operation = func(stack)
+        for index in range(max(1, iterations // 10)):
+            operation(index)
+
+        durations = []
+        for index in range(iterations):
+            start = time.perf_counter()
+            operation(index)
+            durations.append(time.perf_counter() - start)
+
+    with ExitStack() as stack:
+        operation = func(stack)
+        tracemalloc.start()
+        for index in range(min(iterations, MEMORY_ITERATIONS)):
+            operation(index)
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    durations.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / sum(durations), 1),
+        'p50_us': round(percentile(durations, 50) * 1e6, 1),
+        'p99_us': round(percentile(durations, 99) * 1e6, 1),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def compare(result, baseline, tolerance):
+    """
+    Returns: tuple
+        The relative change in throughput against the baseline (or None), and whether it is a regression.
+    """
+    if not baseline:
+        return None, False
+    change = result['ops_per_sec'] / baseline['ops_per_sec'] - 1
+    return change, change < -tolerance
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help=f'Benchmarks to run (default: all). One of: {", ".join(BENCHMARKS)}')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Path of the baseline JSON file.')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Fractional throughput drop that counts as a regression (default: %(default)s).')
+    args = parser.parse_args(argv)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'Unknown benchmarks: {", ".join(sorted(unknown))}')
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baselines = json.load(baseline_file)
+
+    print(f'{"benchmark":<24} {"ops/sec":>12} {"p50 (us)":>10} {"p99 (us)":>10} {"peak KiB":>10} {"vs baseline":>12}')
+    results = {}
+    regressions = []
+    for name in args.benchmarks or BENCHMARKS:
+        result = results[name] = run_benchmark(name, args.iterations)
+        change, regressed = compare(result, baselines.get(name), args.tolerance)
+        if regressed:
+            regressions.append(name)
+        print(
+            f'{name:<24} {result["ops_per_sec"]:>12.1f} {result["p50_us"]:>10.1f} {result["p99_us"]:>10.1f} '
+            f'{result["peak_kib"]:>10.1f} '
+            f'{"n/a" if change is None else f"{change:+.1%}":>12}{"  REGRESSION" if regressed else ""}'
+        )
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f'Saved baseline to {args.baseline}')
+    elif regressions:
+        print(f'Throughput regressed by more than {args.tolerance:.0%}: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    sys.exit(main())
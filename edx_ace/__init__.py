@@ -6,23 +6,26 @@ sending messages to users.
 ACE.
 """
 
-from .ace import send
+from .ace import asend, send, send_many
 from .channel import Channel, ChannelType
 from .message import Message, MessageType
 from .policy import Policy, PolicyResult
 from .recipient import Recipient
-from .recipient_resolver import RecipientResolver
+from .recipient_resolver import RecipientResolver, StreamingRecipientResolver
 
 __version__ = '1.15.0'
 
 
 __all__ = [
     'send',
+    'asend',
+    'send_many',
     '__version__',
     'Message',
     'MessageType',
     'Recipient',
     'RecipientResolver',
+    'StreamingRecipientResolver',
     'ChannelType',
     'Channel',
     'Policy',
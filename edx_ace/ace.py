@@ -19,16 +19,101 @@ Usage:
     )
     ace.send(msg)
 """
+import asyncio
+import contextvars
+import itertools
 import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from enum import Enum
 
+import attr
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
 from django.template import TemplateDoesNotExist
+from django.utils import translation
 
-from edx_ace import delivery, policy, presentation
-from edx_ace.channel import get_channel_for_message
-from edx_ace.errors import ChannelError, UnsupportedChannelError
+from edx_ace import circuitbreaker, delivery, outbox, policy, presentation
+from edx_ace.channel import get_channel_for_message, get_channels_for_message
+from edx_ace.channel.django_email import SharedConnection
+from edx_ace.errors import ChannelError, CircuitOpenError, RenderTimeBudgetExceeded, UnsupportedChannelError
+from edx_ace.monitoring import DRY_RUN_REPORT, DryRunReport, time_stage
+from edx_ace.utils.once import once
 
 log = logging.getLogger(__name__)
 
+DEFAULT_CHANNEL_FANOUT_WORKERS = 4
+DEFAULT_SEND_MANY_LANGUAGE_WINDOW = 1
+RENDER_WINDOW_PER_PROCESS = 16
+
+
+class SendOutcome(Enum):
+    """
+    The outcome of sending a :class:`.Message` over a single channel.
+    """
+
+    DELIVERED = 'delivered'
+    EXPIRED = 'expired'
+    RETRY_SCHEDULED = 'retry_scheduled'
+    SKIPPED = 'skipped'
+    UNSUPPORTED = 'unsupported'
+    TEMPLATE_ERROR = 'template_error'
+    CHANNEL_ERROR = 'channel_error'
+    DRY_RUN = 'dry_run'
+    CIRCUIT_OPEN = 'circuit_open'
+
+    def __str__(self):
+        return str(self.value)
+
+
+@attr.s
+class SendResult:
+    """
+    The per-message result returned by :func:`send_many`.
+
+    Arguments:
+        message (:class:`.Message`): The message that was sent.
+        outcomes (dict): A mapping of :class:`.ChannelType` to the :class:`SendOutcome`
+            for each channel that the policies allowed.
+    """
+    message = attr.ib()
+    outcomes = attr.ib(default=attr.Factory(dict))
+
+    @property
+    def delivered(self):
+        """
+        Returns: bool
+            True if the message was delivered over at least one channel.
+        """
+        return SendOutcome.DELIVERED in self.outcomes.values()
+
+
+@attr.s
+class _SendState:
+    """
+    What the sends of a message over its channel types share with the other sends of a batch.
+
+    Arguments:
+        routing_cache (dict): Channels already selected for messages of the same batch group, or None to select
+            them for each message.
+        templates (dict): Compiled templates already loaded for messages of the same batch group, for each
+            channel type.
+        rendered (dict): The message already rendered for some channel types (or the exception rendering it
+            raised), as returned by :func:`.presentation.render_many`.
+        routes (dict): The channel (or the :class:`SendOutcome`) already chosen for some channel types, so that
+            the message isn't routed, and its circuit breaker outcomes reported, a second time.
+        dry_run (:class:`.DryRunReport`): If provided, record the rendered messages in this report instead
+            of delivering them.
+    """
+    routing_cache = attr.ib(default=None)
+    templates = attr.ib(default=attr.Factory(dict))
+    rendered = attr.ib(default=attr.Factory(dict))
+    routes = attr.ib(default=attr.Factory(dict))
+    dry_run = attr.ib(default=None)
+
 
 def send(msg, limit_to_channels=None):
     """
@@ -41,6 +126,13 @@ def send(msg, limit_to_channels=None):
     different requirements, so care must be taken to ensure that all of the needed information is present in the message
     before calling ``ace.send()``.
 
+    If the ``ACE_CONCURRENT_CHANNEL_DELIVERY`` setting is true and more than one channel is allowed, each channel
+    is rendered and delivered concurrently on a shared pool of ``ACE_CHANNEL_FANOUT_WORKERS`` threads, so the send
+    takes roughly as long as the slowest channel rather than the sum of all of them.
+
+    While the circuit breaker of a message's channel is open (see :mod:`edx_ace.circuitbreaker`), the message is
+    delivered over the next channel available to it instead, or not at all if there is none.
+
     Args:
         msg (Message): The message to send.
         limit_to_channels (list of ChannelType, optional): If provided, only send the message over the specified
@@ -48,30 +140,472 @@ def send(msg, limit_to_channels=None):
     """
     msg.report_basics()
 
-    channels_for_message = policy.channels_for(msg)
+    with time_stage('policy.channels_for', msg):
+        channels_for_message = policy.channels_for(msg)
+    presentation.prune_context(msg, policies_checked=True)
 
-    for channel_type in channels_for_message:
-        if limit_to_channels and channel_type not in limit_to_channels:
-            log.debug('Skipping channel %s', channel_type)
+    dry_run = _configured_dry_run()
+    outcomes = _send_to_channels(msg, channels_for_message, limit_to_channels, _SendState(dry_run=dry_run))
+    if dry_run is not None:
+        dry_run.record_message(outcomes)
 
-        try:
-            channel = get_channel_for_message(channel_type, msg)
-        except UnsupportedChannelError:
-            continue
 
-        try:
-            rendered_message = presentation.render(channel, msg)
-        except TemplateDoesNotExist as error:
-            msg.report(
-                'template_error',
-                'Unable to send message because template not found\n' + str(error)
+async def asend(msg, limit_to_channels=None):
+    """
+    Send a message to a recipient from asynchronous code.
+
+    This is the asyncio counterpart of :func:`send`. Policies and rendering (which may touch the database) run
+    via :func:`~asgiref.sync.sync_to_async`, each allowed channel is delivered concurrently through
+    :meth:`.Channel.adeliver`, and recoverable errors are retried with :func:`asyncio.sleep` rather than by
+    blocking a thread.
+
+    Args:
+        msg (Message): The message to send.
+        limit_to_channels (list of ChannelType, optional): If provided, only send the message over the specified
+            channels. If not provided, the message will be sent over all channels that the policies allow.
+    """
+    msg.report_basics()
+
+    with time_stage('policy.channels_for', msg):
+        channels_for_message = await sync_to_async(policy.channels_for)(msg)
+    presentation.prune_context(msg, policies_checked=True)
+
+    dry_run = _configured_dry_run()
+    outcomes = await asyncio.gather(*(
+        _asend_to_channel(msg, channel_type, limit_to_channels, dry_run=dry_run)
+        for channel_type in channels_for_message
+    ))
+    if dry_run is not None:
+        dry_run.record_message(dict(zip(channels_for_message, outcomes)))
+
+
+def send_many(messages, limit_to_channels=None, dry_run=None):
+    """
+    Send a batch of messages, amortizing the per-message pipeline work.
+
+    Messages are processed one at a time, in order, so ``messages`` may be a generator over an arbitrarily
+    large batch. Routing decisions and compiled templates are shared between all messages that have the same
+    ``app_label``, ``name``, ``language`` and channel type (and the same ``transactional`` and
+    ``override_default_channel`` options), which is the common case for a :class:`.MessageType` batch.
+    Policies are still checked for every message, since they are usually recipient-specific. Channels are
+    process-wide, so the Braze channel's HTTP session is reused across messages, and Django email deliveries
+    share one connection (a :class:`.SharedConnection`) for the whole batch.
+
+    This function is a generator: nothing is sent until the results are consumed. Each consumed
+    :class:`SendResult` means that message has been fully processed, so callers can checkpoint their progress.
+
+    If ``ACE_SEND_MANY_LANGUAGE_WINDOW`` is more than 1, messages are read that many at a time, and each window
+    is sent one language at a time, so that each language is activated once per window rather than per message.
+    Results are still yielded in order, but only once their whole window has been sent.
+
+    If ``ACE_RENDER_PROCESSES`` is more than 1, the messages of each window and language are rendered together
+    by :func:`.presentation.render_many` in that many processes before being delivered. The window then defaults
+    to ``RENDER_WINDOW_PER_PROCESS`` messages per process.
+
+    In a dry run, messages go through policies, routing and rendering as usual, but are not delivered; their
+    outcome is :attr:`SendOutcome.DRY_RUN` instead. Throughput and rendered sizes are collected in the
+    ``dry_run`` report, and logged once every message has been processed. The ``ACE_DRY_RUN`` setting
+    makes every send a dry run, collected in :data:`.monitoring.DRY_RUN_REPORT`.
+
+    Args:
+        messages (iterable of Message): The messages to send.
+        limit_to_channels (list of ChannelType, optional): If provided, only send the messages over the specified
+            channels.
+        dry_run (:class:`.DryRunReport`, optional): If provided, render the messages without delivering them,
+            and record what was rendered in this report.
+
+    Yields:
+        SendResult: The outcome for each message, in the order the messages were given.
+    """
+    routing_cache = {}
+    template_caches = {}
+    email_connection = SharedConnection()
+    if dry_run is None:
+        dry_run = _configured_dry_run()
+    render_processes = getattr(settings, 'ACE_RENDER_PROCESSES', 0)
+    window_size = getattr(settings, 'ACE_SEND_MANY_LANGUAGE_WINDOW', None)
+    if window_size is None:
+        window_size = (
+            render_processes * RENDER_WINDOW_PER_PROCESS if render_processes > 1 else DEFAULT_SEND_MANY_LANGUAGE_WINDOW
+        )
+    window_size = max(1, window_size)
+
+    def channels_for(msg):
+        msg.report_basics()
+
+        with time_stage('policy.channels_for', msg):
+            channels_for_message = policy.channels_for(msg)
+        presentation.prune_context(msg, policies_checked=True)
+        return channels_for_message
+
+    def send_one(msg, channels_for_message=None, rendered=None, routes=None):
+        if channels_for_message is None:
+            channels_for_message = channels_for(msg)
+        templates = {
+            channel_type: template_caches.setdefault(_batch_group_key(channel_type, msg), {})
+            for channel_type in channels_for_message
+        }
+
+        with email_connection.active():
+            outcomes = _send_to_channels(
+                msg,
+                channels_for_message,
+                limit_to_channels,
+                _SendState(
+                    routing_cache=routing_cache,
+                    templates=templates,
+                    rendered=rendered or {},
+                    routes=routes or {},
+                    dry_run=dry_run,
+                ),
+            )
+        if dry_run is not None:
+            dry_run.record_message(outcomes)
+        return SendResult(message=msg, outcomes=outcomes)
+
+    def send_group(group):
+        if render_processes <= 1:
+            return [send_one(msg) for msg in group]
+
+        # Render the whole group in the render process pool, then deliver each message in turn.
+        group_channels = [list(channels_for(msg)) for msg in group]
+        rendered = [{} for _ in group]
+        routes = [{} for _ in group]
+        keys, pairs = [], []
+        for index, (msg, channel_types) in enumerate(zip(group, group_channels)):
+            for channel_type in channel_types:
+                channel = _route_to_channel(msg, channel_type, limit_to_channels, routing_cache)
+                routes[index][channel_type] = channel
+                if not isinstance(channel, SendOutcome):
+                    keys.append((index, channel_type))
+                    pairs.append((channel, msg))
+        for (index, channel_type), result in zip(keys, presentation.render_many(pairs, return_exceptions=True)):
+            rendered[index][channel_type] = result
+
+        return [
+            send_one(msg, channel_types, rendered_for_message, routes_for_message)
+            for msg, channel_types, rendered_for_message, routes_for_message in zip(
+                group, group_channels, rendered, routes,
             )
-            continue
+        ]
+
+    try:
+        if window_size == 1:
+            for msg in messages:
+                yield send_one(msg)
+        else:
+            messages = iter(messages)
+            while True:
+                window = list(itertools.islice(messages, window_size))
+                if not window:
+                    break
+                yield from _send_window_by_language(window, send_group)
+    finally:
+        email_connection.close()
+
+    if dry_run is not None:
+        log.info('ACE dry run: %s', dry_run.summary())
+
+
+def dry_run_many(messages, limit_to_channels=None):
+    """
+    Run ``messages`` through :func:`send_many` without delivering them, to measure how fast they render.
+
+    Returns: :class:`.DryRunReport`
+        The report of the run; see :meth:`.DryRunReport.summary`.
+    """
+    report = DryRunReport()
+    for _result in send_many(messages, limit_to_channels, dry_run=report):
+        pass
+    return report
+
+
+def _configured_dry_run():
+    """
+    Returns: :class:`.DryRunReport`
+        The process-wide dry run report if ``ACE_DRY_RUN`` is set, else None.
+    """
+    if getattr(settings, 'ACE_DRY_RUN', False):
+        return DRY_RUN_REPORT
+    return None
+
+
+def _send_window_by_language(window, send_group):
+    """
+    Send every message in ``window`` with ``send_group``, activating each language once for all of its messages.
+
+    Returns:
+        list: The results of ``send_group``, in the order of ``window``.
+    """
+    by_language = defaultdict(list)
+    for index, msg in enumerate(window):
+        by_language[msg.language].append(index)
+
+    results = [None] * len(window)
+    for language, indexes in by_language.items():
+        with translation.override(language) if language else nullcontext():
+            group_results = send_group([window[index] for index in indexes])
+        for index, result in zip(indexes, group_results):
+            results[index] = result
+    return results
+
 
+@once
+def channel_fanout_pool():
+    """
+    Returns: :class:`~concurrent.futures.ThreadPoolExecutor`
+        The pool used to send a message over several channels concurrently.
+    """
+    return ThreadPoolExecutor(
+        max_workers=getattr(settings, 'ACE_CHANNEL_FANOUT_WORKERS', DEFAULT_CHANNEL_FANOUT_WORKERS),
+        thread_name_prefix='ace-channel',
+    )
+
+
+def _send_to_channels(msg, channel_types, limit_to_channels=None, state=None):
+    """
+    Send ``msg`` over each of ``channel_types``, concurrently if ``ACE_CONCURRENT_CHANNEL_DELIVERY`` is set.
+
+    Args:
+        state (_SendState, optional): What the sends share with the rest of the batch, see :func:`_send_to_channel`.
+
+    Returns:
+        dict: A mapping of :class:`.ChannelType` to :class:`SendOutcome`.
+    """
+    state = state or _SendState()
+    channel_types = list(channel_types)
+
+    if len(channel_types) < 2 or not getattr(settings, 'ACE_CONCURRENT_CHANNEL_DELIVERY', False):
+        return {
+            channel_type: _send_to_channel(msg, channel_type, limit_to_channels, state)
+            for channel_type in channel_types
+        }
+
+    # Worker threads don't inherit the active language or context variables (such as the batch's email
+    # connection), so carry them over.
+    language = translation.get_language()
+    futures = {
+        channel_type: channel_fanout_pool().submit(
+            contextvars.copy_context().run,
+            _send_to_channel_in_language,
+            language, msg, channel_type, limit_to_channels, state,
+        )
+        for channel_type in channel_types
+    }
+    return {channel_type: future.result() for channel_type, future in futures.items()}
+
+
+async def _asend_to_channel(msg, channel_type, limit_to_channels=None, dry_run=None):
+    """
+    The asyncio counterpart of :func:`_send_to_channel`.
+    """
+    # Routing can save the message in the outbox, so keep it off the event loop.
+    channel = await sync_to_async(_route_to_channel)(msg, channel_type, limit_to_channels)
+    if isinstance(channel, SendOutcome):
+        return channel
+
+    try:
+        start = time.perf_counter()
+        with time_stage('presentation.render', msg, channel_type):
+            rendered_message = await sync_to_async(presentation.render)(channel, msg)
+        render_seconds = time.perf_counter() - start
+    except (TemplateDoesNotExist, RenderTimeBudgetExceeded) as error:
+        return _render_error(msg, error)
+
+    if dry_run is not None:
+        dry_run.record_render(channel_type, render_seconds, _rendered_sizes(channel, rendered_message))
+        return SendOutcome.DRY_RUN
+
+    tried = []
+    while True:
         try:
-            delivery.deliver(channel, rendered_message, msg)
+            return _delivery_outcome(await delivery.adeliver(channel, rendered_message, msg))
+        except CircuitOpenError as error:
+            tried.append(channel)
+            channel = await sync_to_async(_fallback_channel)(msg, channel_type, error, tried)
+            if isinstance(channel, SendOutcome):
+                return channel
         except ChannelError as error:
-            msg.report(
-                f'{channel_type}_error',
-                str(error)
-            )
+            return _channel_error(msg, channel_type, error)
+
+
+def _send_to_channel_in_language(language, *args):
+    with translation.override(language):
+        return _send_to_channel(*args)
+
+
+def _batch_group_key(channel_type, msg):
+    """
+    The key under which :func:`send_many` shares routing decisions and templates between messages.
+    """
+    return (
+        channel_type,
+        msg.app_label,
+        msg.name,
+        msg.language,
+        bool(msg.options.get('transactional')),
+        msg.options.get('override_default_channel'),
+        msg.options.get('template_engine'),
+    )
+
+
+def _route_to_channel(msg, channel_type, limit_to_channels=None, routing_cache=None):
+    """
+    Returns: :class:`.Channel` or :class:`SendOutcome`
+        The channel to deliver ``msg`` over for ``channel_type``, or the outcome if it can't be.
+    """
+    if limit_to_channels and channel_type not in limit_to_channels:
+        log.debug('Skipping channel %s', channel_type)
+        return SendOutcome.SKIPPED
+
+    try:
+        with time_stage('get_channel_for_message', msg, channel_type):
+            if routing_cache is None:
+                return _available_channel(msg, channel_type, get_channel_for_message(channel_type, msg))
+            group = _batch_group_key(channel_type, msg)
+            if group not in routing_cache:
+                routing_cache[group] = get_channel_for_message(channel_type, msg)
+            return _available_channel(msg, channel_type, routing_cache[group])
+    except UnsupportedChannelError:
+        return SendOutcome.UNSUPPORTED
+
+
+def _available_channel(msg, channel_type, channel):
+    """
+    Returns: :class:`.Channel` or :class:`SendOutcome`
+        ``channel`` (the channel chosen for ``msg``), or a fallback if its circuit breaker is open.
+    """
+    if not circuitbreaker.is_open(channel):
+        return channel
+    error = CircuitOpenError(f'The {channel.channel_name} circuit breaker is open.', channel_name=channel.channel_name)
+    return _fallback_channel(msg, channel_type, error, [channel])
+
+
+def _fallback_channel(msg, channel_type, error, tried):
+    """
+    Returns: :class:`.Channel` or :class:`SendOutcome`
+        The next channel available to ``msg``, when the circuit breaker of the channels in ``tried`` has opened.
+        If there is none (or ``ACE_CIRCUIT_BREAKER_FALLBACK`` is false), ``error`` is reported, the message is
+        saved in the outbox for the first channel tried, and the outcome is :attr:`SendOutcome.CIRCUIT_OPEN`.
+    """
+    if getattr(settings, 'ACE_CIRCUIT_BREAKER_FALLBACK', True):
+        for candidate in get_channels_for_message(channel_type, msg):
+            if all(candidate is not channel for channel in tried) and not circuitbreaker.is_open(candidate):
+                log.info('Rerouting message from %s to %s: %s', tried[-1].channel_name, candidate.channel_name, error)
+                msg.report(f'{channel_type}_circuit_rerouted', candidate.channel_name)
+                return candidate
+    msg.report(f'{channel_type}_circuit_open', str(error))
+    outbox.save(tried[0], msg, f'{type(error).__name__}: {error}')
+    return SendOutcome.CIRCUIT_OPEN
+
+
+def _send_to_channel(msg, channel_type, limit_to_channels=None, state=None):
+    """
+    Render and deliver ``msg`` over a single channel type, reporting any errors on the message.
+
+    Args:
+        msg (Message): The message to send.
+        channel_type (ChannelType): The channel type that the policies allowed.
+        limit_to_channels (list of ChannelType, optional): The channels the caller restricted the send to.
+        state (_SendState, optional): The channels, templates, routes and renderings shared with the rest of the
+            batch, and the dry run report to record the rendered message in instead of delivering it.
+
+    Returns:
+        SendOutcome: What happened to the message on this channel.
+    """
+    state = state or _SendState()
+    if channel_type in state.routes:
+        channel = state.routes[channel_type]
+    else:
+        channel = _route_to_channel(msg, channel_type, limit_to_channels, state.routing_cache)
+    if isinstance(channel, SendOutcome):
+        return channel
+
+    render_seconds = None
+    rendered_message = state.rendered.get(channel_type)
+    try:
+        if rendered_message is None:
+            start = time.perf_counter()
+            with time_stage('presentation.render', msg, channel_type):
+                rendered_message = presentation.render(channel, msg, templates=state.templates.get(channel_type))
+            render_seconds = time.perf_counter() - start
+        elif isinstance(rendered_message, Exception):
+            raise rendered_message
+    except (TemplateDoesNotExist, RenderTimeBudgetExceeded) as error:
+        return _render_error(msg, error)
+
+    if state.dry_run is not None:
+        state.dry_run.record_render(channel_type, render_seconds, _rendered_sizes(channel, rendered_message))
+        return SendOutcome.DRY_RUN
+
+    # The message is rendered for the channel type, so it can be delivered over any fallback channel as it is.
+    tried = []
+    while True:
+        try:
+            return _delivery_outcome(delivery.deliver(channel, rendered_message, msg))
+        except CircuitOpenError as error:
+            tried.append(channel)
+            channel = _fallback_channel(msg, channel_type, error, tried)
+            if isinstance(channel, SendOutcome):
+                return channel
+        except ChannelError as error:
+            return _channel_error(msg, channel_type, error)
+
+
+def _render_error(msg, error):
+    """
+    Report ``error``, which rendering ``msg`` raised, on the message.
+
+    Returns: :class:`SendOutcome`
+        :attr:`SendOutcome.TEMPLATE_ERROR`.
+    """
+    if isinstance(error, RenderTimeBudgetExceeded):
+        msg.report('render_time_budget_exceeded', str(error))
+    else:
+        msg.report(
+            'template_error',
+            'Unable to send message because template not found\n' + str(error)
+        )
+    return SendOutcome.TEMPLATE_ERROR
+
+
+def _channel_error(msg, channel_type, error):
+    """
+    Report ``error``, which delivering ``msg`` over ``channel_type`` raised, on the message.
+
+    Returns: :class:`SendOutcome`
+        :attr:`SendOutcome.CHANNEL_ERROR`.
+    """
+    msg.report(
+        f'{channel_type}_error',
+        str(error)
+    )
+    return SendOutcome.CHANNEL_ERROR
+
+
+def _delivery_outcome(delivered):
+    """
+    Returns: :class:`SendOutcome`
+        The outcome of a delivery, given what :func:`.delivery.deliver` returned.
+    """
+    if delivered is None:
+        return SendOutcome.RETRY_SCHEDULED
+    return SendOutcome.DELIVERED if delivered else SendOutcome.EXPIRED
+
+
+def _rendered_sizes(channel, rendered_message):
+    """
+    Returns: dict
+        The size in bytes of each field of ``rendered_message`` that ``channel`` reads.
+    """
+    if not attr.has(type(rendered_message)):
+        return {}
+    fields = getattr(type(channel), 'rendered_fields', None) or [
+        attribute.name for attribute in attr.fields(type(rendered_message))
+    ]
+    sizes = {}
+    for field in fields:
+        value = getattr(rendered_message, field)
+        if isinstance(value, str):
+            sizes[field] = len(value.encode('utf-8'))
+    return sizes
@@ -1,7 +1,13 @@
 """
 Internal module configuring ACE as a Django app.
 """
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+LOG = logging.getLogger(__name__)
 
 
 class EdxAceConfig(AppConfig):
@@ -10,3 +16,27 @@ class EdxAceConfig(AppConfig):
     """
 
     name = 'edx_ace'
+
+    def ready(self):
+        """
+        Warm up ACE before the first send, as configured by:
+
+        * ``ACE_PREWARM_TRANSLATIONS``: ``True`` loads the translation catalogs of every language in
+          ``LANGUAGES``, a list loads just those languages.
+        * ``ACE_PRECOMPILE_TEMPLATES``: ``True`` compiles every message's templates and logs any that are
+          missing or broken; ``'strict'`` also refuses to start if there are any.
+        """
+        # pylint: disable=import-outside-toplevel
+        prewarm = getattr(settings, 'ACE_PREWARM_TRANSLATIONS', False)
+        if prewarm:
+            from edx_ace.presentation import prewarm_translations
+            prewarm_translations(None if prewarm is True else prewarm)
+
+        precompile = getattr(settings, 'ACE_PRECOMPILE_TEMPLATES', False)
+        if precompile:
+            from edx_ace.presentation import precompile_templates
+            problems = precompile_templates()
+            for template_path, error in problems:
+                LOG.error('ACE template %s is missing or broken: %s', template_path, error)
+            if problems and precompile == 'strict':
+                raise ImproperlyConfigured(f'{len(problems)} ACE template(s) are missing or broken.')
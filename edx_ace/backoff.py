@@ -0,0 +1,134 @@
+"""
+:mod:`edx_ace.backoff` decides how long to wait before re-attempting a delivery that failed with a
+:class:`.RecoverableChannelDeliveryError`.
+
+By default, deliveries are re-attempted at the ``next_attempt_time`` that the channel suggested, which is
+usually a fixed delay. Under sustained throttling, every waiting message then wakes at about the same moment
+and hits the vendor again. The ``ACE_CHANNEL_BACKOFF`` setting replaces those suggestions with a
+:class:`BackoffPolicy` per channel name (as listed in ``ACE_ENABLED_CHANNELS``), for example::
+
+    ACE_CHANNEL_BACKOFF = {
+        'braze_email': {
+            # Wait up to 2s, 4s, 8s, ... (at most 5 minutes) between attempts, and give up after 8 retries.
+            'jitter': 'full',
+            'base': 2,
+            'cap': 300,
+            'max_retries': 8,
+        },
+    }
+
+Each entry holds the keyword arguments of the policy, whose class is given by an optional ``'class'`` import
+path (:class:`ExponentialBackoff` by default).
+
+A channel can still insist on a time, for example when the vendor sent a ``Retry-After`` header, by raising its
+error with ``vendor_requested=True``: the policy's delay is then never shorter than that. Waits for
+:class:`.RateLimitExceeded` are not backoffs, and always last until the rate limit allows the delivery.
+"""
+import random
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from edx_ace.errors import RateLimitExceeded
+
+DEFAULT_BACKOFF_POLICY = 'edx_ace.backoff.ExponentialBackoff'
+
+FULL_JITTER = 'full'
+DECORRELATED_JITTER = 'decorrelated'
+
+
+class BackoffPolicy:
+    """
+    Decides how long to wait between delivery attempts.
+    """
+
+    def delay(self, attempt, previous_delay=None):
+        """
+        Arguments:
+            attempt (int): The number of the retry, from 1.
+            previous_delay (float): The delay this policy returned for the previous retry, if any.
+
+        Returns: float
+            How many seconds to wait before the retry, or ``None`` to give up.
+        """
+        raise NotImplementedError()
+
+
+class ExponentialBackoff(BackoffPolicy):
+    """
+    Exponential backoff with jitter, as described in
+    https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/.
+
+    Arguments:
+        base (float): The delay before the first retry, in seconds, which doubles with each retry.
+        cap (float): The longest delay, in seconds.
+        jitter (str): ``'full'`` to wait a random time up to the exponential delay, ``'decorrelated'`` to wait a
+            random time between ``base`` and three times the previous delay, or ``None`` for no jitter.
+        max_retries (int): How many times to retry before giving up, or ``None`` to retry until the message expires.
+    """
+
+    def __init__(self, base=1, cap=300, jitter=FULL_JITTER, max_retries=None):
+        if jitter not in (FULL_JITTER, DECORRELATED_JITTER, None):
+            raise ValueError(f'Unknown backoff jitter {jitter!r}.')
+        self.base = base
+        self.cap = cap
+        self.jitter = jitter
+        self.max_retries = max_retries
+
+    def delay(self, attempt, previous_delay=None):
+        if self.max_retries is not None and attempt > self.max_retries:
+            return None
+        if self.jitter == DECORRELATED_JITTER:
+            return min(self.cap, random.uniform(self.base, (previous_delay or self.base) * 3))
+        delay = min(self.cap, self.base * 2 ** (attempt - 1))
+        if self.jitter == FULL_JITTER:
+            return random.uniform(0, delay)
+        return delay
+
+
+class RetryState:
+    """
+    The retries made so far for the delivery of one message over one channel.
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.previous_delay = None
+
+
+def policy_for(channel):
+    """
+    Returns: :class:`BackoffPolicy`
+        The policy that ``ACE_CHANNEL_BACKOFF`` configures for ``channel``, or ``None``.
+    """
+    config = getattr(settings, 'ACE_CHANNEL_BACKOFF', {}).get(getattr(channel, 'channel_name', None))
+    if not config:
+        return None
+    config = dict(config)
+    return import_string(config.pop('class', DEFAULT_BACKOFF_POLICY))(**config)
+
+
+def retry_delay(channel, error, state, now):
+    """
+    Arguments:
+        channel (Channel): The channel the delivery failed on.
+        error (RecoverableChannelDeliveryError): How it failed.
+        state (RetryState): The retries made so far, which is updated.
+        now (datetime): The current time.
+
+    Returns: float
+        How many seconds to wait before re-attempting the delivery, or ``None`` if it has been retried enough.
+    """
+    suggested = max(0.0, (error.next_attempt_time - now).total_seconds())
+    policy = policy_for(channel)
+    if policy is None or isinstance(error, RateLimitExceeded):
+        return suggested
+
+    state.attempts += 1
+    delay = policy.delay(state.attempts, state.previous_delay)
+    if delay is None:
+        return None
+    state.previous_delay = delay
+    if error.vendor_requested:
+        delay = max(delay, suggested)
+    return delay
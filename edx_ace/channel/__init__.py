@@ -11,6 +11,8 @@ import itertools
 from collections import OrderedDict, defaultdict
 from enum import Enum
 
+from asgiref.sync import sync_to_async
+
 from django.conf import settings
 
 from edx_ace.errors import UnsupportedChannelError
@@ -45,6 +47,13 @@ class Channel(metaclass=abc.ABCMeta):
 
     channel_type = None
 
+    #: The names of the rendered message fields that :meth:`deliver` reads, or ``None`` for all of them.
+    #: Other fields are only rendered if they are read anyway.
+    rendered_fields = None
+
+    #: The name the channel is registered under (see :meth:`ChannelMap.register_channel`), or ``None``.
+    channel_name = None
+
     @classmethod
     def enabled(cls):
         """
@@ -64,6 +73,20 @@ class Channel(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    async def adeliver(self, message, rendered_message):
+        """
+        Transmit a rendered message to a recipient without blocking the event loop.
+
+        The default implementation runs :meth:`deliver` in a worker thread. Channels that talk to an API with an
+        asyncio-capable client should override this with a native implementation.
+
+        Args:
+            message (Message): The message to transmit.
+            rendered_message (dict): The rendered content of the message that has been personalized for this particular
+                recipient.
+        """
+        await sync_to_async(self.deliver, thread_sensitive=False)(message, rendered_message)
+
     def overrides_delivery_for_message(self, message):  # pylint: disable=unused-argument
         """
         Returns true if this channel specifically wants to handle this message, outside normal channel delivery rules.
@@ -100,6 +123,7 @@ class ChannelMap:
             channel (Channel): The channel to register.
             channel_name (str): The channel name, as stated in the `setup.py` file.
         """
+        channel.channel_name = channel_name
         self.channel_type_to_channel_impl[channel.channel_type][channel_name] = channel
 
     def get_channel_by_name(self, channel_type, channel_name):
@@ -162,15 +186,19 @@ def channels():  # pragma: no cover
     ])
 
 
-def get_channel_for_message(channel_type, message):
+def get_channels_for_message(channel_type, message):
     """
-    Based on available `channels()` returns a single channels for a message.
+    Based on available `channels()` returns the channels that could deliver a message, in order of preference.
+
+    A channel that specifically demands to deliver the message (see :meth:`.Channel.overrides_delivery_for_message`)
+    comes first, followed by the channels configured for messages of its kind. The later channels are the fallbacks
+    used while the first one's circuit breaker is open (see :mod:`edx_ace.circuitbreaker`).
 
     Raises:
         UnsupportedChannelError: If there's no channel matches the request.
 
     Returns:
-        Channel: The selected channel object.
+        list: The candidate channel objects.
     """
     channels_map = channels()
     channel_names = []
@@ -194,15 +222,32 @@ def get_channel_for_message(channel_type, message):
             for channel_name in channel_names
         ]
     except KeyError:
-        return channels_map.get_default_channel(channel_type)
+        return [channels_map.get_default_channel(channel_type)]
+
+    if not possible_channels:
+        return [channels_map.get_default_channel(channel_type)]
 
     # First see if any channel specifically demands to deliver this message
+    # Else the normal path: use the preferred channel for this message type
+    preferred = next(
+        (channel for channel in possible_channels if channel.overrides_delivery_for_message(message)),
+        possible_channels[0],
+    )
+    candidates = [preferred]
     for channel in possible_channels:
-        if channel.overrides_delivery_for_message(message):
-            return channel
+        if all(channel is not candidate for candidate in candidates):
+            candidates.append(channel)
+    return candidates
 
-    # Else the normal path: use the preferred channel for this message type
-    if possible_channels:
-        return possible_channels[0]
-    else:
-        return channels_map.get_default_channel(channel_type)
+
+def get_channel_for_message(channel_type, message):
+    """
+    Based on available `channels()` returns a single channels for a message.
+
+    Raises:
+        UnsupportedChannelError: If there's no channel matches the request.
+
+    Returns:
+        Channel: The selected channel object.
+    """
+    return get_channels_for_message(channel_type, message)[0]
@@ -1,10 +1,15 @@
 """
 :mod:`edx_ace.channel.braze` implements a Braze-based email delivery channel for ACE.
 """
+import asyncio
 import logging
 import random
+import threading
 import warnings
+import weakref
 from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from functools import cached_property
 from gettext import gettext as _
 
 import requests
@@ -19,6 +24,13 @@ from edx_ace.utils.date import get_current_time
 
 LOG = logging.getLogger(__name__)
 
+try:
+    import httpx
+
+    HTTPX_INSTALLED = True
+except ImportError:
+    HTTPX_INSTALLED = False
+
 NEXT_ATTEMPT_DELAY_SECONDS = 30
 BRAZE_API_TIMEOUT = 5
 
@@ -65,6 +77,12 @@ class BrazeEmailChannel(EmailChannelMixin, Channel):
     _ENDPOINT_SETTING = 'ACE_CHANNEL_BRAZE_REST_ENDPOINT'
     _FROM_EMAIL_SETTING = 'ACE_CHANNEL_BRAZE_FROM_EMAIL'  # optional
 
+    rendered_fields = ('subject', 'head_html', 'body_html', 'body')
+
+    # The httpx.AsyncClient used by adeliver() on each event loop, along with the async generator that closes it.
+    _async_clients = None
+    _async_clients_lock = threading.Lock()
+
     @classmethod
     def enabled(cls):
         """
@@ -122,41 +140,13 @@ class BrazeEmailChannel(EmailChannelMixin, Channel):
             DjangoEmailChannel().deliver(message, rendered_message)
             return
 
-        transactional = message.options.get('transactional', False)
-        override_frequency_capping = message.options.get('override_frequency_capping', transactional)
-        body_html = self.make_simple_html_template(rendered_message.head_html, rendered_message.body_html)
-
-        # Allow our settings to override the from address, because Braze requires specific configured from addresses,
-        # which are tied to specific ip addresses that are "ip warmed" to help delivery of the emails not get sent
-        # to promotional/spam inboxes.
-        from_address = getattr(settings, self._FROM_EMAIL_SETTING, None) or self.get_from_address(message)
-
         logger = message.get_message_specific_logger(LOG)
         logger.debug('Sending to Braze')
 
-        # https://www.braze.com/docs/api/endpoints/messaging/send_messages/post_send_messages/
-        # https://www.braze.com/docs/api/objects_filters/email_object/
-        response = requests.post(
+        response = self._session.post(
             self._send_url(),
             headers=self._auth_headers(),
-            json={
-                'external_user_ids': [str(message.recipient.lms_user_id)],
-                'recipient_subscription_state': 'all' if transactional else 'subscribed',
-                'campaign_id': self._campaign_id(message.name),
-                'override_frequency_capping': override_frequency_capping,
-                'messages': {
-                    'email': {
-                        'app_id': getattr(settings, self._APP_ID_SETTING),
-                        'subject': self.get_subject(rendered_message),
-                        'from': from_address,
-                        'reply_to': message.options.get('reply_to'),
-                        'body': body_html,
-                        'plaintext_body': rendered_message.body,
-                        'message_variation_id': self._variation_id(message.name),
-                        'should_inline_css': False,  # this feature messes with inline CSS already in ACE templates
-                    },
-                },
-            },
+            json=self._send_payload(message, rendered_message),
             timeout=getattr(settings, 'ACE_DEFAULT_API_TIMEOUT', BRAZE_API_TIMEOUT)
         )
 
@@ -170,6 +160,108 @@ class BrazeEmailChannel(EmailChannelMixin, Channel):
             logger.debug('Failed to send to Braze: %s', message)
             self._handle_error_response(response, message, exc)
 
+    async def adeliver(self, message, rendered_message):
+        """
+        Send the message with an asyncio HTTP client when ``httpx`` is installed.
+
+        Without ``httpx``, this falls back to running :meth:`deliver` in a worker thread.
+        """
+        if not HTTPX_INSTALLED:
+            await super().adeliver(message, rendered_message)
+            return
+
+        if not self.enabled():
+            raise FatalChannelDeliveryError('Braze channel is disabled, unable to send')
+
+        if not message.recipient.lms_user_id:
+            # See deliver() for why we fall back to a Django smtp email here.
+            await DjangoEmailChannel().adeliver(message, rendered_message)
+            return
+
+        logger = message.get_message_specific_logger(LOG)
+        logger.debug('Sending to Braze')
+
+        client = await self._async_client()
+        response = await client.post(
+            self._send_url(),
+            headers=self._auth_headers(),
+            json=self._send_payload(message, rendered_message),
+        )
+
+        if response.is_error:
+            # https://www.braze.com/docs/api/errors/
+            error_message = response.json().get('message', 'Unknown error')
+            logger.debug('Failed to send to Braze: %s', error_message)
+            self._handle_error_response(response, error_message, None)
+
+        logger.debug('Successfully sent to Braze (dispatch ID %s)', response.json()['dispatch_id'])
+
+    @cached_property
+    def _session(self):
+        """
+        The :class:`requests.Session` shared by every delivery of this channel, so that its connections to Braze
+        are kept alive between messages.
+        """
+        return requests.Session()
+
+    async def _async_client(self):
+        """
+        Returns: :class:`httpx.AsyncClient`
+            The client shared by the async deliveries of this channel on the running event loop, which is created on
+            first use. A client's connections belong to one event loop, so each loop gets its own client, which is
+            closed when the loop shuts down its async generators (as :func:`asyncio.run` and ``async_to_sync`` do).
+        """
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            if self._async_clients is None:
+                self._async_clients = weakref.WeakKeyDictionary()
+            # Forget the clients of the loops that are gone.
+            for closed_loop in [other for other in self._async_clients if other.is_closed()]:
+                del self._async_clients[closed_loop]
+            if loop in self._async_clients:
+                return self._async_clients[loop][0]
+            client = httpx.AsyncClient(timeout=getattr(settings, 'ACE_DEFAULT_API_TIMEOUT', BRAZE_API_TIMEOUT))
+            closer = _close_on_shutdown(client)
+            self._async_clients[loop] = (client, closer)
+        # Starting the generator hands it to the loop, which finalizes it when it shuts down.
+        await closer.__anext__()
+        return client
+
+    def _send_payload(self, message, rendered_message):
+        """
+        Returns: dict
+            The JSON body of the send-message API request for ``message``.
+        """
+        transactional = message.options.get('transactional', False)
+        override_frequency_capping = message.options.get('override_frequency_capping', transactional)
+        body_html = self.make_simple_html_template(rendered_message.head_html, rendered_message.body_html)
+
+        # Allow our settings to override the from address, because Braze requires specific configured from addresses,
+        # which are tied to specific ip addresses that are "ip warmed" to help delivery of the emails not get sent
+        # to promotional/spam inboxes.
+        from_address = getattr(settings, self._FROM_EMAIL_SETTING, None) or self.get_from_address(message)
+
+        # https://www.braze.com/docs/api/endpoints/messaging/send_messages/post_send_messages/
+        # https://www.braze.com/docs/api/objects_filters/email_object/
+        return {
+            'external_user_ids': [str(message.recipient.lms_user_id)],
+            'recipient_subscription_state': 'all' if transactional else 'subscribed',
+            'campaign_id': self._campaign_id(message.name),
+            'override_frequency_capping': override_frequency_capping,
+            'messages': {
+                'email': {
+                    'app_id': getattr(settings, self._APP_ID_SETTING),
+                    'subject': self.get_subject(rendered_message),
+                    'from': from_address,
+                    'reply_to': message.options.get('reply_to'),
+                    'body': body_html,
+                    'plaintext_body': rendered_message.body,
+                    'message_variation_id': self._variation_id(message.name),
+                    'should_inline_css': False,  # this feature messes with inline CSS already in ACE templates
+                },
+            },
+        }
+
     def overrides_delivery_for_message(self, message):
         # If we have a campaign configured for this message, let's deliver it ourselves, even if it's a transactional
         # message. Presumably that campaign is set up to ignore global delivery caps so that we don't drop such a
@@ -184,21 +276,46 @@ class BrazeEmailChannel(EmailChannelMixin, Channel):
         Arguments:
             response: The HTTP response received from Braze.
             message: An error message from Braze.
-            exception: The exception that triggered this error.
+            exception: The exception that triggered this error, if any.
         """
         if response.status_code == 429 or 500 <= response.status_code < 600:
-            next_attempt_time = get_current_time() + timedelta(
-                seconds=NEXT_ATTEMPT_DELAY_SECONDS + random.uniform(-2, 2)
-            )
+            next_attempt_time = self._retry_after_time(response)
+            vendor_requested = next_attempt_time is not None
+            if not vendor_requested:
+                next_attempt_time = get_current_time() + timedelta(
+                    seconds=NEXT_ATTEMPT_DELAY_SECONDS + random.uniform(-2, 2)
+                )
             raise RecoverableChannelDeliveryError(
                 f'Recoverable Braze error (status_code={response.status_code}): {message}',
-                next_attempt_time
+                next_attempt_time,
+                vendor_requested=vendor_requested,
             ) from exception
 
         raise FatalChannelDeliveryError(
             f'Fatal Braze error (status_code={response.status_code}): {message}'
         ) from exception
 
+    @staticmethod
+    def _retry_after_time(response):
+        """
+        Returns: datetime
+            When the ``Retry-After`` header of an error response says to retry (either as a number of seconds or
+            as an HTTP date), or None if it doesn't have a valid one.
+        """
+        retry_after = getattr(response, 'headers', {}).get('Retry-After')
+        if not isinstance(retry_after, str):
+            return None
+        try:
+            return get_current_time() + timedelta(seconds=max(0.0, float(retry_after)))
+        except (OverflowError, ValueError):
+            pass
+        try:
+            retry_time = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        # Dates without a timezone are in UTC, as HTTP dates should be.
+        return retry_time if retry_time.tzinfo else retry_time.replace(tzinfo=get_current_time().tzinfo)
+
     @classmethod
     def _auth_headers(cls):
         """Returns authorization headers suitable for passing to the requests library"""
@@ -229,3 +346,14 @@ class BrazeEmailChannel(EmailChannelMixin, Channel):
             if len(campaign_parts) > 1:
                 return campaign_parts[1]
         return None
+
+
+async def _close_on_shutdown(client):
+    """
+    An async generator that closes ``client`` when it is finalized, which the event loop it was started on does
+    when it shuts down.
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
@@ -2,10 +2,15 @@
 :mod:`edx_ace.channel.django_email` implements a Django `send_mail()` email
 delivery channel for ACE.
 """
+import contextvars
 import logging
-from smtplib import SMTPException
+import threading
+from contextlib import contextmanager
+from smtplib import SMTPException, SMTPServerDisconnected
 
-from django.core.mail import EmailMultiAlternatives
+from asgiref.sync import sync_to_async
+
+from django.core.mail import EmailMultiAlternatives, get_connection
 
 from edx_ace.channel import Channel
 from edx_ace.channel.mixins import EmailChannelMixin
@@ -13,6 +18,66 @@ from edx_ace.errors import FatalChannelDeliveryError
 
 LOG = logging.getLogger(__name__)
 
+# The SharedConnection that deliveries made in this context send through, if any.
+_SHARED_CONNECTION = contextvars.ContextVar('ace_django_email_connection', default=None)
+
+
+class SharedConnection:
+    """
+    A Django email connection that is opened on the first delivery and then reused by every
+    :class:`DjangoEmailChannel` delivery made while it is :meth:`active`, instead of opening one per message.
+
+    :func:`.ace.send_many` keeps one for each batch, and closes it once the batch has been sent.
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def active(self):
+        """
+        Make the deliveries in this block send through this connection.
+        """
+        token = _SHARED_CONNECTION.set(self)
+        try:
+            yield
+        finally:
+            _SHARED_CONNECTION.reset(token)
+
+    def connection(self, stale=None):
+        """
+        Returns: The open email backend, opening it if needed.
+
+        Args:
+            stale: A backend whose connection was lost, which is replaced by a new one if it is still the current one.
+        """
+        with self._lock:
+            if stale is not None and stale is self._connection:
+                self._close()
+            if self._connection is None:
+                self._connection = get_connection()
+                self._connection.open()
+            return self._connection
+
+    def close(self):
+        """
+        Close the connection, if it was opened.
+        """
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        """
+        Close the connection without taking the lock.
+        """
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            try:
+                connection.close()
+            except SMTPException:
+                pass
+
 
 class DjangoEmailChannel(EmailChannelMixin, Channel):
     """
@@ -42,6 +107,8 @@ class DjangoEmailChannel(EmailChannelMixin, Channel):
             .. settings_end
     """
 
+    rendered_fields = ('subject', 'head_html', 'body_html', 'body')
+
     @classmethod
     def enabled(cls):
         """
@@ -50,23 +117,59 @@ class DjangoEmailChannel(EmailChannelMixin, Channel):
         return True
 
     def deliver(self, message, rendered_message):
-        subject = self.get_subject(rendered_message)
-        from_address = self.get_from_address(message)
-        reply_to = message.options.get('reply_to', None)
+        mail = self._build_mail(message, rendered_message)
+        try:
+            self._send(mail)
+        except SMTPException as e:
+            LOG.exception(e)
+            raise FatalChannelDeliveryError('An SMTP error occurred (and logged) from Django send_email()') from e
 
-        rendered_template = self.make_simple_html_template(rendered_message.head_html, rendered_message.body_html)
+    async def adeliver(self, message, rendered_message):
+        """
+        Build the email on the event loop and only hand the blocking SMTP exchange to a worker thread.
+        """
+        mail = self._build_mail(message, rendered_message)
         try:
-            mail = EmailMultiAlternatives(
-                subject=subject,
-                body=rendered_message.body,
-                from_email=from_address,
-                to=[message.recipient.email_address],
-                reply_to=reply_to,
-                headers=message.headers,
-            )
-
-            mail.attach_alternative(rendered_template, 'text/html')
-            mail.send()
+            await sync_to_async(self._send, thread_sensitive=False)(mail)
         except SMTPException as e:
             LOG.exception(e)
             raise FatalChannelDeliveryError('An SMTP error occurred (and logged) from Django send_email()') from e
+
+    @staticmethod
+    def _send(mail):
+        """
+        Send ``mail`` through the active :class:`SharedConnection`, if any, else through a connection of its own.
+        """
+        shared = _SHARED_CONNECTION.get()
+        if shared is None:
+            mail.send()
+            return
+        mail.connection = shared.connection()
+        try:
+            mail.send()
+        except SMTPServerDisconnected:
+            # The server closed the connection while it was idle, so open a new one.
+            mail.connection = shared.connection(stale=mail.connection)
+            mail.send()
+
+    def _build_mail(self, message, rendered_message):
+        """
+        Returns: :class:`~django.core.mail.EmailMultiAlternatives`
+            The email for ``message``, ready to be sent.
+        """
+        subject = self.get_subject(rendered_message)
+        from_address = self.get_from_address(message)
+        reply_to = message.options.get('reply_to', None)
+
+        rendered_template = self.make_simple_html_template(rendered_message.head_html, rendered_message.body_html)
+        mail = EmailMultiAlternatives(
+            subject=subject,
+            body=rendered_message.body,
+            from_email=from_address,
+            to=[message.recipient.email_address],
+            reply_to=reply_to,
+            headers=message.headers,
+        )
+
+        mail.attach_alternative(rendered_template, 'text/html')
+        return mail
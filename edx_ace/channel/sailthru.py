@@ -16,7 +16,9 @@ from dateutil.tz import tzutc
 from django.conf import settings
 
 from edx_ace.channel import Channel, ChannelType
-from edx_ace.errors import FatalChannelDeliveryError, InvalidMessageError, RecoverableChannelDeliveryError
+from edx_ace.errors import (FatalChannelDeliveryError, InvalidMessageError, RateLimitExceeded,
+                            RecoverableChannelDeliveryError)
+from edx_ace.ratelimit import Pacer
 from edx_ace.utils.date import get_current_time
 
 LOG = logging.getLogger(__name__)
@@ -101,6 +103,10 @@ class SailthruEmailChannel(Channel):
             ACE_CHANNEL_SAILTHRU_API_SECRET = "this is secret"
             .. settings_end
 
+    Sends are paced with the rate limit headers of Sailthru's responses (see :class:`.Pacer`), unless
+    ``ACE_CHANNEL_SAILTHRU_PACING_ENABLED`` is false. Set ``ACE_CHANNEL_SAILTHRU_PACING_CONCURRENCY`` to
+    the number of workers that send through Sailthru at once, as they share its rate limit.
+
     The named template in Sailthru should be minimal, most of the rendering happens within ACE. The "From Name" field
     should be set to ``{{ace_template_from_name}}``. The "Subject" field should be set to ``{{ace_template_subject}}``.
     The "Code" for the template should be::
@@ -189,6 +195,7 @@ class SailthruEmailChannel(Channel):
             )
 
         self.template_name = settings.ACE_CHANNEL_SAILTHRU_TEMPLATE_NAME
+        self.pacer = Pacer(concurrency=getattr(settings, 'ACE_CHANNEL_SAILTHRU_PACING_CONCURRENCY', 1))
 
     def deliver(self, message, rendered_message):
         if message.recipient.email_address is None:
@@ -242,6 +249,8 @@ class SailthruEmailChannel(Channel):
                 str(options),
             )
 
+        pacing = self._pace()
+
         try:
             logger.debug('Sending to Sailthru')
 
@@ -252,6 +261,9 @@ class SailthruEmailChannel(Channel):
                 options=options,
             )
 
+            if pacing:
+                self._update_pacer(response)
+
             if response.is_ok():
                 logger.debug('Successfully send to Sailthru')
                 # TODO(later): emit some sort of analytics event?
@@ -265,6 +277,33 @@ class SailthruEmailChannel(Channel):
                 'Unable to communicate with the Sailthru API: ' + str(exc)
             ) from exc  # pragma: no cover
 
+    def _pace(self):
+        """
+        Returns: bool
+            Whether sends are paced to stay within the Sailthru rate limit, as set by
+            ``ACE_CHANNEL_SAILTHRU_PACING_ENABLED``.
+
+        Raises:
+            RateLimitExceeded: If the pacer spaces this send out until later.
+        """
+        if not getattr(settings, 'ACE_CHANNEL_SAILTHRU_PACING_ENABLED', True):
+            return False
+        delay = self.pacer.delay()
+        if delay > 0:
+            raise RateLimitExceeded(
+                'Pacing sends to stay within the Sailthru rate limit.',
+                next_attempt_time=get_current_time() + timedelta(seconds=delay),
+            )
+        return True
+
+    def _update_pacer(self, response):
+        """
+        Update the pacer with the state of the rate limit that Sailthru reported in ``response``, if any.
+        """
+        rate_limit = self._get_rate_limit(response)
+        if rate_limit is not None:
+            self.pacer.update(*rate_limit)
+
     def _handle_error_response(self, response):
         """
         Handle an error response from SailThru, either by retrying or failing
@@ -282,7 +321,8 @@ class SailthruEmailChannel(Channel):
             if error_code == RecoverableErrorCodes.RATE_LIMIT:
                 next_attempt_time = self._get_rate_limit_reset_time(sailthru_response=response)
 
-            if next_attempt_time is None:
+            vendor_requested = next_attempt_time is not None
+            if not vendor_requested:
                 # Sailthru advises waiting "a moment" and then trying again.
                 next_attempt_time = get_current_time() + timedelta(
                     seconds=NEXT_ATTEMPT_DELAY_SECONDS + random.uniform(-2, 2)
@@ -290,13 +330,31 @@ class SailthruEmailChannel(Channel):
 
             raise RecoverableChannelDeliveryError(
                 f'Recoverable Sailthru error (error_code={error_code} status_code={http_status_code}): {error_message}',
-                next_attempt_time
+                next_attempt_time,
+                vendor_requested=vendor_requested,
             )
 
         raise FatalChannelDeliveryError(
             f'Fatal Sailthru error (error_code={error_code} status_code={http_status_code}): {error_message}'
         )
 
+    @staticmethod
+    def _get_rate_limit(sailthru_response):
+        """
+        Read the rate limit headers of a response from the Sailthru API.
+
+        Returns:
+            tuple: How many requests are left in the current rate limit window, and the POSIX timestamp at which
+            the window resets; or None if the response doesn't have the headers.
+        """
+        try:
+            headers = sailthru_response.response.headers
+            remaining = int(headers[ResponseHeaders.RATE_LIMIT_REMAINING.value])
+            reset_timestamp = int(headers[ResponseHeaders.RATE_LIMIT_RESET.value])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+        return remaining, reset_timestamp
+
     @staticmethod
     def _get_rate_limit_reset_time(sailthru_response):
         """
@@ -310,15 +368,11 @@ class SailthruEmailChannel(Channel):
         Returns:
             datetime: The time at which delivery can be re-attempted because the rate limit will be reset.
         """
-        response = sailthru_response.response
-        headers = response.headers
-
-        try:
-            remaining = int(headers[ResponseHeaders.RATE_LIMIT_REMAINING])
-            if remaining > 0:
-                return None
+        rate_limit = SailthruEmailChannel._get_rate_limit(sailthru_response)
+        if rate_limit is None:
+            return None
 
-            reset_timestamp = int(headers[ResponseHeaders.RATE_LIMIT_RESET])
-            return datetime.utcfromtimestamp(reset_timestamp).replace(tzinfo=tzutc())
-        except ValueError:
+        remaining, reset_timestamp = rate_limit
+        if remaining > 0:
             return None
+        return datetime.utcfromtimestamp(reset_timestamp).replace(tzinfo=tzutc())
@@ -0,0 +1,284 @@
+"""
+:mod:`edx_ace.circuitbreaker` stops sending messages to a channel whose vendor is failing, so that
+a batch doesn't spend the whole outage retrying each of its messages until they expire.
+
+Circuit breakers are configured per channel name (as listed in ``ACE_ENABLED_CHANNELS``) with the
+``ACE_CHANNEL_CIRCUIT_BREAKERS`` setting, for example::
+
+    ACE_CHANNEL_CIRCUIT_BREAKERS = {
+        'braze_email': {
+            # Open once half of the deliveries of the last minute failed, if there were at least 20 of them...
+            'failure_rate': 0.5,
+            'minimum_calls': 20,
+            'window': 60,
+            # ...and let a trial delivery through after 30 seconds.
+            'reset_timeout': 30,
+        },
+    }
+
+A delivery fails, as far as the breaker is concerned, if it raises a :class:`.RecoverableChannelDeliveryError`
+(other than :class:`.RateLimitExceeded`, which ACE raises itself) or times out. Fatal errors mean that the
+vendor is up, and count as successes.
+
+Each breaker is:
+
+* **closed** while deliveries mostly succeed, and lets them all through;
+* **open** once ``failure_rate`` of the deliveries in the last ``window`` seconds failed: deliveries raise
+  :class:`.CircuitOpenError` straight away, without calling the channel;
+* **half-open** ``reset_timeout`` seconds later: a single trial delivery is let through, which closes the breaker
+  if it succeeds, or opens it again if it fails.
+
+While a channel's breaker is open, :func:`.ace.send` reroutes its messages to the next channel that
+:func:`.get_channels_for_message` lists for them (such as ``ACE_CHANNEL_TRANSACTIONAL_EMAIL`` for a transactional
+message, or the default channel for a message that a campaign channel claimed), unless the
+``ACE_CIRCUIT_BREAKER_FALLBACK`` setting is false. Messages without an available channel fail fast, with a
+``<channel_type>_circuit_open`` report.
+
+Breakers are kept in memory, so each process trips its own.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from enum import Enum
+
+import attr
+
+from django.conf import settings
+
+from edx_ace.errors import (CircuitOpenError, FatalChannelDeliveryError, RateLimitExceeded,
+                            RecoverableChannelDeliveryError)
+from edx_ace.utils.once import once
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+class CircuitState(Enum):
+    """
+    The states of a :class:`CircuitBreaker`.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __str__(self):
+        return str(self.value)
+
+
+@attr.s(eq=False)
+class CircuitBreaker:
+    """
+    Tracks the outcome of the recent deliveries over a channel, and decides whether to allow the next one.
+
+    Arguments:
+        name (str): The name of the channel.
+        failure_rate (float): The fraction of failed deliveries that opens the breaker.
+        minimum_calls (int): How many deliveries must have been made in the window before the breaker can open.
+        window (float): How many seconds of deliveries to consider.
+        reset_timeout (float): How many seconds the breaker stays open before it lets a trial delivery through.
+    """
+
+    name = attr.ib()
+    failure_rate = attr.ib(default=0.5)
+    minimum_calls = attr.ib(default=10)
+    window = attr.ib(default=60)
+    reset_timeout = attr.ib(default=30)
+    _lock = attr.ib(init=False, repr=False, default=attr.Factory(threading.Lock))
+    _calls = attr.ib(init=False, repr=False, default=attr.Factory(deque))
+    _failures = attr.ib(init=False, repr=False, default=0)
+    _state = attr.ib(init=False, default=CircuitState.CLOSED)
+    _opened_at = attr.ib(init=False, repr=False, default=None)
+    _trial_running = attr.ib(init=False, repr=False, default=False)
+
+    @property
+    def state(self):
+        """
+        Returns: :class:`CircuitState`
+        """
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def retry_after(self):
+        """
+        Returns: float
+            How many seconds until an open breaker lets a trial delivery through, ``0`` if it isn't open.
+        """
+        with self._lock:
+            if self._current_state(time.monotonic()) is not CircuitState.OPEN:
+                return 0.0
+            return self._opened_at + self.reset_timeout - time.monotonic()
+
+    def allow(self):
+        """
+        Returns: bool
+            Whether a delivery may be made now. When half-open, this claims the trial delivery, whose outcome
+            must then be recorded (or the claim released).
+        """
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state is CircuitState.CLOSED:
+                return True
+            if state is CircuitState.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Record that a delivery succeeded, which closes a half-open breaker.
+        """
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN:
+                self._close()
+            else:
+                self._record(time.monotonic(), False)
+
+    def record_failure(self):
+        """
+        Record that a delivery failed, which opens a half-open breaker, or a closed one once too many of the
+        deliveries in the window failed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN:
+                self._open(now)
+                return
+            self._record(now, True)
+            if (
+                self._state is CircuitState.CLOSED and
+                len(self._calls) >= self.minimum_calls and
+                self._failures >= self.failure_rate * len(self._calls)
+            ):
+                self._open(now)
+
+    def release(self):
+        """
+        Give up the trial delivery without an outcome, for example because it was rate limited.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def _current_state(self, now):
+        """
+        Returns: :class:`CircuitState`
+            The state of the breaker at ``now``, moving it from open to half-open once ``reset_timeout`` is over.
+        """
+        if self._state is CircuitState.OPEN and now >= self._opened_at + self.reset_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    def _record(self, now, failed):
+        """
+        Add the outcome of a delivery made at ``now`` to the window, and drop the deliveries that have left it.
+        """
+        self._calls.append((now, failed))
+        self._failures += failed
+        while self._calls and self._calls[0][0] <= now - self.window:
+            _, expired_failure = self._calls.popleft()
+            self._failures -= expired_failure
+
+    def _open(self, now):
+        self._state = CircuitState.OPEN
+        self._opened_at = now
+        self._trial_running = False
+
+    def _close(self):
+        self._state = CircuitState.CLOSED
+        self._calls.clear()
+        self._failures = 0
+        self._trial_running = False
+
+
+def breaker_for(channel):
+    """
+    Returns: :class:`CircuitBreaker`
+        The process-wide breaker of ``channel``, or ``None`` if ``ACE_CHANNEL_CIRCUIT_BREAKERS`` doesn't configure one.
+    """
+    channel_name = getattr(channel, 'channel_name', None)
+    config = getattr(settings, 'ACE_CHANNEL_CIRCUIT_BREAKERS', {}).get(channel_name)
+    if not config:
+        return None
+    # A changed configuration gets a new breaker.
+    key = (channel_name, tuple(sorted(config.items())))
+    with _BREAKERS_LOCK:
+        if key not in _BREAKERS:
+            _BREAKERS[key] = CircuitBreaker(channel_name, **config)
+        return _BREAKERS[key]
+
+
+def reset_breakers():
+    """
+    Forget every breaker, closing them all.
+    """
+    with _BREAKERS_LOCK:
+        _BREAKERS.clear()
+
+
+def is_open(channel):
+    """
+    Returns: bool
+        Whether the breaker of ``channel`` is open, so that deliveries over it would fail straight away.
+    """
+    breaker = breaker_for(channel)
+    return breaker is not None and breaker.state is CircuitState.OPEN
+
+
+@once
+def timeout_errors():
+    """
+    Returns: tuple
+        The exception classes that the installed HTTP clients raise when a request times out.
+    """
+    errors = [TimeoutError]
+    try:
+        import requests  # pylint: disable=import-outside-toplevel
+        errors.append(requests.Timeout)
+    except ImportError:
+        pass
+    try:
+        import httpx  # pylint: disable=import-outside-toplevel
+        errors.append(httpx.TimeoutException)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+@contextmanager
+def guard(channel):
+    """
+    Wrap a delivery over ``channel`` in its breaker, if it has one, recording how the delivery went.
+
+    Raises:
+        CircuitOpenError: If the breaker doesn't allow the delivery.
+    """
+    breaker = breaker_for(channel)
+    if breaker is None:
+        yield
+        return
+    if not breaker.allow():
+        raise CircuitOpenError(
+            f'The {breaker.name} circuit breaker is open for another {breaker.retry_after():.1f}s.',
+            channel_name=breaker.name,
+        )
+
+    try:
+        yield
+    except RateLimitExceeded:
+        breaker.release()
+        raise
+    except RecoverableChannelDeliveryError:
+        breaker.record_failure()
+        raise
+    except FatalChannelDeliveryError:
+        breaker.record_success()
+        raise
+    except timeout_errors():
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.record_success()
@@ -3,67 +3,407 @@ Functions for delivering ACE messages.
 
 This is an internal interface used by :func:`.ace.send`.
 """
+import asyncio
+import atexit
 import datetime
+import functools
+import heapq
+import itertools
 import logging
+import threading
 import time
 
+import attr
+from asgiref.sync import sync_to_async
+
 from django.conf import settings
 
-from edx_ace.errors import RecoverableChannelDeliveryError
+from edx_ace import backoff, circuitbreaker, outbox, ratelimit
+from edx_ace.errors import ChannelError, CircuitOpenError, FatalChannelDeliveryError, RecoverableChannelDeliveryError
+from edx_ace.monitoring import time_stage
 from edx_ace.utils.date import get_current_time
+from edx_ace.utils.once import once
 from edx_ace.utils.signals import send_ace_message_sent_signal
 
 LOG = logging.getLogger(__name__)
 
-# Set a maximum expiration delay, for now, since we're currently
-# not using celery to re-enqueue retries and so we could be
-# potentially blocking a worker indefinitely.
+# Set a maximum expiration delay, for now, since retries are either
+# slept through in-process or held in the in-memory RetryScheduler,
+# and so we could be potentially blocking a worker (or holding on
+# to a message) indefinitely.
 #
 # TODO(later): Use celery per channel delivery to be smarter
-# about re-enqueueing and retrying, and to not block workers.
+# about re-enqueueing and retrying durably.
 MAX_EXPIRATION_DELAY = 5 * 60
 
+DEFAULT_RETRY_WORKERS = 2
+
+
+@attr.s
+class _DeliveryState:
+    """
+    The progress of the delivery of one message over one channel, carried from attempt to attempt.
+
+    Arguments:
+        start_time (datetime): When the delivery started.
+        expiration_time (datetime): When to stop attempting it.
+        retry_state (:class:`.RetryState`): The retries made so far.
+    """
+    start_time = attr.ib()
+    expiration_time = attr.ib()
+    retry_state = attr.ib(default=attr.Factory(backoff.RetryState))
+
+    @classmethod
+    def start(cls, message):
+        """
+        Returns: :class:`_DeliveryState`
+            The state of a delivery of ``message`` that starts now.
+        """
+        start_time = get_current_time()
+        return cls(start_time, _get_expiration_time(message, start_time))
+
+
+class RetryScheduler:
+    """
+    A delay queue that runs scheduled callables on a small pool of worker threads.
+
+    Pending items are kept in a heap ordered by the time they are due, so a single
+    pool can hold many delayed delivery attempts without parking a thread per item.
+    The worker threads are daemons that are started on the first call to :meth:`schedule`.
+    Items still pending at :meth:`shutdown` are dropped, after calling their ``on_drop`` callable.
+    """
+
+    def __init__(self, num_workers=DEFAULT_RETRY_WORKERS):
+        self.num_workers = num_workers
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._stopped = False
+
+    def schedule(self, delay_seconds, func, on_drop=None):
+        """
+        Run ``func`` on a worker thread once ``delay_seconds`` have elapsed.
+
+        Args:
+            delay_seconds (float): How long to wait before calling ``func``.
+            func (callable): A callable taking no arguments.
+            on_drop (callable, optional): A callable taking no arguments, called instead of ``func`` if the
+                scheduler is shut down before ``func`` is due.
+        """
+        due = time.monotonic() + max(delay_seconds, 0)
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError('Unable to schedule a retry on a stopped RetryScheduler.')
+            heapq.heappush(self._queue, (due, next(self._sequence), func, on_drop))
+            self._start_workers()
+            self._condition.notify()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._queue)
+
+    def shutdown(self, wait=True):
+        """
+        Stop the worker threads, dropping anything that is still pending once its ``on_drop`` has been called.
+        """
+        with self._condition:
+            self._stopped = True
+            dropped, self._queue = self._queue, []
+            self._condition.notify_all()
+        for _due, _sequence, _func, on_drop in sorted(dropped):
+            if on_drop is None:
+                continue
+            try:
+                on_drop()
+            except Exception:
+                LOG.exception('Handling a dropped delivery retry failed.')
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _start_workers(self):
+        """
+        Start worker threads until there are ``num_workers`` of them. Called with the condition held.
+        """
+        while len(self._workers) < self.num_workers:
+            worker = threading.Thread(
+                target=self._run,
+                name=f'ace-retry-{len(self._workers)}',
+                daemon=True,
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_due(self):
+        """
+        Block until an item is due, returning its callable, or None once the scheduler is stopped.
+        """
+        with self._condition:
+            while not self._stopped:
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                due = self._queue[0][0]
+                remaining = due - time.monotonic()
+                if remaining <= 0:
+                    return heapq.heappop(self._queue)[2]
+                self._condition.wait(remaining)
+            return None
+
+    def _run(self):
+        """
+        The loop of a worker thread: call each item as it becomes due, until the scheduler is stopped.
+        """
+        while True:
+            func = self._next_due()
+            if func is None:
+                return
+            try:
+                func()
+            except Exception:
+                LOG.exception('Scheduled delivery retry failed.')
+
+
+@once
+def retry_scheduler():
+    """
+    Returns: :class:`RetryScheduler`
+        The process-wide scheduler used when ``ACE_DELIVERY_RETRY_SCHEDULER_ENABLED`` is set. It is shut down
+        when the process exits, so that the retries still queued are saved in the outbox, if it is enabled.
+        A retry that is already running at that point can still be lost.
+    """
+    scheduler = RetryScheduler(
+        num_workers=getattr(settings, 'ACE_DELIVERY_RETRY_WORKERS', DEFAULT_RETRY_WORKERS),
+    )
+    atexit.register(scheduler.shutdown, wait=False)
+    return scheduler
+
 
-def deliver(channel, rendered_message, message):
+def deliver(channel, rendered_message, message, use_retry_scheduler=None):
     """
     Deliver a message via a particular channel.
 
+    Deliveries over a channel with a rate limit (see :mod:`edx_ace.ratelimit`) wait for it like for any other
+    recoverable error. How long to wait after the others is decided by the channel's backoff policy
+    (see :mod:`edx_ace.backoff`). Deliveries over a channel whose circuit breaker is open
+    (see :mod:`edx_ace.circuitbreaker`) fail straight away, including the retries of a delivery that was
+    already under way when it opened.
+
+    When the ``ACE_DELIVERY_RETRY_SCHEDULER_ENABLED`` setting is true, recoverable errors do not
+    block the calling thread: the next attempt is handed to the :func:`retry_scheduler` and this
+    function returns immediately.
+
+    Messages that expire or fail with a :class:`.FatalChannelDeliveryError` are saved in the outbox, if it is
+    enabled (see :mod:`edx_ace.outbox`).
+
     Args:
         channel (Channel): The channel to deliver the message over.
         rendered_message (object): Each attribute of this object contains rendered content.
         message (Message): The message that is being sent.
+        use_retry_scheduler (bool, optional): Whether to hand retries to the :func:`retry_scheduler`,
+            overriding the ``ACE_DELIVERY_RETRY_SCHEDULER_ENABLED`` setting.
+
+    Returns:
+        bool: True if the message was delivered, False if it expired before delivery succeeded,
+        or None if a retry was scheduled and the outcome is not yet known.
 
     Raises:
         :class:`.UnsupportedChannelError`: If no channel of the requested channel type is available.
+        :class:`.CircuitOpenError`: If the channel's circuit breaker is open.
 
     """
     logger = message.get_message_specific_logger(LOG)
     channel_type = channel.channel_type
 
-    timeout_seconds = getattr(settings, 'ACE_DEFAULT_EXPIRATION_DELAY', 120)
-    start_time = get_current_time()
-    default_expiration_time = start_time + datetime.timedelta(seconds=timeout_seconds)
-    max_expiration_time = start_time + datetime.timedelta(seconds=MAX_EXPIRATION_DELAY)
-    expiration_time = min(max_expiration_time, message.expiration_time or default_expiration_time)
+    state = _DeliveryState.start(message)
 
     logger.debug('Attempting delivery of message')
-    while get_current_time() < expiration_time:
+    if use_retry_scheduler is None:
+        use_retry_scheduler = getattr(settings, 'ACE_DELIVERY_RETRY_SCHEDULER_ENABLED', False)
+    if use_retry_scheduler:
+        return _attempt_delivery(channel, rendered_message, message, state)
+
+    while get_current_time() < state.expiration_time:
         try:
-            channel.deliver(message, rendered_message)
+            _channel_deliver(channel, rendered_message, message)
         except RecoverableChannelDeliveryError as delivery_error:
-            num_seconds = (delivery_error.next_attempt_time - get_current_time()).total_seconds()
-            logger.info('Encountered a recoverable delivery error.')
-            if delivery_error.next_attempt_time > expiration_time:
-                logger.error('Message will expire before delivery can be reattempted, aborting.')
+            num_seconds = _retry_delay(channel, delivery_error, message, state)
+            if num_seconds is None:
                 break
             logger.debug('Sleeping for %d seconds before reattempting delivery of message.', num_seconds)
-            time.sleep(num_seconds)
+            with time_stage('retry.sleep', message, channel_type):
+                time.sleep(num_seconds)
             message.report(f'{channel_type}_delivery_retried', num_seconds)
         else:
             message.report(f'{channel_type}_delivery_succeeded', True)
             send_ace_message_sent_signal(channel, message)
-            return
+            return True
+
+    _report_expired(channel, message, state.start_time)
+    return False
+
+
+async def adeliver(channel, rendered_message, message):
+    """
+    Deliver a message via a particular channel, without blocking the event loop.
+
+    This is the asyncio counterpart of :func:`deliver`: it calls :meth:`.Channel.adeliver` and
+    waits between attempts with :func:`asyncio.sleep`, so many in-flight messages can share one loop.
+
+    Args:
+        channel (Channel): The channel to deliver the message over.
+        rendered_message (object): Each attribute of this object contains rendered content.
+        message (Message): The message that is being sent.
+
+    Returns:
+        bool: True if the message was delivered, False if it expired before delivery succeeded.
+    """
+    logger = message.get_message_specific_logger(LOG)
+    channel_type = channel.channel_type
+
+    state = _DeliveryState.start(message)
+
+    logger.debug('Attempting delivery of message')
+    while get_current_time() < state.expiration_time:
+        try:
+            await _channel_adeliver(channel, rendered_message, message)
+        except RecoverableChannelDeliveryError as delivery_error:
+            num_seconds = _retry_delay(channel, delivery_error, message, state)
+            if num_seconds is None:
+                break
+            logger.debug('Sleeping for %d seconds before reattempting delivery of message.', num_seconds)
+            with time_stage('retry.sleep', message, channel_type):
+                await asyncio.sleep(num_seconds)
+            message.report(f'{channel_type}_delivery_retried', num_seconds)
+        else:
+            message.report(f'{channel_type}_delivery_succeeded', True)
+            await sync_to_async(send_ace_message_sent_signal)(channel, message)
+            return True
+
+    await sync_to_async(_report_expired)(channel, message, state.start_time)
+    return False
+
+
+def _channel_deliver(channel, rendered_message, message):
+    """
+    Make one call to :meth:`.Channel.deliver`, once the channel's rate limit and circuit breaker allow it.
+
+    Raises:
+        RateLimitExceeded: If the channel's rate limit is used up.
+        CircuitOpenError: If the channel's circuit breaker is open.
+    """
+    ratelimit.check_rate_limit(channel)
+    try:
+        with circuitbreaker.guard(channel), time_stage('channel.deliver', message, channel.channel_type):
+            channel.deliver(message, rendered_message)
+    except FatalChannelDeliveryError as error:
+        outbox.save(channel, message, f'{type(error).__name__}: {error}')
+        raise
+
+
+async def _channel_adeliver(channel, rendered_message, message):
+    """
+    The asyncio counterpart of :func:`_channel_deliver`.
+    """
+    # Rate limit backends may block, for example on a file lock, so take the token off the event loop.
+    await sync_to_async(ratelimit.check_rate_limit, thread_sensitive=False)(channel)
+    try:
+        with circuitbreaker.guard(channel), time_stage('channel.deliver', message, channel.channel_type):
+            await channel.adeliver(message, rendered_message)
+    except FatalChannelDeliveryError as error:
+        await sync_to_async(outbox.save)(channel, message, f'{type(error).__name__}: {error}')
+        raise
+
+
+def _get_expiration_time(message, start_time):
+    """ The time after which delivery of ``message`` should no longer be attempted. """
+    timeout_seconds = getattr(settings, 'ACE_DEFAULT_EXPIRATION_DELAY', 120)
+    default_expiration_time = start_time + datetime.timedelta(seconds=timeout_seconds)
+    max_expiration_time = start_time + datetime.timedelta(seconds=MAX_EXPIRATION_DELAY)
+    return min(max_expiration_time, message.expiration_time or default_expiration_time)
 
-    delivery_expired_report = f'{channel_type}_delivery_expired'
+
+def _retry_delay(channel, delivery_error, message, state):
+    """
+    Returns:
+        float: How many seconds to wait before re-attempting delivery after ``delivery_error``
+        (see :func:`.backoff.retry_delay`), or None if it shouldn't be re-attempted.
+    """
+    logger = message.get_message_specific_logger(LOG)
+    logger.info('Encountered a recoverable delivery error.')
+    now = get_current_time()
+    num_seconds = backoff.retry_delay(channel, delivery_error, state.retry_state, now)
+    if num_seconds is None:
+        logger.error('Message has used up its retries, aborting.')
+        message.report(f'{channel.channel_type}_delivery_retries_exhausted', state.retry_state.attempts - 1)
+        return None
+    if now + datetime.timedelta(seconds=num_seconds) > state.expiration_time:
+        logger.error('Message will expire before delivery can be reattempted, aborting.')
+        return None
+    return num_seconds
+
+
+def _attempt_delivery(channel, rendered_message, message, state):
+    """
+    Make a single delivery attempt, scheduling the next one on a recoverable error.
+
+    Args:
+        state (_DeliveryState): The progress of the delivery, which is updated.
+
+    Returns:
+        bool: True if the message was delivered, False if it expired, or None if a retry was scheduled.
+    """
+    logger = message.get_message_specific_logger(LOG)
+    channel_type = channel.channel_type
+
+    if get_current_time() >= state.expiration_time:
+        _report_expired(channel, message, state.start_time)
+        return False
+
+    try:
+        _channel_deliver(channel, rendered_message, message)
+    except RecoverableChannelDeliveryError as delivery_error:
+        num_seconds = _retry_delay(channel, delivery_error, message, state)
+        if num_seconds is None:
+            _report_expired(channel, message, state.start_time)
+            return False
+        logger.debug('Scheduling reattempt of message delivery in %d seconds.', num_seconds)
+        message.report(f'{channel_type}_delivery_retried', num_seconds)
+        retry_scheduler().schedule(
+            num_seconds,
+            functools.partial(_retry_delivery, channel, rendered_message, message, state),
+            on_drop=functools.partial(_save_dropped_retry, channel, message),
+        )
+        return None
+
+    message.report(f'{channel_type}_delivery_succeeded', True)
+    send_ace_message_sent_signal(channel, message)
+    return True
+
+
+def _retry_delivery(channel, rendered_message, message, state):
+    """
+    Run a scheduled delivery attempt, reporting channel errors since there is no caller left to handle them.
+    """
+    try:
+        _attempt_delivery(channel, rendered_message, message, state)
+    except CircuitOpenError as error:
+        message.report(f'{channel.channel_type}_circuit_open', str(error))
+        outbox.save(channel, message, f'{type(error).__name__}: {error}')
+    except ChannelError as error:
+        message.report(f'{channel.channel_type}_error', str(error))
+
+
+def _save_dropped_retry(channel, message):
+    """ Save a message whose scheduled retry was dropped, because the process is exiting, in the outbox. """
+    outbox.save(channel, message, f'{channel.channel_type}_delivery_retry_dropped')
+
+
+def _report_expired(channel, message, start_time):
+    """ Log and report that the message expired before it could be delivered. """
+    logger = message.get_message_specific_logger(LOG)
+    delivery_expired_report = f'{channel.channel_type}_delivery_expired'
     logger.info(delivery_expired_report)
     message.report(delivery_expired_report, get_current_time() - start_time)
+    outbox.save(channel, message, delivery_expired_report)
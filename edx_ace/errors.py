@@ -14,10 +14,29 @@ class ChannelError(Exception):
 
 
 class RecoverableChannelDeliveryError(ChannelError):
-    """An error occurred during channel delivery that is non-fatal. The caller should re-attempt at a later time."""
+    """
+    An error occurred during channel delivery that is non-fatal. The caller should re-attempt at a later time.
 
-    def __init__(self, message, next_attempt_time):
+    ``next_attempt_time`` is when the channel suggests re-attempting, which an ``ACE_CHANNEL_BACKOFF`` policy
+    replaces (see :mod:`edx_ace.backoff`), unless ``vendor_requested`` is true because the vendor said when to.
+    """
+
+    def __init__(self, message, next_attempt_time, vendor_requested=False):
         self.next_attempt_time = next_attempt_time
+        self.vendor_requested = vendor_requested
+        super().__init__(message)
+
+
+class RateLimitExceeded(RecoverableChannelDeliveryError):
+    """A channel's ``ACE_CHANNEL_RATE_LIMITS`` limit is used up. Re-attempt at ``next_attempt_time``."""
+    pass
+
+
+class CircuitOpenError(ChannelError):
+    """A channel's circuit breaker is open, so delivery was not attempted. See :mod:`edx_ace.circuitbreaker`."""
+
+    def __init__(self, message, channel_name=None):
+        self.channel_name = channel_name
         super().__init__(message)
 
 
@@ -34,3 +53,12 @@ class UnsupportedChannelError(ChannelError):
 class InvalidMessageError(Exception):
     """Encountered a message that cannot be sent due to missing or inconsistent information."""
     pass
+
+
+class RenderTimeBudgetExceeded(Exception):
+    """Rendering a message took longer than the ``ACE_RENDER_TIME_BUDGET`` setting allows."""
+
+    def __init__(self, message, template_name=None, elapsed=None):
+        self.template_name = template_name
+        self.elapsed = elapsed
+        super().__init__(message)
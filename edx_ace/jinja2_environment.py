@@ -0,0 +1,56 @@
+"""
+:mod:`edx_ace.jinja2_environment` provides a Jinja2 environment for rendering ACE messages
+with Django's Jinja2 template backend.
+
+Example:
+
+    Sample settings::
+
+        TEMPLATES = [
+            {'BACKEND': 'django.template.backends.django.DjangoTemplates', ...},
+            {
+                'NAME': 'ace_jinja2',
+                'BACKEND': 'django.template.backends.jinja2.Jinja2',
+                'DIRS': [...],
+                'OPTIONS': {'environment': 'edx_ace.jinja2_environment.environment'},
+            },
+        ]
+
+        # Render every message with Jinja2...
+        ACE_TEMPLATE_ENGINE = 'ace_jinja2'
+        # ...or only the message types that set ``options={'template_engine': 'ace_jinja2'}``.
+
+        # Where compiled templates are cached between processes (defaults to a per-user temporary directory).
+        ACE_JINJA2_BYTECODE_CACHE_DIR = '/var/cache/edx-ace/jinja2'
+
+Jinja2 templates use the same ``<app_label>/edx_ace/<name>/<channel_type>/`` layout as Django templates,
+and get the same ``message`` and ``channel`` context. ``get_action_links(channel)`` is available as a
+global function; the ``acetags`` template tags are not.
+"""
+import jinja2
+
+from django.conf import settings
+
+
+def get_action_links(channel, omit_unsubscribe_link=False):
+    """
+    The Jinja2 counterpart of the ``get_action_links`` template tag.
+    """
+    if getattr(channel, 'get_action_links', None):
+        return channel.get_action_links(omit_unsubscribe_link=omit_unsubscribe_link)
+    return []
+
+
+def environment(**options):
+    """
+    Returns: :class:`jinja2.Environment`
+        An environment that keeps compiled templates in a filesystem bytecode cache
+        (``ACE_JINJA2_BYTECODE_CACHE_DIR``), unless the backend's options set a ``bytecode_cache``.
+    """
+    options.setdefault(
+        'bytecode_cache',
+        jinja2.FileSystemBytecodeCache(getattr(settings, 'ACE_JINJA2_BYTECODE_CACHE_DIR', None)),
+    )
+    env = jinja2.Environment(**options)
+    env.globals['get_action_links'] = get_action_links
+    return env
@@ -0,0 +1,28 @@
+"""
+List the context variables that the templates of every ACE message read.
+"""
+from django.core.management.base import BaseCommand
+
+from edx_ace.message import Message
+from edx_ace.presentation import context_variables, discover_message_templates
+
+
+class Command(BaseCommand):
+    """
+    Finds every message with templates, and prints the context variables its templates read.
+    These are the keys that ``ACE_PRUNE_MESSAGE_CONTEXT`` keeps in ``Message.context``.
+
+    Example::
+
+        ./manage.py ace_context_variables
+    """
+    help = 'List the context variables that the templates of every ACE message read.'
+
+    def handle(self, *args, **options):
+        messages = sorted({(app_label, name) for app_label, name, _channel_type in discover_message_templates()})
+        for app_label, name in messages:
+            variables = context_variables(Message(app_label=app_label, name=name, recipient=None))
+            if variables is None:
+                self.stdout.write(f'{app_label}.{name}: (any variable; the templates cannot be analyzed)')
+            else:
+                self.stdout.write(f'{app_label}.{name}: {", ".join(sorted(variables))}')
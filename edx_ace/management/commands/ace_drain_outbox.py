@@ -0,0 +1,39 @@
+"""
+Redeliver the messages saved in the ACE outbox.
+"""
+from django.core.management.base import BaseCommand
+
+from edx_ace.outbox import drain
+
+
+class Command(BaseCommand):
+    """
+    Renders and delivers the messages that ``ACE_OUTBOX_ENABLED`` saved in the outbox (see :mod:`edx_ace.outbox`),
+    oldest first, and removes those that are delivered.
+
+    Example::
+
+        ./manage.py ace_drain_outbox --channel braze_email --rate 50 --max-attempts 3
+    """
+    help = 'Redeliver the messages saved in the ACE outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='The most messages to redeliver.')
+        parser.add_argument(
+            '--channel', action='append', dest='channel_names',
+            help='Only redeliver the messages of this channel. Can be repeated.',
+        )
+        parser.add_argument(
+            '--max-attempts', type=int,
+            help='Skip the messages that have already failed to be redelivered this many times.',
+        )
+        parser.add_argument('--rate', type=float, help='The most messages to redeliver per second.')
+
+    def handle(self, *args, **options):
+        outcomes = drain(
+            limit=options['limit'],
+            channel_names=options['channel_names'],
+            max_attempts=options['max_attempts'],
+            rate=options['rate'],
+        )
+        self.stdout.write(f'Delivered {outcomes["delivered"]} message(s), {outcomes["failed"]} failed.')
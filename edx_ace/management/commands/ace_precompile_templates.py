@@ -0,0 +1,31 @@
+"""
+Compile and validate the templates of every ACE message.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from edx_ace.presentation import discover_message_templates, precompile_templates
+
+
+class Command(BaseCommand):
+    """
+    Finds every ``<app_label>/edx_ace/<name>/<channel_type>/`` template directory, compiles the
+    templates each message needs, and reports any that are missing or broken.
+
+    Example::
+
+        ./manage.py ace_precompile_templates
+    """
+    help = 'Compile the templates of every ACE message, and report any that are missing or broken.'
+
+    def handle(self, *args, **options):
+        found = discover_message_templates()
+        for app_label, name, channel_type in found:
+            self.stdout.write(f'{app_label}/edx_ace/{name}/{channel_type.value}/')
+
+        problems = precompile_templates()
+        for template_path, error in problems:
+            self.stderr.write(f'{template_path}: {type(error).__name__}: {error}')
+
+        if problems:
+            raise CommandError(f'{len(problems)} ACE template(s) are missing or broken.')
+        self.stdout.write(self.style.SUCCESS(f'Compiled the templates of {len(found)} ACE message(s).'))
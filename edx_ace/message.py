@@ -231,9 +231,11 @@ class MessageType(MessageAttributeSerializationMixin):
         Returns: A new :class:`.Message` that has been personalized to a
             specific recipient.
         """
+        from edx_ace import presentation  # pylint: disable=import-outside-toplevel
+
         context = dict(self.context)
         context.update(user_context)
-        return Message(
+        message = Message(
             app_label=self.app_label,
             name=self.name,
             expiration_time=self.expiration_time,
@@ -244,6 +246,9 @@ class MessageType(MessageAttributeSerializationMixin):
             log_level=self.log_level,
             options=self.options,
         )
+        # Prune before the message is serialized to be queued, rather than when it is sent.
+        presentation.prune_context(message)
+        return message
 
     # We override these so that a subtype of MessageType can compare equal
     # to a deserialized non-subtyped MessageType
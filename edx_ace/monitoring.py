@@ -1,9 +1,356 @@
 """
 :mod:`edx_ace.monitoring` exposes functions that are useful for reporting ACE
 message delivery stats to monitoring services.
+
+In addition to the per-message custom attributes sent by :func:`report`, each stage
+of the send pipeline can be timed with :func:`time_stage`. Timings are recorded in a
+:class:`MetricsSink` when the ``ACE_METRICS_ENABLED`` setting is true. The sink class is
+configured by the ``ACE_METRICS_SINK`` setting and defaults to :class:`InProcessMetricsSink`.
+
+When ``ACE_TEMPLATE_PROFILING_ENABLED`` is true, the render time of every template is also
+kept by the :class:`TemplateProfiler`, whose :meth:`~TemplateProfiler.slowest` method lists
+the slowest templates.
+
+Dry runs of the send pipeline, which render messages without delivering them, are summarized
+by a :class:`DryRunReport`.
 """
+import bisect
+import contextlib
+import threading
+import time
+
 from edx_django_utils.monitoring import set_custom_attribute
 
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from edx_ace.utils.once import once
+
+DEFAULT_METRICS_SINK = 'edx_ace.monitoring.InProcessMetricsSink'
+DEFAULT_SLOW_TEMPLATE_REPORT_SIZE = 10
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+HISTOGRAM_BUCKETS = (
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1, 2.5, 5,
+    10, 30, 60,
+    float('inf'),
+)
+
+# Upper bounds, in bytes, of the rendered message size histogram buckets.
+SIZE_BUCKETS = tuple(2 ** power for power in range(8, 25)) + (float('inf'),)
+
+_NULL_TIMER = contextlib.nullcontext()
+
 
 def report(key, value):
     set_custom_attribute(key, value)
+
+
+class Histogram:
+    """
+    A fixed-bucket histogram of durations, in seconds (or of other values, given other ``buckets``).
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        """
+        Add a single duration to the histogram.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """
+        Returns: float
+            The upper bound of the bucket containing the given percentile, capped at the largest observed value.
+        """
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket, self.max)
+        return self.max  # pragma: no cover
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+        }
+
+
+class MetricsSink:
+    """
+    Receives the timings of the stages of the send pipeline.
+
+    Subclasses can forward timings to a metrics service. They are instantiated once per process
+    without any arguments.
+    """
+
+    def record_timing(self, stage, seconds, channel_type=None, message_name=None):
+        """
+        Record how long a stage of the pipeline took.
+
+        Args:
+            stage (str): The stage that was timed, e.g. ``presentation.render``.
+            seconds (float): The duration of the stage.
+            channel_type (str): The channel type the stage ran for, if any.
+            message_name (str): The :attr:`.Message.unique_name` of the message being sent.
+        """
+        raise NotImplementedError()
+
+
+class InProcessMetricsSink(MetricsSink):
+    """
+    Keeps a :class:`Histogram` per stage, channel type and message name in memory.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record_timing(self, stage, seconds, channel_type=None, message_name=None):
+        key = (stage, channel_type, message_name)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def histogram(self, stage, channel_type=None, message_name=None):
+        """
+        Returns: :class:`Histogram`
+            The histogram for the given labels, or None if nothing has been recorded for them.
+        """
+        return self._histograms.get((stage, channel_type, message_name))
+
+    def snapshot(self):
+        """
+        Returns: dict
+            A summary of every histogram, keyed by ``(stage, channel_type, message_name)``.
+        """
+        with self._lock:
+            return {key: histogram.to_dict() for key, histogram in self._histograms.items()}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+
+class TemplateProfiler:
+    """
+    Keeps a :class:`Histogram` of the render times of each template, to find the slowest ones.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, template_name, seconds):
+        """
+        Add a render of ``template_name`` that took ``seconds`` to its histogram.
+        """
+        with self._lock:
+            histogram = self._histograms.get(template_name)
+            if histogram is None:
+                histogram = self._histograms[template_name] = Histogram()
+            histogram.observe(seconds)
+
+    def slowest(self, count=None):
+        """
+        Args:
+            count (int): How many templates to return. Defaults to ``ACE_SLOW_TEMPLATE_REPORT_SIZE``.
+
+        Returns: list
+            ``(template name, summary)`` pairs for the templates with the longest single render time,
+            slowest first. Each summary is a :meth:`Histogram.to_dict`.
+        """
+        if count is None:
+            count = getattr(settings, 'ACE_SLOW_TEMPLATE_REPORT_SIZE', DEFAULT_SLOW_TEMPLATE_REPORT_SIZE)
+        with self._lock:
+            summaries = [(name, histogram.to_dict()) for name, histogram in self._histograms.items()]
+        summaries.sort(key=lambda summary: summary[1]['max'], reverse=True)
+        return summaries[:count]
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+
+TEMPLATE_PROFILER = TemplateProfiler()
+
+
+def template_profiler():
+    """
+    Returns: :class:`TemplateProfiler`
+        The process-wide template profiler, or None if ``ACE_TEMPLATE_PROFILING_ENABLED`` is not set.
+    """
+    if not getattr(settings, 'ACE_TEMPLATE_PROFILING_ENABLED', False):
+        return None
+    return TEMPLATE_PROFILER
+
+
+class DryRunReport:
+    """
+    Aggregates what a dry run of the send pipeline rendered (see :func:`.ace.send_many`): how many
+    messages and renders, how fast, and how big the rendered messages were.
+
+    Sizes only include the fields that each channel reads (its :attr:`~.Channel.rendered_fields`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.finished = self.started
+        self.messages = 0
+        self.outcomes = {}
+        self._render_times = {}
+        self._sizes = {}
+        self._field_bytes = {}
+
+    def record_render(self, channel_type, seconds, field_sizes):
+        """
+        Record rendering a message for a channel.
+
+        Arguments:
+            channel_type (ChannelType): The channel type the message was rendered for.
+            seconds (float): How long rendering took (None if it's unknown, for messages rendered in advance).
+            field_sizes (dict): The size in bytes of each rendered field.
+        """
+        key = str(channel_type)
+        with self._lock:
+            if key not in self._sizes:
+                self._render_times[key] = Histogram()
+                self._sizes[key] = Histogram(SIZE_BUCKETS)
+                self._field_bytes[key] = {}
+            if seconds is not None:
+                self._render_times[key].observe(seconds)
+            self._sizes[key].observe(sum(field_sizes.values()))
+            field_bytes = self._field_bytes[key]
+            for field, size in field_sizes.items():
+                field_bytes[field] = field_bytes.get(field, 0) + size
+            self.finished = time.perf_counter()
+
+    def record_message(self, outcomes):
+        """
+        Record the outcome of each channel for one message.
+        """
+        with self._lock:
+            self.messages += 1
+            for outcome in outcomes.values():
+                self.outcomes[str(outcome)] = self.outcomes.get(str(outcome), 0) + 1
+            self.finished = time.perf_counter()
+
+    def summary(self):
+        """
+        Returns: dict
+            The totals and rates of the run so far, with the render time and size distribution
+            (as :meth:`Histogram.to_dict`) and the bytes of each field for every channel type.
+        """
+        with self._lock:
+            elapsed = self.finished - self.started
+            renders = sum(histogram.count for histogram in self._sizes.values())
+            return {
+                'messages': self.messages,
+                'renders': renders,
+                'elapsed_seconds': elapsed,
+                'messages_per_second': self.messages / elapsed if elapsed else None,
+                'renders_per_second': renders / elapsed if elapsed else None,
+                'outcomes': dict(self.outcomes),
+                'channels': {
+                    key: {
+                        'render_seconds': self._render_times[key].to_dict(),
+                        'bytes': sizes.to_dict(),
+                        'field_bytes': dict(self._field_bytes[key]),
+                    }
+                    for key, sizes in self._sizes.items()
+                },
+            }
+
+
+# Collects the dry runs enabled by the ``ACE_DRY_RUN`` setting.
+DRY_RUN_REPORT = DryRunReport()
+
+
+@once
+def _configured_sink():
+    return import_string(getattr(settings, 'ACE_METRICS_SINK', DEFAULT_METRICS_SINK))()
+
+
+def metrics_sink():
+    """
+    Returns: :class:`MetricsSink`
+        The process-wide metrics sink, or None if ``ACE_METRICS_ENABLED`` is not set.
+    """
+    if not getattr(settings, 'ACE_METRICS_ENABLED', False):
+        return None
+    return _configured_sink()
+
+
+class _StageTimer:
+    """
+    Times a ``with`` block on a monotonic clock and records it in a :class:`MetricsSink`.
+    """
+    __slots__ = ('sink', 'stage', 'channel_type', 'message_name', 'start')
+
+    def __init__(self, sink, stage, channel_type, message_name):
+        self.sink = sink
+        self.stage = stage
+        self.channel_type = channel_type
+        self.message_name = message_name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sink.record_timing(
+            self.stage,
+            time.perf_counter() - self.start,
+            channel_type=self.channel_type,
+            message_name=self.message_name,
+        )
+
+
+def time_stage(stage, message, channel_type=None):
+    """
+    Returns a context manager that times a stage of sending ``message``.
+
+    When metrics are disabled this is a shared no-op context manager, so instrumented
+    code pays only for a settings lookup.
+
+    Example::
+
+        with time_stage('presentation.render', message, channel.channel_type):
+            rendered_message = presentation.render(channel, message)
+    """
+    sink = metrics_sink()
+    if sink is None:
+        return _NULL_TIMER
+    return _StageTimer(
+        sink,
+        stage,
+        str(channel_type) if channel_type is not None else None,
+        message.unique_name,
+    )
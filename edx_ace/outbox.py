@@ -0,0 +1,280 @@
+"""
+:mod:`edx_ace.outbox` keeps the messages that could not be delivered, so that they can be redelivered later
+without re-running the job that sent them.
+
+When the ``ACE_OUTBOX_ENABLED`` setting is true, a message whose delivery over a channel expires (including when
+its retries run out), fails with a :class:`.FatalChannelDeliveryError`, fails fast because the channel's circuit
+breaker is open, or whose scheduled retry is still queued when the process exits, is saved in the outbox,
+serialized along with the name of the channel. The ``ace_drain_outbox`` management command (see :func:`drain`)
+then renders and delivers the saved messages again, and removes those that are delivered.
+
+The outbox is kept by an :class:`OutboxBackend`, set by the ``ACE_OUTBOX_BACKEND`` setting. The default
+:class:`SQLiteBackend` keeps it in the SQLite database at ``ACE_OUTBOX_SQLITE_PATH``, which must be set to
+a path on durable storage that every process sending messages on the host can write to.
+"""
+import contextvars
+import sqlite3
+import time
+from collections import Counter
+from contextlib import closing, contextmanager
+
+import attr
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.template import TemplateDoesNotExist
+from django.utils.module_loading import import_string
+
+from edx_ace.channel import ChannelType, channels
+from edx_ace.errors import ChannelError, RenderTimeBudgetExceeded
+from edx_ace.message import Message
+from edx_ace.ratelimit import LocalBackend
+from edx_ace.utils.once import once
+
+DEFAULT_OUTBOX_BACKEND = 'edx_ace.outbox.SQLiteBackend'
+
+# Set while draining, so that messages that fail again aren't saved a second time.
+_DRAINING = contextvars.ContextVar('ace_outbox_draining', default=False)
+
+
+@attr.s(frozen=True)
+class OutboxEntry:
+    """
+    A message saved in the outbox.
+
+    Arguments:
+        id (int): The identifier of the entry in the backend.
+        channel_type (:class:`.ChannelType`): The type of the channel the message was sent over.
+        channel_name (str): The name of the channel the message was sent over.
+        message (str): The message, serialized with ``str(message)``.
+        reason (str): Why the last delivery failed.
+        attempts (int): How many times :func:`drain` failed to redeliver the message.
+    """
+    id = attr.ib()
+    channel_type = attr.ib()
+    channel_name = attr.ib()
+    message = attr.ib()
+    reason = attr.ib()
+    attempts = attr.ib(default=0)
+
+
+class OutboxBackend:
+    """
+    Keeps the outbox. Backends are instantiated once per process without any arguments, and must be safe to use
+    from several threads (and several processes, if they share the outbox).
+    """
+
+    def add(self, channel_type, channel_name, message, reason):
+        """
+        Save a message.
+
+        Arguments:
+            channel_type (:class:`.ChannelType`): The type of the channel the message was sent over.
+            channel_name (str): The name of the channel the message was sent over.
+            message (str): The serialized message.
+            reason (str): Why its delivery failed.
+        """
+        raise NotImplementedError()
+
+    def pending(self, limit=None, channel_names=None, max_attempts=None):
+        """
+        Returns: list
+            The saved :class:`OutboxEntry`, oldest first.
+
+        Arguments:
+            limit (int): The most entries to return.
+            channel_names (list): Only return the entries of these channels.
+            max_attempts (int): Only return the entries that failed to be redelivered fewer times than this.
+        """
+        raise NotImplementedError()
+
+    def remove(self, entry_id):
+        """
+        Remove an entry, once its message has been delivered.
+        """
+        raise NotImplementedError()
+
+    def record_failure(self, entry_id, reason):
+        """
+        Record that an entry's message could not be redelivered.
+        """
+        raise NotImplementedError()
+
+
+class SQLiteBackend(OutboxBackend):
+    """
+    Keeps the outbox in a SQLite database, at the ``ACE_OUTBOX_SQLITE_PATH`` setting's path.
+
+    Raises:
+        ImproperlyConfigured: If ``ACE_OUTBOX_SQLITE_PATH`` isn't set. There is no default, since a temporary
+            directory may not outlive the messages saved in it.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, 'ACE_OUTBOX_SQLITE_PATH', None)
+        if not self.path:
+            raise ImproperlyConfigured('ACE_OUTBOX_SQLITE_PATH must be set to keep the ACE outbox in SQLite.')
+        with self._connection() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS ace_outbox ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'channel_type TEXT NOT NULL, '
+                'channel_name TEXT NOT NULL, '
+                'message TEXT NOT NULL, '
+                'reason TEXT NOT NULL, '
+                'attempts INTEGER NOT NULL DEFAULT 0, '
+                'created REAL NOT NULL, '
+                'updated REAL NOT NULL)'
+            )
+
+    @contextmanager
+    def _connection(self):
+        """
+        A connection to the database, whose changes are committed at the end of the block.
+        """
+        # A connection per operation, since connections can't be shared between threads.
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            with connection:
+                yield connection
+
+    def add(self, channel_type, channel_name, message, reason):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT INTO ace_outbox (channel_type, channel_name, message, reason, created, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (channel_type.value, channel_name, message, reason, now, now),
+            )
+
+    def pending(self, limit=None, channel_names=None, max_attempts=None):
+        query = 'SELECT id, channel_type, channel_name, message, reason, attempts FROM ace_outbox WHERE 1 = 1'
+        parameters = []
+        if channel_names:
+            query += f' AND channel_name IN ({", ".join("?" * len(channel_names))})'
+            parameters.extend(channel_names)
+        if max_attempts is not None:
+            query += ' AND attempts < ?'
+            parameters.append(max_attempts)
+        query += ' ORDER BY id'
+        if limit is not None:
+            query += ' LIMIT ?'
+            parameters.append(limit)
+        with self._connection() as connection:
+            rows = connection.execute(query, parameters).fetchall()
+        return [
+            OutboxEntry(
+                id=entry_id,
+                channel_type=ChannelType(channel_type),
+                channel_name=channel_name,
+                message=message,
+                reason=reason,
+                attempts=attempts,
+            )
+            for entry_id, channel_type, channel_name, message, reason, attempts in rows
+        ]
+
+    def remove(self, entry_id):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM ace_outbox WHERE id = ?', (entry_id,))
+
+    def record_failure(self, entry_id, reason):
+        with self._connection() as connection:
+            connection.execute(
+                'UPDATE ace_outbox SET attempts = attempts + 1, reason = ?, updated = ? WHERE id = ?',
+                (reason, time.time(), entry_id),
+            )
+
+
+@once
+def outbox_backend():
+    """
+    Returns: :class:`OutboxBackend`
+        The process-wide backend configured by ``ACE_OUTBOX_BACKEND``.
+    """
+    return import_string(getattr(settings, 'ACE_OUTBOX_BACKEND', DEFAULT_OUTBOX_BACKEND))()
+
+
+def save(channel, message, reason):
+    """
+    Save ``message`` in the outbox if ``ACE_OUTBOX_ENABLED`` is set, since it could not be delivered over ``channel``.
+
+    Arguments:
+        reason (str): Why the delivery failed.
+    """
+    channel_name = getattr(channel, 'channel_name', None)
+    if not getattr(settings, 'ACE_OUTBOX_ENABLED', False) or not channel_name or _DRAINING.get():
+        return
+    outbox_backend().add(channel.channel_type, channel_name, str(message), reason)
+    message.report(f'{channel.channel_type}_outboxed', reason)
+
+
+def drain(limit=None, channel_names=None, max_attempts=None, rate=None):
+    """
+    Render and deliver the messages in the outbox again, oldest first.
+
+    Messages that are delivered are removed from the outbox; the others stay there, with their failure recorded.
+    Deliveries are subject to the channels' rate limits (see :mod:`edx_ace.ratelimit`), and their retries
+    block rather than being scheduled, so that each outcome is known before moving on.
+
+    Arguments:
+        limit (int): The most messages to redeliver.
+        channel_names (list): Only redeliver the messages of these channels.
+        max_attempts (int): Skip the messages that have already failed to be redelivered this many times.
+        rate (float): The most messages to redeliver per second, overall.
+
+    Returns: :class:`~collections.Counter`
+        How many messages were ``'delivered'``, and how many ``'failed'``.
+    """
+    backend = outbox_backend()
+    throttle = LocalBackend() if rate else None
+    outcomes = Counter()
+    token = _DRAINING.set(True)
+    try:
+        for entry in backend.pending(limit=limit, channel_names=channel_names, max_attempts=max_attempts):
+            if throttle is not None:
+                _wait_for_token(throttle, rate)
+            failure = _redeliver(entry)
+            if failure is None:
+                backend.remove(entry.id)
+                outcomes['delivered'] += 1
+            else:
+                backend.record_failure(entry.id, failure)
+                outcomes['failed'] += 1
+    finally:
+        _DRAINING.reset(token)
+    return outcomes
+
+
+def _wait_for_token(throttle, rate):
+    """
+    Sleep until ``throttle`` lets another message be redelivered at ``rate`` messages per second.
+    """
+    wait = throttle.take('outbox', rate, 1)
+    while wait > 0:
+        time.sleep(wait)
+        wait = throttle.take('outbox', rate, 1)
+
+
+def _redeliver(entry):
+    """
+    Render and deliver the message of ``entry`` again.
+
+    Returns: str
+        Why the delivery failed, or ``None`` if the message was delivered.
+    """
+    # pylint: disable=import-outside-toplevel
+    from edx_ace import delivery, presentation
+
+    message = Message.from_string(entry.message)
+    # The original expiration time has passed by now.
+    message.expiration_time = None
+    try:
+        channel = channels().get_channel_by_name(entry.channel_type, entry.channel_name)
+    except KeyError:
+        return f'The {entry.channel_name} channel is not enabled.'
+    try:
+        delivered = delivery.deliver(channel, presentation.render(channel, message), message, use_retry_scheduler=False)
+    except (ChannelError, RenderTimeBudgetExceeded, TemplateDoesNotExist) as error:
+        return f'{type(error).__name__}: {error}'
+    return None if delivered else 'The delivery expired.'
@@ -43,6 +43,11 @@ class Policy(metaclass=ABCMeta):
     extension mechanisms for ACE, and are registered using the entrypoint ``openedx.ace.policy``.
     """
 
+    #: The keys of ``message.context`` that :meth:`check` reads, or ``None`` if it may read any of them.
+    #: Pruning (``ACE_PRUNE_MESSAGE_CONTEXT``) keeps these keys in messages whose policies haven't been checked
+    #: yet, and keeps their whole context if a policy doesn't declare its keys.
+    context_keys = None
+
     @classmethod
     def enabled(cls):
         return True
@@ -89,6 +94,21 @@ def channels_for(message):
     return allowed_channels
 
 
+def context_keys():
+    """
+    Returns: frozenset
+        The context keys that the enabled policies read (see :attr:`Policy.context_keys`), or ``None`` if one of
+        them may read any key.
+    """
+    keys = set()
+    for policy in policies():
+        declared = getattr(policy, 'context_keys', None)
+        if declared is None:
+            return None
+        keys.update(declared)
+    return frozenset(keys)
+
+
 @once
 def policies():
     return [
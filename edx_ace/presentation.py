@@ -2,19 +2,166 @@
 An internal module that manages the presentation/rendering step of the
 ACE pipeline.
 """
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+
+import attr
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist, engines
 from django.utils import translation
+from django.utils.autoreload import file_changed
 
-from edx_ace import errors, renderers
+from edx_ace import errors, policy, renderers, transforms
 from edx_ace.channel import ChannelType
+from edx_ace.message import Message
+from edx_ace.serialization import MessageEncoder
+from edx_ace.utils.once import once
+
+LOG = logging.getLogger(__name__)
 
 RENDERERS = {
     ChannelType.EMAIL: renderers.EmailRenderer(),
     ChannelType.PUSH: renderers.PushNotificationRenderer(),
 }
 
+DEFAULT_RENDER_CACHE_SIZE = 1024
+DEFAULT_RENDER_CACHE_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_CONTEXT_VARIABLES_CACHE_SIZE = 256
+
+# Context keys that are read by channels rather than by templates, so are never pruned.
+ALWAYS_KEPT_CONTEXT_KEYS = ('push_notification_extra_context',)
+
+
+class RenderCache(renderers.LRUCache):
+    """
+    A least-recently-used cache of rendered messages, bounded both by number of entries
+    (``ACE_RENDER_CACHE_SIZE``) and by the total size of their rendered text (``ACE_RENDER_CACHE_MAX_BYTES``).
+    """
+
+    def __init__(self):
+        super().__init__('ACE_RENDER_CACHE_SIZE', DEFAULT_RENDER_CACHE_SIZE)
+        self._sizes = {}
+        self.total_bytes = 0
+
+    @staticmethod
+    def max_bytes():
+        return getattr(settings, 'ACE_RENDER_CACHE_MAX_BYTES', DEFAULT_RENDER_CACHE_MAX_BYTES)
+
+    @staticmethod
+    def entry_size(rendered):
+        """
+        Returns: int
+            The size of the text of the fields of ``rendered`` that have been rendered, in bytes.
+        """
+        if isinstance(rendered, renderers.LazyFieldsMixin):
+            values = rendered.rendered_fields().values()
+        else:
+            values = attr.astuple(rendered)
+        return sum(
+            len(value.encode('utf-8'))
+            for value in values
+            if isinstance(value, str)
+        )
+
+    def put(self, key, entry):
+        size = self.entry_size(entry)
+        max_size = self.max_size()
+        max_bytes = self.max_bytes()
+        if max_size <= 0 or size > max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._sizes.pop(key)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self.total_bytes += size
+            while len(self._entries) > max_size or self.total_bytes > max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+
+RENDER_CACHE = RenderCache()
+
+# The result of :func:`context_variables` for each message type and template engine.
+CONTEXT_VARIABLES_CACHE = renderers.LRUCache('ACE_CONTEXT_VARIABLES_CACHE_SIZE', DEFAULT_CONTEXT_VARIABLES_CACHE_SIZE)
+
+
+@receiver(setting_changed, dispatch_uid='edx_ace.presentation.clear_render_cache_on_setting_changed')
+@receiver(file_changed, dispatch_uid='edx_ace.presentation.clear_render_cache_on_file_changed')
+def clear_render_cache(**kwargs):
+    """
+    Drop every cached rendered message (and template analysis), so that template and setting changes are picked up.
+    """
+    RENDER_CACHE.clear()
+    CONTEXT_VARIABLES_CACHE.clear()
+
+
+def render_cache_key(channel, message, language):
+    """
+    Returns the key under which the rendering of ``message`` for ``channel`` is cached,
+    or ``None`` if it shouldn't be cached.
+
+    The key identifies the templates (message name, channel and template engine), the language and
+    a hash of ``message.context``. Context keys listed in ``ACE_RENDER_CACHE_IGNORED_KEYS`` are left
+    out of the hash; messages with any of the context keys listed in ``ACE_RENDER_CACHE_PER_RECIPIENT_KEYS``
+    are never cached.
+    """
+    context = message.context
+    if any(key in context for key in getattr(settings, 'ACE_RENDER_CACHE_PER_RECIPIENT_KEYS', ())):
+        return None
+    ignored_keys = getattr(settings, 'ACE_RENDER_CACHE_IGNORED_KEYS', ())
+    if ignored_keys:
+        context = {key: value for key, value in context.items() if key not in ignored_keys}
+    try:
+        serialized = json.dumps(context, cls=MessageEncoder, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+    return (
+        message.app_label,
+        message.name,
+        type(channel),
+        renderers.template_engine_for(message),
+        language,
+        sha256(serialized.encode('utf-8')).hexdigest(),
+    )
 
-def render(channel, message):
-    """ Returns the rendered content for the given channel and message. """
+
+def render(channel, message, templates=None):
+    """
+    Returns the rendered content for the given channel and message.
+
+    When ``ACE_RENDER_CACHE_ENABLED`` is set, renderings are cached (see :func:`render_cache_key`), and messages
+    with the same context share them. Only enable it if templates use nothing recipient-specific outside of
+    ``message.context`` (such as ``message.recipient``).
+
+    The fields of the rendered message are then transformed as configured by ``ACE_POST_RENDER_TRANSFORMS``
+    (see :mod:`edx_ace.transforms`), before being cached. Fields that the channel doesn't read right away
+    (see :attr:`.Channel.rendered_fields`) stay deferred in the returned message, but are rendered in the cached
+    copy, so that the cache doesn't keep the message they would be rendered from and counts them in its size.
+
+    Args:
+        channel (Channel): The channel to render the message for.
+        message (Message): The message being rendered.
+        templates (dict, optional): A cache of compiled templates, keyed by filename, that is
+            shared between messages of the same type (see :func:`.ace.send_many`).
+    """
     renderer = RENDERERS.get(channel.channel_type)
 
     if not renderer:
@@ -22,5 +169,307 @@ def render(channel, message):
         raise errors.UnsupportedChannelError(error_msg)
 
     message_language = message.language or translation.get_language()
-    with translation.override(message_language):
-        return renderer.render(channel, message)
+    cache_key = None
+    if getattr(settings, 'ACE_RENDER_CACHE_ENABLED', False):
+        cache_key = render_cache_key(channel, message, message_language)
+        cached = RENDER_CACHE.get(cache_key) if cache_key else None
+        if cached is not None:
+            return _copy_rendered(cached)
+
+    if message_language == translation.get_language():
+        rendered = renderer.render(channel, message, templates=templates)
+    else:
+        with translation.override(message_language):
+            rendered = renderer.render(channel, message, templates=templates)
+    rendered = transforms.transform_rendered(rendered)
+
+    if cache_key is not None:
+        RENDER_CACHE.put(cache_key, _finished_copy(rendered))
+    return rendered
+
+
+def _copy_rendered(rendered):
+    """
+    Returns:
+        A copy of a rendered message which, like the original, only renders its deferred fields when they are read.
+    """
+    if isinstance(rendered, renderers.LazyFieldsMixin):
+        return rendered.copy()
+    return attr.evolve(rendered)
+
+
+def _finished_copy(rendered):
+    """
+    Returns:
+        A copy of a rendered message with all of its fields rendered, which doesn't keep the templates and
+        context (including the message) that its deferred fields are rendered from.
+    """
+    copy = _copy_rendered(rendered)
+    if isinstance(copy, renderers.LazyFieldsMixin):
+        copy.render_deferred()
+    return copy
+
+
+@once
+def render_process_pool():
+    """
+    Returns: :class:`~concurrent.futures.ProcessPoolExecutor`
+        The pool of ``ACE_RENDER_PROCESSES`` processes used by :func:`render_many`.
+
+    The processes are started from a fork server where available, and spawned otherwise, rather than forked
+    from a process that may be running other threads. They set Django up again from ``DJANGO_SETTINGS_MODULE``.
+    """
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(
+        max_workers=getattr(settings, 'ACE_RENDER_PROCESSES', 0),
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=_init_render_process,
+    )
+
+
+def render_many(items, return_exceptions=False):
+    """
+    Render many messages, spreading them over a pool of processes when ``ACE_RENDER_PROCESSES`` is more than 1.
+
+    Each message is shipped to a worker process as its JSON serialization, along with the class of its channel
+    (channels are instantiated without arguments). Messages that can't be shipped that way, such as messages
+    with context that isn't JSON-serializable, are rendered in this process.
+
+    Args:
+        items (iterable): ``(channel, message)`` pairs to render.
+        return_exceptions (bool): Whether to return the exception a message failed to render with in place of
+            its rendering, rather than raising the first one.
+
+    Returns:
+        list: The rendered content for each pair, in order.
+    """
+    items = list(items)
+    processes = getattr(settings, 'ACE_RENDER_PROCESSES', 0)
+    results = [None] * len(items)
+
+    shipped = []
+    if processes > 1 and len(items) > 1:
+        for index, (channel, message) in enumerate(items):
+            payload = _render_payload(channel, message)
+            if payload is not None:
+                shipped.append((index, payload))
+
+    if shipped:
+        chunksize = max(1, len(shipped) // (processes * 4))
+        rendered = render_process_pool().map(
+            _render_payload_or_error, [payload for _, payload in shipped], chunksize=chunksize,
+        )
+        for (index, _), result in zip(shipped, rendered):
+            results[index] = result
+
+    shipped_indexes = {index for index, _ in shipped}
+    for index, (channel, message) in enumerate(items):
+        if index not in shipped_indexes:
+            results[index] = _render_or_error(channel, message)
+
+    if not return_exceptions:
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+    return results
+
+
+def _render_payload(channel, message):
+    """
+    Returns: tuple
+        What a worker process needs to render ``message`` for ``channel``, or ``None`` if it can't be shipped.
+    """
+    channel_cls = type(channel)
+    try:
+        pickle.dumps(channel_cls)
+        serialized = str(message)
+    except (pickle.PicklingError, AttributeError, TypeError, ValueError) as error:
+        LOG.debug('Rendering %s in process, as it cannot be shipped to a worker: %s', message.log_id, error)
+        return None
+    return channel_cls, serialized, message.language or translation.get_language()
+
+
+def _render_or_error(channel, message):
+    try:
+        return render(channel, message)
+    except Exception as error:
+        return error
+
+
+def _render_payload_or_error(payload):
+    """
+    Render a message shipped by :func:`_render_payload`, in a worker process.
+
+    Returns:
+        The rendered message, or the (picklable) exception that rendering it raised.
+    """
+    channel_cls, serialized, language = payload
+    message = Message.from_string(serialized)
+    with translation.override(language):
+        # Rendered messages are pickled on the way back, which renders any deferred fields.
+        result = _render_or_error(channel_cls(), message)
+    if isinstance(result, Exception):
+        return _picklable_error(result)
+    return result
+
+
+def _picklable_error(error):
+    """
+    Returns: Exception
+        ``error``, or a stand-in for it without the attributes (such as template engines) that can't be pickled.
+    """
+    if isinstance(error, TemplateDoesNotExist):
+        return TemplateDoesNotExist(*error.args)
+    try:
+        pickle.dumps(error)
+    except Exception:
+        return Exception(f'{type(error).__name__}: {error}')
+    return error
+
+
+def _init_render_process():
+    if not apps.ready:
+        django.setup()
+
+
+def prewarm_translations(languages=None):
+    """
+    Load the translation catalogs of ``languages``, so that the first message rendered in each
+    language doesn't have to.
+
+    Args:
+        languages (list of str, optional): The language codes to load. Defaults to the codes in ``LANGUAGES``.
+    """
+    if not settings.USE_I18N:
+        return
+    if languages is None:
+        languages = [code for code, _name in settings.LANGUAGES]
+    for language in languages:
+        with translation.override(language):
+            pass
+
+
+def discover_message_templates():
+    """
+    Find every message that has templates, by looking for ``<app_label>/edx_ace/<name>/<channel_type>/``
+    directories in the template directories of all configured template engines.
+
+    Returns:
+        list: Sorted ``(app_label, name, ChannelType)`` tuples.
+    """
+    channel_types = {channel_type.value: channel_type for channel_type in RENDERERS}
+    found = set()
+    for engine in engines.all():
+        for template_dir in engine.template_dirs:
+            for app_label, name, channel_dir in _message_directories(template_dir):
+                if channel_dir in channel_types:
+                    found.add((app_label, name, channel_types[channel_dir]))
+    return sorted(found, key=lambda item: (item[0], item[1], item[2].value))
+
+
+def _message_directories(template_dir):
+    """
+    Yields:
+        tuple: ``(app_label, name, channel_dir)`` for each ``<app_label>/edx_ace/<name>/<channel_dir>/``
+        directory in ``template_dir``.
+    """
+    for app_label in _subdirectories(template_dir):
+        messages_dir = os.path.join(template_dir, app_label, 'edx_ace')
+        for name in _subdirectories(messages_dir):
+            for channel_dir in _subdirectories(os.path.join(messages_dir, name)):
+                yield app_label, name, channel_dir
+
+
+def _subdirectories(path):
+    """
+    Returns:
+        list: The names of the directories in ``path``, or nothing if it isn't a directory.
+    """
+    try:
+        with os.scandir(path) as entries:
+            return [entry.name for entry in entries if entry.is_dir()]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+class _TemplateChannel:
+    """
+    Stands in for a channel of a given type when looking up templates outside of a send.
+    """
+    def __init__(self, channel_type):
+        self.channel_type = channel_type
+
+
+def precompile_templates():
+    """
+    Compile and cache the templates of every message found by :func:`discover_message_templates`.
+
+    Returns:
+        list: A ``(template path, error)`` pair for each template that is missing or broken.
+    """
+    problems = []
+    for app_label, name, channel_type in discover_message_templates():
+        message = Message(app_label=app_label, name=name, recipient=None)
+        for filename, error in RENDERERS[channel_type].precompile(_TemplateChannel(channel_type), message):
+            problems.append((f'{app_label}/edx_ace/{name}/{channel_type.value}/{filename}', error))
+    return problems
+
+
+def context_variables(message):
+    """
+    Find the context variables that the templates of ``message``'s type read, for every channel type.
+
+    Returns: frozenset
+        The variable names (see :func:`~edx_ace.utils.template_variables.template_variables`), or ``None``
+        if they can't be determined, or the message type has no templates.
+    """
+    key = (message.app_label, message.name, renderers.template_engine_for(message))
+    cached = CONTEXT_VARIABLES_CACHE.get(key)
+    if cached is None:
+        cached = (_context_variables(message),)
+        CONTEXT_VARIABLES_CACHE.put(key, cached)
+    return cached[0]
+
+
+def _context_variables(message):
+    """
+    The uncached :func:`context_variables`: the union of what each channel type's templates read.
+    """
+    variables = set()
+    found = False
+    for channel_type, renderer in RENDERERS.items():
+        try:
+            names = renderer.context_variables(_TemplateChannel(channel_type), message)
+        except TemplateDoesNotExist:
+            continue
+        if names is None:
+            return None
+        found = True
+        variables.update(names)
+    return frozenset(variables) if found else None
+
+
+def prune_context(message, policies_checked=False):
+    """
+    Drop the keys of ``message.context`` that none of the message's templates read, if the
+    ``ACE_PRUNE_MESSAGE_CONTEXT`` setting is true.
+
+    Keys in :data:`ALWAYS_KEPT_CONTEXT_KEYS` and the ``ACE_CONTEXT_ALWAYS_KEPT_KEYS`` setting are kept,
+    as is the whole context when :func:`context_variables` can't tell what the templates read.
+    Unless ``policies_checked`` is set, the keys that the enabled policies read are kept too (see
+    :attr:`.Policy.context_keys`), and so is the whole context if a policy doesn't declare them.
+    ``message.context`` is replaced rather than modified, since it may be shared with other messages.
+    """
+    if not getattr(settings, 'ACE_PRUNE_MESSAGE_CONTEXT', False):
+        return
+    variables = context_variables(message)
+    if variables is None:
+        return
+    if not policies_checked:
+        policy_keys = policy.context_keys()
+        if policy_keys is None:
+            return
+        variables = variables.union(policy_keys)
+    kept = variables.union(ALWAYS_KEPT_CONTEXT_KEYS, getattr(settings, 'ACE_CONTEXT_ALWAYS_KEPT_KEYS', ()))
+    if not kept.issuperset(message.context):
+        message.context = {key: value for key, value in message.context.items() if key in kept}
@@ -0,0 +1,212 @@
+"""
+:mod:`edx_ace.ratelimit` limits how fast messages are handed to each channel, so that a fleet of
+workers stays under a vendor's rate limits instead of being throttled by it.
+
+Limits are configured per channel name (as listed in ``ACE_ENABLED_CHANNELS``) with the
+``ACE_CHANNEL_RATE_LIMITS`` setting. Each limit is a token bucket: ``rate`` deliveries per second on
+average, and bursts of up to ``burst`` deliveries (which defaults to ``rate``, or 1 if that's less)::
+
+    ACE_CHANNEL_RATE_LIMITS = {
+        # 10,000 requests per minute.
+        'braze_email': {'rate': 10000 / 60, 'burst': 500},
+        'sailthru_email': {'rate': 40},
+    }
+
+The state of the buckets is kept by a :class:`RateLimitBackend`, set by the ``ACE_RATE_LIMIT_BACKEND``
+setting. The default :class:`FileLockBackend` shares each bucket between all the processes on a host;
+subclass :class:`RateLimitBackend` to share them between hosts.
+
+A delivery that finds its bucket empty raises :class:`.RateLimitExceeded`, which is retried like any
+other :class:`.RecoverableChannelDeliveryError` once a token should be available.
+
+Channels whose vendor reports the state of its own rate limit can also use a :class:`Pacer`, which
+spreads the requests left in the vendor's window evenly until it resets.
+"""
+import datetime
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from edx_ace.errors import RateLimitExceeded
+from edx_ace.utils.date import get_current_time
+from edx_ace.utils.once import once
+
+DEFAULT_RATE_LIMIT_BACKEND = 'edx_ace.ratelimit.FileLockBackend'
+
+
+class RateLimitBackend:
+    """
+    Keeps the state of the token buckets. Backends are instantiated once per process without any arguments,
+    and must be safe to use from several threads.
+    """
+
+    def take(self, key, rate, burst):
+        """
+        Take a token from the bucket ``key``, if it has one.
+
+        Arguments:
+            key (str): The name of the bucket.
+            rate (float): How many tokens are added to the bucket per second.
+            burst (float): How many tokens the bucket holds when full. New buckets start full.
+
+        Returns: float
+            ``0`` if a token was taken, otherwise how many seconds until the bucket has one.
+        """
+        raise NotImplementedError()
+
+
+def _take(tokens, updated, now, rate, burst):
+    """
+    Returns: tuple
+        The tokens left in a bucket that held ``tokens`` at time ``updated``, after trying to take one at ``now``,
+        and how long to wait for a token if there wasn't one.
+    """
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class LocalBackend(RateLimitBackend):
+    """
+    Keeps the buckets in memory, so they are only shared between the threads of one process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens, wait = _take(tokens, updated, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+        return wait
+
+
+class FileLockBackend(RateLimitBackend):
+    """
+    Keeps each bucket in a small file, locked with :func:`fcntl.flock` while it is updated, so that it is
+    shared by every process on the host (POSIX only).
+
+    The files are kept in the ``ACE_RATE_LIMIT_DIR`` setting's directory, which defaults to a per-user
+    directory in the system's temporary directory.
+    """
+
+    _STATE = struct.Struct('=dd')
+
+    def __init__(self, directory=None):
+        self.directory = directory or getattr(settings, 'ACE_RATE_LIMIT_DIR', None) or os.path.join(
+            tempfile.gettempdir(), f'edx-ace-ratelimit-{os.getuid()}',
+        )
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', key) + '.bucket')
+
+    def take(self, key, rate, burst):
+        import fcntl  # pylint: disable=import-outside-toplevel
+
+        descriptor = os.open(self.path(key), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX)
+            # Wall-clock time, since it is compared between processes.
+            now = time.time()
+            state = os.pread(descriptor, self._STATE.size, 0)
+            tokens, updated = self._STATE.unpack(state) if len(state) == self._STATE.size else (burst, now)
+            tokens, wait = _take(tokens, updated, now, rate, burst)
+            os.pwrite(descriptor, self._STATE.pack(tokens, now), 0)
+        finally:
+            # Closing the file releases the lock.
+            os.close(descriptor)
+        return wait
+
+
+class Pacer:
+    """
+    Paces requests to a vendor API from the rate limit state that it reports in its responses.
+
+    After each response, :meth:`update` records how many requests are left in the current window and when
+    the window resets. :meth:`delay` then spaces requests so that those left are spread evenly over the rest
+    of the window, rather than used up in a burst followed by rate limit errors until the window resets.
+    While plenty of requests are left, the spacing is shorter than a request takes, so nothing is slowed
+    down; it only becomes noticeable as the remaining budget approaches zero.
+
+    The vendor's budget is usually shared by every worker, so ``concurrency`` is how many processes are
+    expected to send at once; each of them paces itself to its share.
+    """
+
+    def __init__(self, concurrency=1):
+        self.concurrency = concurrency
+        self.remaining = None
+        self.reset_time = None
+        self._last_request = None
+        self._lock = threading.Lock()
+
+    def update(self, remaining, reset_time):
+        """
+        Arguments:
+            remaining (int): How many requests are left in the current window.
+            reset_time (float): When the window resets, as a POSIX timestamp.
+        """
+        with self._lock:
+            self.remaining = remaining
+            self.reset_time = reset_time
+
+    def delay(self):
+        """
+        Claim the next request slot, if it has come.
+
+        Returns: float
+            ``0`` if a request can be made now, otherwise how many seconds until it can.
+        """
+        now = time.time()
+        with self._lock:
+            if self.remaining is None or self.reset_time is None or now >= self.reset_time:
+                self._last_request = now
+                return 0.0
+            if self.remaining <= 0:
+                return self.reset_time - now
+            interval = (self.reset_time - now) * self.concurrency / self.remaining
+            if self._last_request is not None and self._last_request + interval > now:
+                return self._last_request + interval - now
+            self._last_request = now
+            # Until the next response says otherwise.
+            self.remaining -= 1
+            return 0.0
+
+
+@once
+def rate_limit_backend():
+    """
+    Returns: :class:`RateLimitBackend`
+        The process-wide backend configured by ``ACE_RATE_LIMIT_BACKEND``.
+    """
+    return import_string(getattr(settings, 'ACE_RATE_LIMIT_BACKEND', DEFAULT_RATE_LIMIT_BACKEND))()
+
+
+def check_rate_limit(channel):
+    """
+    Take a token from the bucket of ``channel``, if ``ACE_CHANNEL_RATE_LIMITS`` limits it.
+
+    Raises:
+        RateLimitExceeded: If the bucket is empty; ``next_attempt_time`` is when it should have a token.
+    """
+    channel_name = getattr(channel, 'channel_name', None)
+    limit = getattr(settings, 'ACE_CHANNEL_RATE_LIMITS', {}).get(channel_name)
+    if not limit:
+        return
+    rate = limit['rate']
+    wait = rate_limit_backend().take(channel_name, rate, limit.get('burst', max(1, rate)))
+    if wait > 0:
+        raise RateLimitExceeded(
+            f'The {channel_name} rate limit of {rate}/s is used up.',
+            next_attempt_time=get_current_time() + datetime.timedelta(seconds=wait),
+        )
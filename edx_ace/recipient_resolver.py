@@ -2,8 +2,14 @@
 :mod:`edx_ace.recipient_resolver` contains the :class:`RecipientResolver`, which facilitates
 a design pattern that separates message content from recipient lists.
 """
+import itertools
 from abc import ABCMeta, abstractmethod
 
+from edx_ace import ace
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_MAX_IN_FLIGHT = 100
+
 
 # TODO(now): Do we even need to define this class? It seems like something the client could manage on their own.
 class RecipientResolver(metaclass=ABCMeta):
@@ -21,3 +27,109 @@ class RecipientResolver(metaclass=ABCMeta):
             msg_type (:class:`.MessageType`): An instantiated :class:`.MessageType`
                 that describes the message batch to send.
         """
+
+
+class StreamingRecipientResolver(RecipientResolver):
+    """
+    A :class:`RecipientResolver` that streams recipients instead of building a list of them.
+
+    Subclasses implement :meth:`get_recipients` as a generator. :meth:`send` personalizes
+    ``msg_type`` lazily and hands at most :attr:`max_in_flight` messages at a time to
+    :func:`.ace.send_many`, so memory use doesn't grow with the size of the batch. After each
+    window has been sent, :meth:`checkpoint` is called with the cursor of its last recipient;
+    passing that cursor back to :meth:`send` as ``after`` resumes an interrupted run.
+
+    Example::
+
+        class ActiveLearnerResolver(StreamingRecipientResolver):
+            def get_recipients(self, msg_type, after=None):
+                users = User.objects.filter(is_active=True)
+                for user in iter_queryset_by_key(users, after=after):
+                    yield Recipient(lms_user_id=user.id, email_address=user.email), None, {'name': user.username}
+    """
+    max_in_flight = DEFAULT_MAX_IN_FLIGHT
+
+    @abstractmethod
+    def get_recipients(self, msg_type, *args, after=None, **kwargs):
+        """
+        Yield the recipients of ``msg_type``, in cursor order.
+
+        Arguments:
+            msg_type (:class:`.MessageType`): The message batch being sent.
+            after: If not None, only recipients after this cursor (see :meth:`get_cursor`) should be yielded.
+
+        Yields:
+            tuple: ``(recipient, language, user_context)``, as accepted by :meth:`.MessageType.personalize`.
+        """
+
+    def get_cursor(self, recipient, language, user_context):  # pylint: disable=unused-argument
+        """
+        Returns: The position of this recipient in the stream, which is used to resume sending.
+
+        Defaults to the recipient's ``lms_user_id``, which matches :func:`iter_queryset_by_key`
+        over a user queryset.
+        """
+        return recipient.lms_user_id
+
+    def checkpoint(self, msg_type, cursor):
+        """
+        Called after every recipient up to and including ``cursor`` has been sent to.
+
+        Override this to persist the cursor somewhere durable so an interrupted run can be resumed.
+        """
+
+    def send(self, msg_type, *args, after=None, **kwargs):
+        """
+        Personalize and send ``msg_type`` to every recipient from :meth:`get_recipients`.
+
+        Arguments:
+            msg_type (:class:`.MessageType`): The message batch to send.
+            after: Resume from this cursor, as last passed to :meth:`checkpoint`.
+
+        Returns:
+            int: The number of messages sent.
+        """
+        recipients = iter(self.get_recipients(msg_type, *args, after=after, **kwargs))
+        sent = 0
+
+        while True:
+            window = list(itertools.islice(recipients, self.max_in_flight))
+            if not window:
+                return sent
+
+            messages = (
+                msg_type.personalize(recipient, language, user_context)
+                for recipient, language, user_context in window
+            )
+            for _result in ace.send_many(messages):
+                sent += 1
+
+            self.checkpoint(msg_type, self.get_cursor(*window[-1]))
+
+
+def iter_queryset_by_key(queryset, key='pk', after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Iterate over ``queryset`` in ``key`` order, fetching one chunk at a time.
+
+    Each chunk is fetched with a ``key > last_key`` filter (keyset pagination) rather than an
+    ``OFFSET``, so every query stays cheap and only one chunk is held in memory.
+
+    Arguments:
+        queryset (:class:`~django.db.models.query.QuerySet`): The objects to iterate over.
+        key (str): A unique, orderable field of the model.
+        after: If not None, start after the object with this key.
+        chunk_size (int): The number of objects to fetch per query.
+
+    Yields:
+        The objects of ``queryset``.
+    """
+    queryset = queryset.order_by(key)
+
+    while True:
+        chunk_queryset = queryset if after is None else queryset.filter(**{f'{key}__gt': after})
+        chunk = list(chunk_queryset[:chunk_size])
+        yield from chunk
+
+        if len(chunk) < chunk_size:
+            return
+        after = getattr(chunk[-1], key)
@@ -5,9 +5,215 @@ render messages for particular types of delivery channels. Each
 associated with it, which is used to render messages for all
 :class:`Channel` subclasses of that type.
 """
+import copy
+import functools
+import threading
+import time
+from collections import OrderedDict
+
 import attr
 
-from django.template import loader
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import Template, TemplateDoesNotExist, TemplateSyntaxError, loader
+from django.template.context import make_context
+from django.template.loader_tags import BlockNode
+from django.utils import translation
+from django.utils.autoreload import file_changed
+
+from edx_ace.errors import RenderTimeBudgetExceeded
+from edx_ace.monitoring import template_profiler
+from edx_ace.utils.template_variables import template_variables
+
+DEFAULT_TEMPLATE_CACHE_SIZE = 1024
+DEFAULT_FRAGMENT_CACHE_SIZE = 256
+
+# A template that can define the rendered fields of a message as blocks, instead of one template per field.
+SINGLE_TEMPLATE_FILENAME = 'message.html'
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe, least-recently-used cache.
+
+    The cache holds at most as many entries as the Django setting named ``size_setting``
+    (``default_size`` if it isn't set); a size of ``0`` disables caching.
+    """
+
+    def __init__(self, size_setting, default_size):
+        self.size_setting = size_setting
+        self.default_size = default_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def max_size(self):
+        return getattr(settings, self.size_setting, self.default_size)
+
+    def get(self, key):
+        """
+        Return the entry cached under ``key``, or ``None`` if there isn't one.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """
+        Cache ``entry`` under ``key``, evicting the least recently used entries beyond the maximum size.
+        """
+        max_size = self.max_size()
+        if max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TemplateCache(LRUCache):
+    """
+    A bounded, least-recently-used cache of compiled templates.
+
+    Template lookups that fail are cached too, so a missing template is only searched
+    for once rather than on every send. The cache holds at most ``ACE_TEMPLATE_CACHE_SIZE``
+    entries (hits and misses together); setting it to ``0`` disables caching. It is cleared
+    whenever a setting changes or Django's autoreloader sees a file change.
+    """
+
+    def __init__(self):
+        super().__init__('ACE_TEMPLATE_CACHE_SIZE', DEFAULT_TEMPLATE_CACHE_SIZE)
+
+    def get_template(self, key, template_path, using=None):
+        """
+        Return the compiled template at ``template_path``, loading it on a cache miss.
+
+        Arguments:
+            key (tuple): The cache key identifying the template.
+            template_path (str): The path to pass to the template loader.
+            using (str): The alias of the template engine to load the template with, or ``None`` to try them all.
+
+        Raises:
+            TemplateDoesNotExist: If the template can't be found, whether or not that was already known.
+        """
+        entry = self.get(key)
+        if entry is None:
+            try:
+                entry = loader.get_template(template_path, using=using)
+            except TemplateDoesNotExist as error:
+                entry = error
+            self.put(key, entry)
+
+        if isinstance(entry, TemplateDoesNotExist):
+            raise TemplateDoesNotExist(*entry.args, tried=entry.tried, backend=entry.backend, chain=entry.chain)
+        return entry
+
+
+TEMPLATE_CACHE = TemplateCache()
+
+# Rendered ``{% ace_batch_invariant %}`` fragments, see :mod:`edx_ace.templatetags.acetags`.
+FRAGMENT_CACHE = LRUCache('ACE_BATCH_INVARIANT_CACHE_SIZE', DEFAULT_FRAGMENT_CACHE_SIZE)
+
+
+@receiver(setting_changed, dispatch_uid='edx_ace.renderers.clear_template_cache_on_setting_changed')
+@receiver(file_changed, dispatch_uid='edx_ace.renderers.clear_template_cache_on_file_changed')
+def clear_template_cache(**kwargs):
+    """
+    Drop every cached template and fragment, so that template (and template setting) changes are picked up.
+    """
+    TEMPLATE_CACHE.clear()
+    FRAGMENT_CACHE.clear()
+
+
+def template_engine_for(message):
+    """
+    Returns: str
+        The alias (in ``TEMPLATES``) of the template engine to render ``message`` with: the message's
+        ``template_engine`` option, else the ``ACE_TEMPLATE_ENGINE`` setting. ``None`` means the first
+        engine that has the template, as with :func:`django.template.loader.get_template`.
+    """
+    return message.options.get('template_engine') or getattr(settings, 'ACE_TEMPLATE_ENGINE', None)
+
+
+class RenderTimer:
+    """
+    Times the templates rendered for one message.
+
+    Each render time is recorded in the :class:`.TemplateProfiler` (if profiling is enabled), and
+    the total is checked against the ``ACE_RENDER_TIME_BUDGET`` setting, in seconds. The budget is
+    checked after each template, so a single slow template is not interrupted, but no further
+    templates are rendered once the budget is used up.
+    """
+
+    def __init__(self, channel, message, budget=None, profiler=None):
+        self.message = message
+        self.template_dir = f'{message.app_label}/edx_ace/{message.name}/{channel.channel_type.value}'
+        self.budget = budget
+        self.profiler = profiler
+        self.elapsed = 0.0
+        self.slowest = None
+
+    @classmethod
+    def for_message(cls, channel, message):
+        """
+        Returns: :class:`RenderTimer`
+            A timer for rendering ``message``, or None if neither profiling nor a budget is configured.
+        """
+        budget = getattr(settings, 'ACE_RENDER_TIME_BUDGET', None)
+        profiler = template_profiler()
+        if budget is None and profiler is None:
+            return None
+        return cls(channel, message, budget=budget, profiler=profiler)
+
+    def record(self, filename, seconds):
+        """
+        Record that the template ``filename`` took ``seconds`` to render.
+
+        Raises:
+            RenderTimeBudgetExceeded: If the message's templates have now taken longer than the budget.
+        """
+        template_name = f'{self.template_dir}/{filename}'
+        self.elapsed += seconds
+        if self.slowest is None or seconds > self.slowest[1]:
+            self.slowest = (template_name, seconds)
+        if self.profiler is not None:
+            self.profiler.record(template_name, seconds)
+        if self.budget is not None and self.elapsed > self.budget:
+            raise RenderTimeBudgetExceeded(
+                f'Rendering {self.message.log_id} took {self.elapsed:.3f}s, more than the budget of {self.budget}s '
+                f'(last template: {template_name}, {seconds:.3f}s)',
+                template_name=template_name,
+                elapsed=self.elapsed,
+            )
+
+    def for_deferred_field(self):
+        """
+        Returns: :class:`RenderTimer`
+            A timer for a field that is rendered after the message, on first access, which only profiles it.
+        """
+        timer = copy.copy(self)
+        timer.budget = None
+        timer.elapsed = 0.0
+        timer.slowest = None
+        return timer
+
+    def report(self):
+        """
+        Report the total render time of the message, and its slowest template, with :meth:`.Message.report`.
+        """
+        self.message.report('render_seconds', self.elapsed)
+        if self.slowest is not None:
+            self.message.report('slowest_template', self.slowest[0])
 
 
 class AbstractRenderer:
@@ -20,36 +226,271 @@ class AbstractRenderer:
     """
     rendered_message_cls = None
 
-    def render(self, channel, message):
+    def render(self, channel, message, templates=None):
         """
         Renders the given message.
 
+        If the channel's template directory contains a :data:`SINGLE_TEMPLATE_FILENAME` template, every
+        field with a matching ``{% block <field> %}`` in it is rendered from that template, in a single
+        context. Fields without a block (and all fields, when there is no such template) are rendered
+        from their own template file, as ``<field>.txt`` or ``<name>.html`` for ``<name>_html`` fields.
+
+        Only the fields listed in the channel's :attr:`~.Channel.rendered_fields` are rendered right
+        away. The others are rendered when they are first read from the returned object (templates
+        are still looked up here, so missing templates are reported as usual).
+
+        Templates are timed when ``ACE_TEMPLATE_PROFILING_ENABLED`` or ``ACE_RENDER_TIME_BUDGET`` is set,
+        see :class:`RenderTimer`.
+
+        Raises:
+            RenderTimeBudgetExceeded: If rendering took longer than ``ACE_RENDER_TIME_BUDGET``.
+
         Args:
              channel (:class:`Channel`): The channel to render the message for.
              message (:class:`Message`): The message being rendered.
+             templates (dict): Optional cache of compiled templates for this message type, keyed by filename.
 
          Returns:
              dict: Mapping of template names/types to rendered text.
         """
+        render_context = {
+            'message': message,
+            'channel': channel,
+        }
+        render_context.update(message.context)
+
+        fields = [attribute.name for attribute in attr.fields(self.rendered_message_cls)]
+        eager = self._eager_fields(channel, fields)
+        timer = RenderTimer.for_message(channel, message)
         rendered = {}
-        for attribute in attr.fields(self.rendered_message_cls):
-            # TODO(later): Add comments to explain this difference in
-            # behavior between html and txt files, or make it consistent.
-            field = attribute.name
-            if field.endswith('_html'):
-                filename = field.replace('_html', '.html')
+        deferred = {}
+
+        single_template = self._find_template(channel, message, SINGLE_TEMPLATE_FILENAME, templates)
+        block_fields = set(self.template_blocks(single_template)) if single_template is not None else set()
+        if block_fields.intersection(eager):
+            # render_blocks() only renders the fields that have a block.
+            rendered.update(self._timed(
+                timer, SINGLE_TEMPLATE_FILENAME, self.render_blocks, single_template, eager, render_context,
+            ))
+
+        for field in fields:
+            if field in rendered:
+                continue
+            if field in block_fields:
+                deferred[field] = functools.partial(
+                    self._render_block, translation.get_language(), single_template, field, render_context,
+                )
+                continue
+            filename = self.template_filename(field)
+            template = self._get_template(channel, message, filename, templates)
+            if field in eager:
+                # Each template gets its own copy, as top-level ``{% ... as var %}`` tags write to it.
+                rendered[field] = self._timed(timer, filename, template.render, dict(render_context))
             else:
-                filename = field + '.txt'
-            template = self.get_template_for_message(channel, message, filename)
-            render_context = {
-                'message': message,
-                'channel': channel,
-            }
-            render_context.update(message.context)
-            rendered[field] = template.render(render_context)
+                deferred[field] = functools.partial(
+                    self._render_template, translation.get_language(), template, render_context,
+                )
 
+        if timer is not None:
+            timer.report()
+            if timer.profiler is not None:
+                deferred = self._profile_deferred(timer, deferred, block_fields)
+
+        if deferred:
+            return self.rendered_message_cls.lazy(rendered, deferred)
         return self.rendered_message_cls(**rendered)  # pylint: disable=not-callable
 
+    @staticmethod
+    def _eager_fields(channel, fields):
+        """
+        Returns: list
+            The ``fields`` that ``channel`` reads (see :attr:`~.Channel.rendered_fields`), to render right away.
+        """
+        needed = getattr(type(channel), 'rendered_fields', None)
+        return [field for field in fields if needed is None or field in needed]
+
+    @classmethod
+    def _profile_deferred(cls, timer, deferred, block_fields):
+        """
+        Returns: dict
+            The ``deferred`` field renderers, wrapped so that their render times are profiled when they are
+            rendered. The budget of ``timer`` only applies to rendering the message, so they are not held to it.
+        """
+        return {
+            field: functools.partial(
+                cls._timed,
+                timer.for_deferred_field(),
+                SINGLE_TEMPLATE_FILENAME if field in block_fields else cls.template_filename(field),
+                render_field,
+            )
+            for field, render_field in deferred.items()
+        }
+
+    @staticmethod
+    def _timed(timer, filename, render, *args):
+        """
+        Returns the result of ``render(*args)``, recording how long it took with ``timer``, if there is one.
+        """
+        if timer is None:
+            return render(*args)
+        start = time.perf_counter()
+        result = render(*args)
+        timer.record(filename, time.perf_counter() - start)
+        return result
+
+    def precompile(self, channel, message):
+        """
+        Load every template that rendering ``message`` for ``channel`` would use, so that they are
+        compiled and cached before the first send.
+
+        Returns:
+            list: A ``(filename, error)`` pair for each template that is missing or can't be compiled.
+        """
+        fields = [attribute.name for attribute in attr.fields(self.rendered_message_cls)]
+        try:
+            single_template = self._find_template(channel, message, SINGLE_TEMPLATE_FILENAME)
+        except TemplateSyntaxError as error:
+            return [(SINGLE_TEMPLATE_FILENAME, error)]
+        block_fields = set(self.template_blocks(single_template)) if single_template is not None else set()
+
+        problems = []
+        for field in fields:
+            if field in block_fields:
+                continue
+            filename = self.template_filename(field)
+            try:
+                self._get_template(channel, message, filename)
+            except (TemplateDoesNotExist, TemplateSyntaxError) as error:
+                problems.append((filename, error))
+        return problems
+
+    def context_variables(self, channel, message):
+        """
+        Returns: frozenset
+            The context variables that the templates for rendering ``message`` for ``channel`` may read
+            (see :func:`~edx_ace.utils.template_variables.template_variables`), or ``None`` if that can't be
+            determined (which includes templates with syntax errors). Missing templates read nothing.
+
+        Raises:
+            TemplateDoesNotExist: If there are no templates at all for the message and channel.
+        """
+        fields = [attribute.name for attribute in attr.fields(self.rendered_message_cls)]
+        variables = set()
+        found = False
+        try:
+            single_template = self._find_template(channel, message, SINGLE_TEMPLATE_FILENAME)
+            block_fields = set(self.template_blocks(single_template)) if single_template is not None else set()
+            filenames = [SINGLE_TEMPLATE_FILENAME] if single_template is not None else []
+            filenames.extend(self.template_filename(field) for field in fields if field not in block_fields)
+
+            for filename in filenames:
+                template = self._find_template(channel, message, filename)
+                if template is None:
+                    continue
+                names = template_variables(template)
+                if names is None:
+                    return None
+                variables.update(names)
+                found = True
+        except TemplateSyntaxError:
+            return None
+        if not found:
+            raise TemplateDoesNotExist(f'{message.app_label}/edx_ace/{message.name}/{channel.channel_type.value}/')
+        return frozenset(variables)
+
+    @staticmethod
+    def template_filename(field):
+        """
+        Returns: str
+            The name of the template file that ``field`` is rendered from, when it has its own template.
+        """
+        # TODO(later): Add comments to explain this difference in
+        # behavior between html and txt files, or make it consistent.
+        if field.endswith('_html'):
+            return field.replace('_html', '.html')
+        return field + '.txt'
+
+    @staticmethod
+    def _render_template(language, template, render_context):
+        with translation.override(language):
+            return template.render(dict(render_context))
+
+    @classmethod
+    def _render_block(cls, language, template, field, render_context):
+        with translation.override(language):
+            return cls.render_blocks(template, [field], render_context)[field]
+
+    @staticmethod
+    def template_blocks(template):
+        """
+        Returns: dict
+            The blocks of a template from the Django or Jinja2 template backend, by name
+            (or nothing, for templates from other backends).
+        """
+        compiled = getattr(template, 'template', None)
+        if isinstance(compiled, Template):
+            return {node.name: node for node in compiled.nodelist.get_nodes_by_type(BlockNode)}
+        # Jinja2 templates keep a render function for each block.
+        return dict(getattr(compiled, 'blocks', None) or {})
+
+    @staticmethod
+    def render_blocks(template, fields, render_context):
+        """
+        Render the blocks of ``template`` named after ``fields`` in one shared context.
+
+        Each block renders like the top level of its own template: ``{% load %}`` tags (or Jinja2
+        imports) at the top of the template apply, but template inheritance (``{% extends %}`` and
+        ``{{ block.super }}``) is not supported.
+
+        Arguments:
+            template: A compiled template from the Django or Jinja2 template backend.
+            fields (list): The names of the fields to render.
+            render_context (dict): The context to render the blocks with.
+
+        Returns:
+            dict: The rendered text of each field with a block in the template.
+        """
+        blocks = AbstractRenderer.template_blocks(template)
+        fields = [field for field in fields if field in blocks]
+        if not fields:
+            return {}
+        compiled = template.template
+        if not isinstance(compiled, Template):
+            context = compiled.new_context(dict(render_context))
+            return {field: compiled.environment.concat(blocks[field](context)) for field in fields}
+
+        context = make_context(render_context, autoescape=template.backend.engine.autoescape)
+        with context.render_context.push_state(compiled):
+            with context.bind_template(compiled):
+                return {field: blocks[field].render(context) for field in fields}
+
+    def _get_template(self, channel, message, filename, templates=None):
+        """
+        Look up a template through the per-message-type ``templates`` cache, when there is one.
+
+        Raises:
+            TemplateDoesNotExist: If there is no such template.
+        """
+        template = self._find_template(channel, message, filename, templates)
+        if template is None:
+            # Raise the lookup's error, which the TEMPLATE_CACHE remembers, so the template isn't searched for again.
+            return self.get_template_for_message(channel, message, filename)
+        return template
+
+    def _find_template(self, channel, message, filename, templates=None):
+        """
+        Like :meth:`_get_template`, but returns ``None`` for a template that doesn't exist.
+        """
+        if templates is not None and filename in templates:
+            return templates[filename]
+        try:
+            template = self.get_template_for_message(channel, message, filename)
+        except TemplateDoesNotExist:
+            template = None
+        if templates is not None:
+            templates[filename] = template
+        return template
+
     def get_template_for_message(self, channel, message, filename):
         """
         Arguments:
@@ -57,14 +498,98 @@ class AbstractRenderer:
             filename (str): The basename of the template file to look up.
 
         Returns:
-            The full template path to the template to render.
+            The compiled template to render, from the :data:`TEMPLATE_CACHE` when possible.
+
+        Raises:
+            TemplateDoesNotExist: If there is no such template.
+        """
+        channel_type = channel.channel_type.value
+        template_path = f'{message.app_label}/edx_ace/{message.name}/{channel_type}/{filename}'
+        engine = template_engine_for(message)
+        return TEMPLATE_CACHE.get_template(
+            (message.app_label, message.name, channel_type, filename, engine),
+            template_path,
+            using=engine,
+        )
+
+
+class LazyFieldsMixin:
+    """
+    Lets a rendered message defer rendering some of its fields until they are first read.
+    """
+
+    @classmethod
+    def lazy(cls, rendered, deferred):
+        """
+        Arguments:
+            rendered (dict): The values of the fields that have already been rendered.
+            deferred (dict): For each of the remaining fields, a callable that renders it.
+
+        Returns:
+            An instance of the class (bypassing ``__init__``), whose ``deferred`` fields are rendered on first access.
+        """
+        instance = cls.__new__(cls)
+        instance.__dict__.update(rendered)
+        instance.__dict__['_deferred_fields'] = dict(deferred)
+        return instance
+
+    def __getattr__(self, name):
+        # Only called for attributes that aren't set, i.e. fields that haven't been rendered yet.
+        deferred = self.__dict__.get('_deferred_fields', {})
+        if name not in deferred:
+            raise AttributeError(f'{type(self).__name__!r} object has no attribute {name!r}')
+        value = deferred[name]()
+        self.__dict__[name] = value
+        deferred.pop(name, None)
+        return value
+
+    def rendered_fields(self):
+        """
+        Returns: dict
+            The text of each field that has been rendered so far, by name.
+        """
+        return {name: value for name, value in self.__dict__.items() if name != '_deferred_fields'}
+
+    def copy(self):
+        """
+        Returns:
+            A copy of this rendered message that doesn't render the fields that are still deferred: the copy
+            renders them itself, from the same templates and context, when they are first read.
         """
-        template_path = f'{message.app_label}/edx_ace/{message.name}/{channel.channel_type.value}/{filename}'
-        return loader.get_template(template_path)
+        return self.lazy(self.rendered_fields(), self.__dict__.get('_deferred_fields', {}))
+
+    def render_deferred(self):
+        """
+        Render the fields that are still deferred, dropping the templates and context they are rendered from.
+        """
+        for name in list(self.__dict__.get('_deferred_fields', ())):
+            getattr(self, name)
+
+    def transform_field(self, name, transform):
+        """
+        Replace the text of the field ``name`` with ``transform(text)``: right away if it has been rendered,
+        or when it is rendered otherwise.
+        """
+        deferred = self.__dict__.get('_deferred_fields', {})
+        if name in deferred:
+            deferred[name] = functools.partial(_transform_rendered, transform, deferred[name])
+        else:
+            self.__dict__[name] = transform(self.__dict__[name])
+
+    def __getstate__(self):
+        # Render everything before pickling, rather than trying to pickle templates.
+        self.render_deferred()
+        state = dict(self.__dict__)
+        state.pop('_deferred_fields', None)
+        return state
+
+
+def _transform_rendered(transform, render_field):
+    return transform(render_field())
 
 
 @attr.s
-class RenderedEmail:
+class RenderedEmail(LazyFieldsMixin):
     """
     Encapsulates all values needed to send a :class:`.Message`
     over an :attr:`.ChannelType.EMAIL`.
@@ -84,7 +609,7 @@ class EmailRenderer(AbstractRenderer):
 
 
 @attr.s
-class RenderedPushNotification:
+class RenderedPushNotification(LazyFieldsMixin):
     """
     Encapsulates all values needed to send a :class:`.Message`
     over an :attr:`.ChannelType.PUSH`.
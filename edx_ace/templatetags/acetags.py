@@ -1,10 +1,21 @@
 '''
 edx-ace template tags
 '''
+import itertools
+
 from django import template
+from django.utils import translation
+
+from edx_ace.renderers import FRAGMENT_CACHE
 
 register = template.Library()
 
+_fragment_ids = itertools.count()
+
+# The variables of the message rendering context that aren't template-local state, see BatchInvariantNode.
+_RENDER_CONTEXT_KEYS = frozenset(('message', 'channel', 'block', 'True', 'False', 'None'))
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
 
 @register.simple_tag(takes_context=True)
 def get_action_links(context, channel, omit_unsubscribe_link=False):
@@ -14,3 +25,82 @@ def get_action_links(context, channel, omit_unsubscribe_link=False):
     if getattr(channel, 'get_action_links', None):
         return channel.get_action_links(omit_unsubscribe_link=context.get('omit_unsubscribe_link'))
     return []
+
+
+get_action_links.ace_context_keys = ('omit_unsubscribe_link',)
+
+
+class BatchInvariantNode(template.Node):
+    """
+    Renders its contents once per batch of messages, and reuses the result for every other message in the batch.
+    """
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+        self.fragment_id = next(_fragment_ids)
+
+    def render(self, context):
+        message = context.get('message')
+        send_uuid = getattr(message, 'send_uuid', None)
+        if send_uuid is None:
+            return self.nodelist.render(context)
+
+        local_key = self._local_key(context, message)
+        if local_key is None:
+            return self.nodelist.render(context)
+
+        channel = context.get('channel')
+        key = (send_uuid, translation.get_language(), type(channel), self.fragment_id, local_key)
+        rendered = FRAGMENT_CACHE.get(key)
+        if rendered is None:
+            rendered = self.nodelist.render(context)
+            FRAGMENT_CACHE.put(key, rendered)
+        return rendered
+
+    @staticmethod
+    def _local_key(context, message):
+        """
+        Returns: tuple
+            The template-local variables in ``context`` (set by ``{% for %}``, ``{% with %}``,
+            ``{% include ... with %}`` and the like, rather than taken from the message), by name, or ``None`` if
+            some of them aren't strings, numbers or booleans, which can't tell two renders apart.
+        """
+        message_context = getattr(message, 'context', {})
+        local = []
+        for name, value in context.flatten().items():
+            if name in _RENDER_CONTEXT_KEYS or (name in message_context and value is message_context[name]):
+                continue
+            if not isinstance(value, _SCALAR_TYPES):
+                return None
+            local.append((name, value))
+        return tuple(sorted(local))
+
+
+@register.tag
+def ace_batch_invariant(parser, token):
+    """
+    Mark a part of a template as depending only on context shared by the whole batch.
+
+    Messages personalized from the same :class:`.MessageType` share a ``send_uuid``. The contents of the
+    tag are rendered for the first of those messages (per language and channel), and the rendered text is
+    reused for the rest, so only the personalized remainder of the template is rendered per recipient.
+    Messages without a ``send_uuid`` render the contents every time.
+
+    Template-local variables (loop variables, and those set by ``{% with %}`` or ``{% include ... with %}``)
+    are part of the cache key when they are strings, numbers or booleans. Otherwise, as inside a ``{% for %}``
+    loop, the contents are rendered every time.
+
+    The contents must not use recipient-specific context (``user_context``, ``message.recipient``, ...)::
+
+        {% load acetags %}
+        {% ace_batch_invariant %}
+            {% for course in courses %}...{% endfor %}
+        {% endace_batch_invariant %}
+        <p>Hi {{ first_name }}</p>
+
+    At most ``ACE_BATCH_INVARIANT_CACHE_SIZE`` fragments are kept, least recently used first out.
+    """
+    if len(token.split_contents()) != 1:
+        raise template.TemplateSyntaxError(f"'{token.contents.split()[0]}' takes no arguments")
+    nodelist = parser.parse(('endace_batch_invariant',))
+    parser.delete_first_token()
+    return BatchInvariantNode(nodelist)
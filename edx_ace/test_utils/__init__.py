@@ -5,9 +5,15 @@ Since pytest discourages putting __init__.py into test directory (i.e. making te
 one cannot import from anywhere under tests folder. However, some utility classes/methods might be useful
 in multiple test modules (i.e. factoryboy factories, base test classes). So this package is the place to put them.
 """
+import datetime
+import threading
+import time
 from unittest.mock import patch
 
 from edx_ace import policy
+from edx_ace.channel import Channel, ChannelType
+from edx_ace.errors import RecoverableChannelDeliveryError
+from edx_ace.utils.date import get_current_time
 
 
 class StubPolicy(policy.Policy):
@@ -33,3 +39,45 @@ def patch_policies(test_case, policies):
     )
     patcher.start()
     test_case.addCleanup(patcher.stop)
+
+
+class StubChannel(Channel):
+    """
+    An in-memory channel that counts deliveries instead of sending anything.
+
+    It can simulate a slow vendor API and rate limiting, which makes it useful for
+    exercising the retry logic and for benchmarking the send pipeline offline.
+
+    Arguments:
+        channel_type (:class:`.ChannelType`): The type of channel to pretend to be.
+        latency (float): Seconds to sleep on every delivery attempt.
+        rate_limit_every (int): If set, every Nth attempt raises a :class:`.RecoverableChannelDeliveryError`,
+            as a vendor answering with a 429 would.
+        retry_delay (float): Seconds until the next attempt after a simulated rate limit.
+    """
+
+    def __init__(self, channel_type=ChannelType.EMAIL, latency=0, rate_limit_every=0, retry_delay=0.001):
+        self.channel_type = channel_type
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_delay = retry_delay
+        self.attempts = 0
+        self.delivered = 0
+        self._lock = threading.Lock()
+
+    def deliver(self, message, rendered_message):
+        with self._lock:
+            self.attempts += 1
+            attempt = self.attempts
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.rate_limit_every and attempt % self.rate_limit_every == 0:
+            raise RecoverableChannelDeliveryError(
+                'Simulated rate limit (status_code=429)',
+                get_current_time() + datetime.timedelta(seconds=self.retry_delay),
+            )
+
+        with self._lock:
+            self.delivered += 1
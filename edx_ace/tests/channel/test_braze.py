@@ -1,7 +1,11 @@
 """Unit tests for braze.py"""
-from unittest.mock import Mock, patch
+import asyncio
+import json
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock, patch, sentinel
 
 import ddt
+import httpx
 import requests
 
 from django.test import TestCase, override_settings
@@ -11,6 +15,7 @@ from edx_ace.errors import FatalChannelDeliveryError, RecoverableChannelDelivery
 from edx_ace.message import Message
 from edx_ace.presentation import render
 from edx_ace.recipient import Recipient
+from edx_ace.utils.date import get_current_time
 
 
 @ddt.ddt
@@ -27,7 +32,7 @@ class TestBrazeChannel(TestCase):
         self.channel = BrazeEmailChannel()
 
     def deliver_email(self, lms_user_id=123, options=None, context=None,
-                      response_code=200, response_message='Success!'):
+                      response_code=200, response_message='Success!', response_headers=None):
         """Sets up all the mocks for a single email"""
         message = Message(
             app_label='testapp',
@@ -38,9 +43,10 @@ class TestBrazeChannel(TestCase):
         )
         rendered_message = render(self.channel, message)
 
-        with patch('edx_ace.channel.braze.requests.post') as mock_post:
+        with patch('edx_ace.channel.braze.requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = response_code
+            mock_response.headers = response_headers or {}
             mock_response.json.return_value = {'message': response_message, 'dispatch_id': 'test-dispatch-id'}
             if response_code >= 400:
                 mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=mock_response)
@@ -49,6 +55,12 @@ class TestBrazeChannel(TestCase):
 
         return mock_post
 
+    def test_session_reused(self):
+        self.deliver_email()
+        session = self.channel._session  # pylint: disable=protected-access
+        self.deliver_email()
+        assert self.channel._session is session  # pylint: disable=protected-access
+
     def test_happy_path(self):
         """Basic email send, no special settings"""
         mock_post = self.deliver_email()
@@ -170,6 +182,110 @@ class TestBrazeChannel(TestCase):
         with self.assertRaisesRegex(exception, 'error will robinson'):
             self.deliver_email(response_code=code, response_message='error will robinson')
 
+    @ddt.data(
+        ({}, False, 28, 32),
+        ({'Retry-After': '120'}, True, 119, 120),
+        ({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}, True, None, None),
+        ({'Retry-After': 'soon'}, False, 28, 32),
+    )
+    @ddt.unpack
+    def test_retry_after(self, headers, vendor_requested, min_delay, max_delay):
+        with self.assertRaises(RecoverableChannelDeliveryError) as context:
+            self.deliver_email(response_code=503, response_headers=headers)
+
+        assert context.exception.vendor_requested == vendor_requested
+        if min_delay is None:
+            assert context.exception.next_attempt_time == datetime(2015, 10, 21, 7, 28, tzinfo=timezone.utc)
+        else:
+            delay = (context.exception.next_attempt_time - get_current_time()).total_seconds()
+            assert min_delay <= delay <= max_delay
+
+    async def adeliver_email(self, lms_user_id=123, response_code=200, response_message='Success!'):
+        """Sends a single email through the async client, returning the requests that were made"""
+        message = Message(
+            app_label='testapp',
+            name='testmessage',
+            options={},
+            recipient=Recipient(lms_user_id=lms_user_id, email_address='mr@robot.io'),
+        )
+        rendered_message = render(self.channel, message)
+        requests_made = []
+
+        def handler(request):
+            requests_made.append(request)
+            return httpx.Response(
+                response_code,
+                json={'message': response_message, 'dispatch_id': 'test-dispatch-id'},
+            )
+
+        real_client = httpx.AsyncClient
+        with patch(
+            'edx_ace.channel.braze.httpx.AsyncClient',
+            side_effect=lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs),
+        ):
+            await self.channel.adeliver(message, rendered_message)
+
+        return requests_made
+
+    async def test_adeliver(self):
+        """The async client sends the same request as the synchronous one"""
+        requests_made = await self.adeliver_email()
+        assert len(requests_made) == 1
+        assert str(requests_made[0].url) == 'https://rest.braze.com/messages/send'
+        assert requests_made[0].headers['Authorization'] == 'Bearer test-api-key'
+
+        mock_post = self.deliver_email()
+        assert json.loads(requests_made[0].content) == mock_post.call_args[1]['json']
+
+    async def test_adeliver_reuses_client(self):
+        """The async client is created once, so the second delivery goes through the first one's transport"""
+        first_requests = await self.adeliver_email()
+        second_requests = await self.adeliver_email()
+        assert len(first_requests) == 2
+        assert not second_requests
+
+    def test_adeliver_closes_client_with_loop(self):
+        """Each event loop gets its own client, which is closed when the loop shuts down"""
+        clients = []
+
+        async def deliver():
+            await self.adeliver_email()
+            clients.append(await self.channel._async_client())  # pylint: disable=protected-access
+
+        asyncio.run(deliver())
+        assert clients[0].is_closed
+
+        asyncio.run(deliver())
+        assert clients[1] is not clients[0]
+        assert clients[1].is_closed
+
+    @ddt.data(
+        (400, FatalChannelDeliveryError),
+        (429, RecoverableChannelDeliveryError),
+        (500, RecoverableChannelDeliveryError),
+    )
+    @ddt.unpack
+    async def test_adeliver_status_raises(self, code, exception):
+        with self.assertRaisesRegex(exception, 'error will robinson'):
+            await self.adeliver_email(response_code=code, response_message='error will robinson')
+
+    async def test_adeliver_lms_user_id_fallback(self):
+        """Use django instead if we can't find user id"""
+        with patch('edx_ace.channel.braze.DjangoEmailChannel') as mock_django:
+            mock_django.return_value.adeliver = AsyncMock()
+            requests_made = await self.adeliver_email(lms_user_id=None)
+
+        assert not requests_made
+        assert mock_django.return_value.adeliver.await_count == 1
+
+    @patch('edx_ace.channel.braze.HTTPX_INSTALLED', False)
+    async def test_adeliver_without_httpx(self):
+        """Without httpx the synchronous client is used from a worker thread"""
+        with patch.object(self.channel, 'deliver') as mock_deliver:
+            await self.channel.adeliver(sentinel.message, sentinel.rendered_message)
+
+        mock_deliver.assert_called_once_with(sentinel.message, sentinel.rendered_message)
+
     @override_settings(ACE_CHANNEL_BRAZE_API_KEY='')
     def test_disabled(self):
         assert not self.channel.enabled()
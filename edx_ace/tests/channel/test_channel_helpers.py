@@ -5,7 +5,7 @@ from unittest.mock import patch
 
 from django.test import TestCase, override_settings
 
-from edx_ace.channel import ChannelMap, ChannelType, get_channel_for_message
+from edx_ace.channel import ChannelMap, ChannelType, get_channel_for_message, get_channels_for_message
 from edx_ace.channel.braze import BrazeEmailChannel
 from edx_ace.channel.file import FileEmailChannel
 from edx_ace.channel.push_notification import PushNotificationChannel
@@ -79,3 +79,27 @@ class TestChannelMap(TestCase):
         with patch('edx_ace.channel.channels', return_value=channel_map):
             channel = get_channel_for_message(ChannelType.EMAIL, message)
             assert isinstance(channel, BrazeEmailChannel)
+
+    @override_settings(
+        ACE_CHANNEL_BRAZE_CAMPAIGNS={
+            'campaign_msg': 'campaign_id:variation_id',
+        },
+        ACE_CHANNEL_DEFAULT_EMAIL='braze_email',
+        ACE_CHANNEL_TRANSACTIONAL_EMAIL='file_email',
+    )
+    def test_get_channels_for_message(self):
+        file_email, braze_email = FileEmailChannel(), BrazeEmailChannel()
+        channel_map = ChannelMap([
+            ['file_email', file_email],
+            ['braze_email', braze_email],
+        ])
+
+        transactional_msg = Message(options={'transactional': True}, **self.msg_kwargs)
+        transactional_campaign_msg = Message(options={'transactional': True}, **self.msg_kwargs)
+        transactional_campaign_msg.name = 'campaign_msg'
+        info_msg = Message(options={}, **self.msg_kwargs)
+
+        with patch('edx_ace.channel.channels', return_value=channel_map):
+            assert get_channels_for_message(ChannelType.EMAIL, transactional_msg) == [file_email, braze_email]
+            assert get_channels_for_message(ChannelType.EMAIL, transactional_campaign_msg) == [braze_email, file_email]
+            assert get_channels_for_message(ChannelType.EMAIL, info_msg) == [braze_email]
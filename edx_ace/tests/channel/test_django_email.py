@@ -1,11 +1,11 @@
 # pylint: disable=missing-docstring
-from smtplib import SMTPException
+from smtplib import SMTPException, SMTPServerDisconnected
 from unittest.mock import Mock, patch
 
 from django.core import mail
 from django.test import TestCase, override_settings
 
-from edx_ace.channel.django_email import DjangoEmailChannel
+from edx_ace.channel.django_email import DjangoEmailChannel, SharedConnection
 from edx_ace.errors import FatalChannelDeliveryError
 from edx_ace.message import Message
 from edx_ace.presentation import render
@@ -68,6 +68,38 @@ class TestDjangoEmailChannel(TestCase):
         with self.assertRaises(FatalChannelDeliveryError):
             self.channel.deliver(self.message, self.mock_rendered_message)
 
+    async def test_adeliver(self):
+        await self.channel.adeliver(self.message, self.mock_rendered_message)
+
+        sent_email = mail.outbox[0]
+        assert sent_email.subject == 'Hello from Robot !'
+        assert sent_email.to == ['mr@robot.io']
+
+    @patch('django.core.mail.EmailMultiAlternatives.send', side_effect=SMTPException)
+    async def test_adeliver_smtp_failure(self, _send):
+        with self.assertRaises(FatalChannelDeliveryError):
+            await self.channel.adeliver(self.message, self.mock_rendered_message)
+
+    @patch('edx_ace.channel.django_email.get_connection')
+    def test_shared_connection(self, mock_get_connection):
+        first, second = Mock(), Mock()
+        mock_get_connection.side_effect = [first, second]
+        first.send_messages.side_effect = [1, SMTPServerDisconnected]
+        shared = SharedConnection()
+
+        with shared.active():
+            self.channel.deliver(self.message, self.mock_rendered_message)
+            self.channel.deliver(self.message, self.mock_rendered_message)
+        # Outside of the block, deliveries open their own connection again.
+        self.channel.deliver(self.message, self.mock_rendered_message)
+        shared.close()
+
+        assert first.send_messages.call_count == 2
+        first.close.assert_called_once_with()
+        assert second.send_messages.call_count == 1
+        second.close.assert_called_once_with()
+        assert len(mail.outbox) == 1
+
     @override_settings(DEFAULT_FROM_EMAIL=None)
     def test_with_no_from_address_without_default(self):
         message = Message(
@@ -1,13 +1,15 @@
 # pylint: disable=missing-docstring
-from unittest.mock import patch
+from datetime import datetime
+from unittest.mock import Mock, patch
 
 import ddt
+from dateutil.tz import tzutc
 
 from django.test import TestCase, override_settings
 
 from edx_ace.channel.sailthru import SailthruEmailChannel
 from edx_ace.delivery import deliver
-from edx_ace.errors import InvalidMessageError
+from edx_ace.errors import InvalidMessageError, RateLimitExceeded
 from edx_ace.message import Message
 from edx_ace.presentation import render
 from edx_ace.recipient import Recipient
@@ -89,3 +91,50 @@ class TestSailthruChannel(TestCase):
         rendered_email = render(self.channel, message)
 
         assert '{optout_confirm_url}' not in rendered_email.body_html
+
+    @staticmethod
+    def sailthru_response(remaining, reset_timestamp, is_ok=True):
+        response = Mock()
+        response.is_ok.return_value = is_ok
+        response.response.headers = {
+            'X-Rate-Limit-Remaining': str(remaining),
+            'X-Rate-Limit-Reset': str(reset_timestamp),
+        }
+        return response
+
+    def make_message(self):
+        return Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=123, email_address='mr@robot.io'),
+        )
+
+    @override_settings(ACE_CHANNEL_SAILTHRU_DEBUG=False)
+    @patch('edx_ace.ratelimit.time.time', return_value=1000)
+    def test_pacing_from_response_headers(self, mock_time):
+        message = self.make_message()
+        rendered_email = render(self.channel, message)
+
+        with patch('edx_ace.channel.sailthru.SailthruClient.send') as mock_send:
+            mock_send.return_value = self.sailthru_response(remaining=2, reset_timestamp=1010)
+            self.channel.deliver(message, rendered_email)
+
+            # The 2 requests left are spread over the 10 seconds left in the window.
+            with self.assertRaises(RateLimitExceeded):
+                self.channel.deliver(message, rendered_email)
+            mock_time.return_value = 1005
+            self.channel.deliver(message, rendered_email)
+
+            with override_settings(ACE_CHANNEL_SAILTHRU_PACING_ENABLED=False):
+                self.channel.deliver(message, rendered_email)
+
+        assert mock_send.call_count == 3
+
+    def test_rate_limit_reset_time(self):
+        assert SailthruEmailChannel._get_rate_limit_reset_time(  # pylint: disable=protected-access
+            self.sailthru_response(remaining=0, reset_timestamp=1700000000, is_ok=False)
+        ) == datetime(2023, 11, 14, 22, 13, 20, tzinfo=tzutc())
+        assert SailthruEmailChannel._get_rate_limit_reset_time(  # pylint: disable=protected-access
+            self.sailthru_response(remaining=5, reset_timestamp=1700000000, is_ok=False)
+        ) is None
+        assert SailthruEmailChannel._get_rate_limit(Mock(response=None)) is None  # pylint: disable=protected-access
@@ -1,20 +1,38 @@
 """
 Tests of :mod:`edx_ace.ace`.
 """
-from unittest.mock import Mock, patch
+import asyncio
+import threading
+from unittest.mock import AsyncMock, Mock, patch
 
 from django.template import TemplateDoesNotExist
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import translation
 
 from edx_ace import ace
 from edx_ace.channel import ChannelMap, ChannelType
-from edx_ace.errors import UnsupportedChannelError
-from edx_ace.message import Message
+from edx_ace.channel.django_email import DjangoEmailChannel
+from edx_ace.errors import FatalChannelDeliveryError, RenderTimeBudgetExceeded, UnsupportedChannelError
+from edx_ace.message import Message, MessageType
+from edx_ace.monitoring import DryRunReport
+from edx_ace.policy import Policy, PolicyResult
 from edx_ace.recipient import Recipient
-from edx_ace.renderers import RenderedEmail
+from edx_ace.renderers import TEMPLATE_CACHE, RenderedEmail
 from edx_ace.test_utils import StubPolicy, patch_policies
 
 
+class CourseOptOutPolicy(Policy):
+    """
+    Denies every channel to messages about course 99, which is in a context key that no template reads.
+    """
+    context_keys = ('course_ids',)
+
+    def check(self, message):
+        if 99 in message.context.get('course_ids', ()):
+            return PolicyResult(deny=set(ChannelType))
+        return PolicyResult()
+
+
 class TestAce(TestCase):
     """
     Tests for the send method.
@@ -54,6 +72,28 @@ class TestAce(TestCase):
             ),
         )
 
+    @override_settings(ACE_PRUNE_MESSAGE_CONTEXT=True)
+    def test_pruning_keeps_keys_read_by_policies(self):
+        patch_policies(self, [CourseOptOutPolicy()])
+        mock_channel = Mock(channel_type=ChannelType.EMAIL)
+        message_type = MessageType(context={'course_name': 'Demo', 'course_ids': [99]}, app_label='testapp')
+        message_type.name = 'singlemessage'
+
+        def personalize():
+            return message_type.personalize(Recipient(lms_user_id=123), 'en', {})
+
+        msg = personalize()
+        with patch('edx_ace.channel.channels', return_value=ChannelMap([['sailthru_email', mock_channel]])):
+            ace.send(msg)
+            results = list(ace.send_many([personalize()]))
+            asyncio.run(ace.asend(personalize()))
+
+        assert not mock_channel.deliver.called
+        assert not mock_channel.adeliver.called
+        assert not results[0].outcomes
+        # Once the policies have been checked, the key is pruned.
+        assert msg.context == {'course_name': 'Demo'}
+
     @patch('edx_ace.ace.get_channel_for_message', side_effect=UnsupportedChannelError)
     def test_ace_send_unsupported_channel(self, *_args):
         recipient = Recipient(lms_user_id=123)
@@ -97,3 +137,341 @@ class TestAce(TestCase):
             'template_error',
             'Unable to send message because template not found\ntemplate not found'
         )
+
+
+class TestAceAsend(TestCase):
+    """
+    Tests for the asend coroutine.
+    """
+    def setUp(self):
+        super().setUp()
+        patch_policies(self, [StubPolicy([ChannelType.PUSH])])
+        self.mock_channel = Mock(
+            channel_type=ChannelType.EMAIL,
+            action_links=[],
+            get_action_links=[],
+            tracker_image_sources=[],
+            adeliver=AsyncMock(),
+        )
+        channel_map = ChannelMap([
+            ['sailthru_email', self.mock_channel],
+        ])
+        patcher = patch('edx_ace.channel.channels', return_value=channel_map)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.msg = Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=123),
+        )
+
+    async def test_asend_happy_path(self):
+        await ace.asend(self.msg)
+
+        self.mock_channel.adeliver.assert_awaited_once()
+        assert not self.mock_channel.deliver.called
+        rendered_message = self.mock_channel.adeliver.call_args[0][1]
+        assert rendered_message.subject == 'template subject.txt'
+
+    @patch('edx_ace.ace.presentation.render', side_effect=TemplateDoesNotExist('template not found'))
+    async def test_asend_template_does_not_exist(self, _mock_render):
+        with patch.object(self.msg, 'report') as mock_report:
+            await ace.asend(self.msg)
+
+        mock_report.assert_called_with(
+            'template_error',
+            'Unable to send message because template not found\ntemplate not found'
+        )
+        assert not self.mock_channel.adeliver.called
+
+    async def test_asend_channel_error(self):
+        self.mock_channel.adeliver.side_effect = FatalChannelDeliveryError('boom')
+
+        with patch.object(self.msg, 'report') as mock_report:
+            await ace.asend(self.msg)
+
+        mock_report.assert_called_with('email_error', 'boom')
+
+    async def test_asend_limit_to_channels(self):
+        await ace.asend(self.msg, limit_to_channels=[ChannelType.PUSH])
+
+        assert not self.mock_channel.adeliver.called
+
+
+class TestAceSendMany(TestCase):
+    """
+    Tests for the send_many method.
+    """
+    def setUp(self):
+        super().setUp()
+        patch_policies(self, [StubPolicy([ChannelType.PUSH])])
+        self.mock_channel = Mock(
+            channel_type=ChannelType.EMAIL,
+            action_links=[],
+            get_action_links=[],
+            tracker_image_sources=[],
+        )
+        channel_map = ChannelMap([
+            ['sailthru_email', self.mock_channel],
+        ])
+        patcher = patch('edx_ace.channel.channels', return_value=channel_map)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_messages(self, count, **kwargs):
+        for lms_user_id in range(count):
+            yield Message(
+                app_label='testapp',
+                name='testmessage',
+                recipient=Recipient(lms_user_id=lms_user_id),
+                **kwargs
+            )
+
+    def test_send_many_from_generator(self):
+        results = list(ace.send_many(self.make_messages(3)))
+
+        assert [result.message.recipient.lms_user_id for result in results] == [0, 1, 2]
+        assert all(result.delivered for result in results)
+        assert results[0].outcomes == {ChannelType.EMAIL: ace.SendOutcome.DELIVERED}
+        assert self.mock_channel.deliver.call_count == 3
+
+    def test_dry_run(self):
+        report = DryRunReport()
+        with self.assertLogs('edx_ace.ace', 'INFO') as logs:
+            results = list(ace.send_many(self.make_messages(3), dry_run=report))
+
+        assert not self.mock_channel.deliver.called
+        assert [result.outcomes[ChannelType.EMAIL] for result in results] == [ace.SendOutcome.DRY_RUN] * 3
+        summary = report.summary()
+        assert summary['messages'] == summary['renders'] == 3
+        assert summary['outcomes'] == {'dry_run': 3}
+        email = summary['channels']['email']
+        assert email['render_seconds']['count'] == 3
+        assert email['field_bytes']['subject'] == 3 * len('template subject.txt')
+        assert email['bytes']['total'] == sum(email['field_bytes'].values())
+        assert 'ACE dry run' in logs.output[0]
+
+    @override_settings(ACE_DRY_RUN=True)
+    def test_dry_run_setting(self):
+        with patch('edx_ace.ace.DRY_RUN_REPORT', DryRunReport()) as report:
+            ace.send(next(self.make_messages(1)))
+            assert ace.dry_run_many(self.make_messages(2)).summary()['messages'] == 2
+
+        assert not self.mock_channel.deliver.called
+        assert report.summary()['messages'] == 1
+
+    @override_settings(ACE_CHANNEL_DEFAULT_EMAIL='django_email')
+    @patch('edx_ace.channel.django_email.get_connection')
+    def test_send_many_shares_email_connection(self, mock_get_connection):
+        channel_map = ChannelMap([['django_email', DjangoEmailChannel()]])
+        messages = [
+            Message(
+                app_label='testapp',
+                name='testmessage',
+                options={'from_address': 'bulk@example.com'},
+                recipient=Recipient(lms_user_id=lms_user_id, email_address=f'user{lms_user_id}@example.com'),
+            )
+            for lms_user_id in range(3)
+        ]
+
+        with patch('edx_ace.channel.channels', return_value=channel_map):
+            results = list(ace.send_many(messages))
+
+        assert all(result.delivered for result in results)
+        connection = mock_get_connection.return_value
+        assert mock_get_connection.call_count == 1
+        assert connection.send_messages.call_count == 3
+        connection.close.assert_called_once_with()
+
+    def test_send_many_is_lazy(self):
+        results = ace.send_many(self.make_messages(3))
+        assert not self.mock_channel.deliver.called
+
+        next(results)
+        assert self.mock_channel.deliver.call_count == 1
+
+    @override_settings(ACE_SEND_MANY_LANGUAGE_WINDOW=4)
+    def test_send_many_groups_languages_within_window(self):
+        delivered_in = []
+        self.mock_channel.deliver.side_effect = lambda msg, _rendered: delivered_in.append(
+            (msg.recipient.lms_user_id, translation.get_language())
+        )
+        messages = [
+            Message(
+                app_label='testapp',
+                name='testmessage',
+                recipient=Recipient(lms_user_id=index),
+                language=language,
+            )
+            for index, language in enumerate(['en', 'fr', 'en', 'fr', 'fr'])
+        ]
+
+        with patch('edx_ace.ace.translation.override', wraps=translation.override) as mock_override:
+            results = ace.send_many(iter(messages))
+            next(results)
+            # The whole first window is sent before its first result is yielded.
+            assert self.mock_channel.deliver.call_count == 4
+            results = [messages[0]] + [result.message for result in results]
+
+        assert results == messages
+        assert delivered_in == [(0, 'en'), (2, 'en'), (1, 'fr'), (3, 'fr'), (4, 'fr')]
+        assert [call.args for call in mock_override.call_args_list] == [('en',), ('fr',), ('fr',)]
+
+    @override_settings(ACE_RENDER_PROCESSES=2)
+    @patch('edx_ace.ace.presentation.render_many')
+    def test_send_many_renders_in_batches(self, mock_render_many):
+        mock_render_many.side_effect = lambda pairs, return_exceptions: [
+            TemplateDoesNotExist('missing') if msg.recipient.lms_user_id == 1 else f'rendered {msg.language}'
+            for _channel, msg in pairs
+        ]
+        messages = list(self.make_messages(3, language='en')) + list(self.make_messages(1, language='fr'))
+
+        results = list(ace.send_many(messages))
+
+        # One batch for each language in the window.
+        assert [len(call.args[0]) for call in mock_render_many.call_args_list] == [3, 1]
+        assert [result.outcomes[ChannelType.EMAIL] for result in results] == [
+            ace.SendOutcome.DELIVERED,
+            ace.SendOutcome.TEMPLATE_ERROR,
+            ace.SendOutcome.DELIVERED,
+            ace.SendOutcome.DELIVERED,
+        ]
+        assert [call.args[1] for call in self.mock_channel.deliver.call_args_list] == [
+            'rendered en', 'rendered en', 'rendered fr',
+        ]
+
+    @override_settings(ACE_RENDER_PROCESSES=2, ACE_OUTBOX_ENABLED=True)
+    @patch('edx_ace.outbox.outbox_backend')
+    @patch('edx_ace.ace.circuitbreaker.is_open', return_value=True)
+    def test_send_many_routes_once_with_render_processes(self, _mock_is_open, mock_outbox_backend):
+        messages = list(self.make_messages(2))
+
+        with patch.object(Message, 'report', autospec=True) as mock_report:
+            results = list(ace.send_many(messages))
+
+        assert [result.outcomes[ChannelType.EMAIL] for result in results] == [ace.SendOutcome.CIRCUIT_OPEN] * 2
+        self.mock_channel.deliver.assert_not_called()
+        assert [call.args[2] for call in mock_outbox_backend.return_value.add.call_args_list] == [
+            str(message) for message in messages
+        ]
+        assert [
+            call.args[0] for call in mock_report.call_args_list if call.args[1] == 'email_circuit_open'
+        ] == messages
+
+    @patch('edx_ace.ace.get_channel_for_message')
+    @patch('edx_ace.renderers.loader.get_template')
+    def test_send_many_reuses_routing_and_templates(self, mock_get_template, mock_get_channel):
+        mock_get_channel.return_value = self.mock_channel
+        mock_get_template.return_value.render.return_value = 'rendered'
+        TEMPLATE_CACHE.clear()
+        self.addCleanup(TEMPLATE_CACHE.clear)
+
+        list(ace.send_many(self.make_messages(4)))
+        list(ace.send_many(self.make_messages(2, language='fr')))
+
+        # One routing decision for each (name, language) group, and one lookup per template file
+        # (including the single-template layout's message.html).
+        assert mock_get_channel.call_count == 2
+        assert mock_get_template.call_count == 6
+        assert self.mock_channel.deliver.call_count == 6
+
+    def test_send_many_reports_failures_per_message(self):
+        self.mock_channel.deliver.side_effect = [None, FatalChannelDeliveryError('boom'), None]
+
+        results = list(ace.send_many(self.make_messages(3)))
+
+        assert [result.outcomes[ChannelType.EMAIL] for result in results] == [
+            ace.SendOutcome.DELIVERED,
+            ace.SendOutcome.CHANNEL_ERROR,
+            ace.SendOutcome.DELIVERED,
+        ]
+        assert not results[1].delivered
+
+    @patch('edx_ace.ace.presentation.render')
+    def test_send_many_render_time_budget_exceeded(self, mock_render):
+        mock_render.side_effect = RenderTimeBudgetExceeded('too slow', template_name='body.html', elapsed=2)
+        msg = next(self.make_messages(1))
+
+        with patch.object(msg, 'report') as mock_report:
+            results = list(ace.send_many([msg]))
+
+        mock_report.assert_any_call('render_time_budget_exceeded', 'too slow')
+        assert results[0].outcomes == {ChannelType.EMAIL: ace.SendOutcome.TEMPLATE_ERROR}
+        assert not self.mock_channel.deliver.called
+
+    def test_send_many_limit_to_channels(self):
+        results = list(ace.send_many(self.make_messages(2), limit_to_channels=[ChannelType.PUSH]))
+
+        assert results[0].outcomes == {ChannelType.EMAIL: ace.SendOutcome.SKIPPED}
+        assert not self.mock_channel.deliver.called
+
+
+@override_settings(ACE_CONCURRENT_CHANNEL_DELIVERY=True)
+class TestAceConcurrentChannels(TestCase):
+    """
+    Tests for sending a message over several channels concurrently.
+    """
+    def setUp(self):
+        super().setUp()
+        patch_policies(self, [])
+        self.email_channel = Mock(channel_type=ChannelType.EMAIL)
+        self.push_channel = Mock(channel_type=ChannelType.PUSH)
+        channel_map = ChannelMap([
+            ['sailthru_email', self.email_channel],
+            ['push_notification', self.push_channel],
+        ])
+        patcher = patch('edx_ace.channel.channels', return_value=channel_map)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.msg = Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=123),
+        )
+
+    @patch('edx_ace.ace.presentation.render')
+    def test_channels_are_delivered_concurrently(self, _mock_render):
+        # Each delivery waits for the other one, so this would time out if they were sent one after the other.
+        barrier = threading.Barrier(2, timeout=5)
+        self.email_channel.deliver.side_effect = lambda *args: barrier.wait()
+        self.push_channel.deliver.side_effect = lambda *args: barrier.wait()
+
+        ace.send(self.msg)
+
+        assert self.email_channel.deliver.call_count == 1
+        assert self.push_channel.deliver.call_count == 1
+
+    @patch('edx_ace.ace.presentation.render')
+    def test_send_many_outcomes(self, mock_render):
+        def render(channel, _msg, templates=None):  # pylint: disable=unused-argument
+            if channel is self.push_channel:
+                raise TemplateDoesNotExist('push')
+            return 'rendered'
+        mock_render.side_effect = render
+
+        results = list(ace.send_many([self.msg]))
+
+        assert results[0].outcomes == {
+            ChannelType.EMAIL: ace.SendOutcome.DELIVERED,
+            ChannelType.PUSH: ace.SendOutcome.TEMPLATE_ERROR,
+        }
+
+    @patch('edx_ace.ace.presentation.render', return_value='rendered')
+    def test_channel_errors_are_reported_per_channel(self, _mock_render):
+        self.push_channel.deliver.side_effect = FatalChannelDeliveryError('push failed')
+
+        with patch.object(self.msg, 'report') as mock_report:
+            ace.send(self.msg)
+
+        mock_report.assert_any_call('push_error', 'push failed')
+        assert self.email_channel.deliver.call_count == 1
+
+    @patch('edx_ace.ace.presentation.render', return_value='rendered')
+    def test_active_language_is_used_in_workers(self, mock_render):
+        languages = []
+        mock_render.side_effect = lambda *args, **kwargs: languages.append(translation.get_language())
+
+        with translation.override('eo'):
+            ace.send(self.msg)
+
+        assert languages == ['eo', 'eo']
@@ -0,0 +1,98 @@
+"""
+Tests of :mod:`edx_ace.backoff`.
+"""
+import datetime
+from unittest.mock import Mock, call, patch, sentinel
+
+import ddt
+
+from django.test import TestCase, override_settings
+
+from edx_ace.backoff import ExponentialBackoff, policy_for
+from edx_ace.channel import ChannelMap, ChannelType
+from edx_ace.delivery import deliver
+from edx_ace.errors import RateLimitExceeded, RecoverableChannelDeliveryError
+from edx_ace.message import Message
+from edx_ace.recipient import Recipient
+from edx_ace.utils.date import get_current_time
+
+
+@ddt.ddt
+class TestExponentialBackoff(TestCase):
+    """
+    Tests of :class:`.ExponentialBackoff`.
+    """
+    def test_no_jitter(self):
+        policy = ExponentialBackoff(base=2, cap=10, jitter=None, max_retries=4)
+        assert [policy.delay(attempt) for attempt in range(1, 6)] == [2, 4, 8, 10, None]
+
+    @patch('edx_ace.backoff.random.uniform', side_effect=lambda low, high: (low, high))
+    def test_full_jitter(self, _mock_uniform):
+        policy = ExponentialBackoff(base=2, cap=10)
+        assert [policy.delay(attempt) for attempt in range(1, 5)] == [(0, 2), (0, 4), (0, 8), (0, 10)]
+
+    @patch('edx_ace.backoff.random.uniform', side_effect=lambda low, high: high)
+    def test_decorrelated_jitter(self, mock_uniform):
+        policy = ExponentialBackoff(base=2, cap=100, jitter='decorrelated')
+        delays = [None]
+        for attempt in range(1, 5):
+            delays.append(policy.delay(attempt, delays[-1]))
+
+        assert delays[1:] == [6, 18, 54, 100]
+        assert mock_uniform.call_args_list == [call(2, 6), call(2, 18), call(2, 54), call(2, 162)]
+
+    def test_unknown_jitter(self):
+        with self.assertRaises(ValueError):
+            ExponentialBackoff(jitter='equal')
+
+    @ddt.data(None, {})
+    def test_unconfigured(self, config):
+        with override_settings(ACE_CHANNEL_BACKOFF={'braze_email': config}):
+            assert policy_for(Mock(channel_name='braze_email')) is None
+
+
+@override_settings(
+    ACE_CHANNEL_BACKOFF={'braze_email': {'base': 1, 'cap': 60, 'jitter': None, 'max_retries': 2}},
+)
+@patch('edx_ace.delivery.time')
+class TestDeliveryBackoff(TestCase):
+    """
+    Tests of how :func:`.delivery.deliver` waits between attempts.
+    """
+    def setUp(self):
+        super().setUp()
+        self.channel = Mock(channel_type=ChannelType.EMAIL)
+        ChannelMap([['braze_email', self.channel]])
+        self.message = Message(app_label='testapp', name='testmessage', recipient=Recipient(lms_user_id=123))
+
+    def error(self, seconds, error_class=RecoverableChannelDeliveryError, **kwargs):
+        return error_class('Try again later', get_current_time() + datetime.timedelta(seconds=seconds), **kwargs)
+
+    def test_retries_exhausted(self, mock_time):
+        self.channel.deliver.side_effect = [self.error(30), self.error(30), self.error(30)]
+
+        with patch.object(self.message, 'report') as mock_report:
+            assert not deliver(self.channel, sentinel.rendered_message, self.message)
+
+        assert mock_time.sleep.call_args_list == [call(1), call(2)]
+        assert self.channel.deliver.call_count == 3
+        mock_report.assert_any_call('email_delivery_retries_exhausted', 2)
+
+    def test_vendor_requested(self, mock_time):
+        self.channel.deliver.side_effect = [self.error(30, vendor_requested=True), None]
+
+        assert deliver(self.channel, sentinel.rendered_message, self.message)
+
+        assert 29 < mock_time.sleep.call_args[0][0] <= 30
+
+    def test_rate_limit_is_not_a_retry(self, mock_time):
+        self.channel.deliver.side_effect = [
+            self.error(0.5, RateLimitExceeded), self.error(0.5, RateLimitExceeded), self.error(30), None,
+        ]
+
+        assert deliver(self.channel, sentinel.rendered_message, self.message)
+
+        sleeps = [args[0] for args, _kwargs in mock_time.sleep.call_args_list]
+        assert 0 < sleeps[0] <= 0.5
+        assert 0 < sleeps[1] <= 0.5
+        assert sleeps[2] == 1
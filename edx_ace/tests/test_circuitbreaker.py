@@ -0,0 +1,182 @@
+"""
+Tests of :mod:`edx_ace.circuitbreaker`.
+"""
+import datetime
+from unittest.mock import Mock, call, patch
+
+from django.test import TestCase, override_settings
+
+from edx_ace import ace
+from edx_ace.channel import ChannelMap, ChannelType
+from edx_ace.circuitbreaker import CircuitBreaker, CircuitState, breaker_for, guard, reset_breakers
+from edx_ace.errors import (CircuitOpenError, FatalChannelDeliveryError, RateLimitExceeded,
+                            RecoverableChannelDeliveryError)
+from edx_ace.message import Message
+from edx_ace.recipient import Recipient
+from edx_ace.test_utils import patch_policies
+from edx_ace.utils.date import get_current_time
+
+
+class TestCircuitBreaker(TestCase):
+    """
+    Tests of :class:`.CircuitBreaker`.
+    """
+    @patch('edx_ace.circuitbreaker.time.monotonic')
+    def test_states(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        breaker = CircuitBreaker('braze_email', failure_rate=0.5, minimum_calls=4, window=10, reset_timeout=30)
+
+        # Too few calls to open.
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.state is CircuitState.CLOSED
+
+        # Old calls leave the window.
+        mock_monotonic.return_value = 120
+        for outcome in (breaker.record_success, breaker.record_success, breaker.record_failure):
+            outcome()
+        assert breaker.state is CircuitState.CLOSED
+        breaker.record_failure()
+        assert breaker.state is CircuitState.OPEN
+        assert not breaker.allow()
+        assert breaker.retry_after() == 30
+
+        # One trial call at a time once half-open; a failure opens the breaker again.
+        mock_monotonic.return_value = 150
+        assert breaker.state is CircuitState.HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state is CircuitState.OPEN
+
+        # A successful trial closes it.
+        mock_monotonic.return_value = 180
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state is CircuitState.CLOSED
+        assert breaker.allow()
+        assert breaker.allow()
+
+
+@override_settings(ACE_CHANNEL_CIRCUIT_BREAKERS={'braze_email': {'minimum_calls': 2, 'reset_timeout': 60}})
+class TestGuard(TestCase):
+    """
+    Tests of :func:`.guard`.
+    """
+    def setUp(self):
+        super().setUp()
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+        self.channel = Mock(channel_type=ChannelType.EMAIL)
+        ChannelMap([['braze_email', self.channel]])
+
+    def deliver(self, error=None):
+        """
+        Make a delivery through the guard that raises ``error``, if any, and ignore the error.
+        """
+        try:
+            with guard(self.channel):
+                if error:
+                    raise error
+        except Exception:
+            pass
+
+    def test_unconfigured(self):
+        assert breaker_for(Mock(channel_name='file_email')) is None
+        with guard(Mock(channel_name='file_email')):
+            pass
+
+    def test_counted_errors(self):
+        next_attempt_time = get_current_time()
+        self.deliver(RateLimitExceeded('slow down', next_attempt_time))
+        self.deliver(FatalChannelDeliveryError('bad request'))
+        self.deliver(RateLimitExceeded('slow down', next_attempt_time))
+        assert breaker_for(self.channel).state is CircuitState.CLOSED
+
+        self.deliver(TimeoutError())
+        self.deliver(RecoverableChannelDeliveryError('unavailable', next_attempt_time))
+        assert breaker_for(self.channel).state is CircuitState.OPEN
+
+        with self.assertRaises(CircuitOpenError) as context:
+            with guard(self.channel):
+                raise AssertionError('The breaker should not let the delivery through.')
+        assert context.exception.channel_name == 'braze_email'
+
+
+@override_settings(
+    ACE_CHANNEL_DEFAULT_EMAIL='braze_email',
+    ACE_CHANNEL_TRANSACTIONAL_EMAIL='file_email',
+    ACE_CHANNEL_CIRCUIT_BREAKERS={'braze_email': {'minimum_calls': 2, 'reset_timeout': 60}},
+)
+class TestCircuitBreakerRouting(TestCase):
+    """
+    Tests of how :func:`.ace.send` routes messages while a circuit breaker is open.
+    """
+    def setUp(self):
+        super().setUp()
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+        patch_policies(self, [])
+        self.braze = self.make_channel()
+        self.braze.overrides_delivery_for_message.return_value = True
+        self.braze.deliver.side_effect = RecoverableChannelDeliveryError(
+            'Recoverable Braze error (status_code=503)', get_current_time() + datetime.timedelta(seconds=1),
+        )
+        self.file = self.make_channel()
+        self.file.overrides_delivery_for_message.return_value = False
+        channel_map = ChannelMap([['braze_email', self.braze], ['file_email', self.file]])
+        patcher = patch('edx_ace.channel.channels', return_value=channel_map)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('edx_ace.delivery.time')
+        self.mock_time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def make_channel():
+        return Mock(channel_type=ChannelType.EMAIL, action_links=[], get_action_links=[], tracker_image_sources=[])
+
+    def make_message(self, **options):
+        return Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=123),
+            options=options,
+        )
+
+    def test_reroute(self):
+        # The breaker opens on the second attempt, and the retries go to the next candidate channel.
+        msg = self.make_message(transactional=True)
+        with patch.object(msg, 'report') as mock_report:
+            outcomes = ace._send_to_channels(msg, [ChannelType.EMAIL])  # pylint: disable=protected-access
+
+        assert outcomes == {ChannelType.EMAIL: ace.SendOutcome.DELIVERED}
+        assert self.braze.deliver.call_count == 2
+        assert self.mock_time.sleep.call_count == 2
+        self.file.deliver.assert_called_once()
+        assert call('email_circuit_rerouted', 'file_email') in mock_report.call_args_list
+
+        # Later messages go straight to the next candidate channel.
+        results = list(ace.send_many([self.make_message(transactional=True) for _ in range(3)]))
+        assert [result.outcomes[ChannelType.EMAIL] for result in results] == [ace.SendOutcome.DELIVERED] * 3
+        assert self.braze.deliver.call_count == 2
+        assert self.file.deliver.call_count == 4
+
+    def test_fail_fast(self):
+        for _ in range(2):
+            ace.send(self.make_message(transactional=True))
+        assert self.file.deliver.call_count == 2
+
+        # Only the default channel is a candidate for non-transactional messages.
+        msg = self.make_message()
+        with patch.object(msg, 'report') as mock_report:
+            assert ace._send_to_channels(msg, [ChannelType.EMAIL]) == {  # pylint: disable=protected-access
+                ChannelType.EMAIL: ace.SendOutcome.CIRCUIT_OPEN,
+            }
+        mock_report.assert_called_with('email_circuit_open', 'The braze_email circuit breaker is open.')
+
+        with override_settings(ACE_CIRCUIT_BREAKER_FALLBACK=False):
+            results = list(ace.send_many([self.make_message(transactional=True)], [ChannelType.EMAIL]))
+        assert results[0].outcomes[ChannelType.EMAIL] == ace.SendOutcome.CIRCUIT_OPEN
+        assert self.braze.deliver.call_count == 2
+        assert self.file.deliver.call_count == 2
@@ -0,0 +1,67 @@
+"""
+Tests of the ``edx_ace`` management commands.
+"""
+from collections import Counter
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+
+class TestPrecompileTemplatesCommand(TestCase):
+    """
+    Tests of the ``ace_precompile_templates`` management command.
+    """
+    @staticmethod
+    def call_command():
+        """
+        Run the command, returning what it wrote to stdout and stderr, and the CommandError it raised, if any.
+        """
+        stdout, stderr = StringIO(), StringIO()
+        try:
+            call_command('ace_precompile_templates', stdout=stdout, stderr=stderr)
+        except CommandError as error:
+            return stdout.getvalue(), stderr.getvalue(), error
+        return stdout.getvalue(), stderr.getvalue(), None
+
+    def test_reports_problems(self):
+        stdout, stderr, error = self.call_command()
+
+        assert '2 ACE template' in str(error)
+        assert 'testapp/edx_ace/testmessage/email/' in stdout
+        assert 'brokenmessage/email/subject.txt: TemplateSyntaxError' in stderr
+        assert 'brokenmessage/email/body.txt: TemplateDoesNotExist' in stderr
+
+    @patch('edx_ace.management.commands.ace_precompile_templates.precompile_templates', return_value=[])
+    def test_success(self, _mock_precompile):
+        stdout, stderr, error = self.call_command()
+        assert error is None
+        assert 'Compiled the templates of 3 ACE message(s).' in stdout
+        assert not stderr
+
+
+class TestContextVariablesCommand(TestCase):
+    """
+    Tests of the ``ace_context_variables`` management command.
+    """
+    def test_lists_variables(self):
+        stdout = StringIO()
+        call_command('ace_context_variables', stdout=stdout)
+
+        lines = stdout.getvalue().splitlines()
+        assert 'testapp.singlemessage: course_name, greeting, message' in lines
+        assert any(line.startswith('testapp.testmessage: ') and 'omit_unsubscribe_link' in line for line in lines)
+
+
+class TestDrainOutboxCommand(TestCase):
+    """
+    Tests of the ``ace_drain_outbox`` management command.
+    """
+    @patch('edx_ace.management.commands.ace_drain_outbox.drain', return_value=Counter(delivered=3, failed=1))
+    def test_drain(self, mock_drain):
+        stdout = StringIO()
+        call_command('ace_drain_outbox', '--channel', 'braze_email', '--rate', '20', stdout=stdout)
+
+        mock_drain.assert_called_once_with(limit=None, channel_names=['braze_email'], max_attempts=None, rate=20)
+        assert 'Delivered 3 message(s), 1 failed.' in stdout.getvalue()
@@ -1,13 +1,14 @@
 # pylint: disable=missing-module-docstring
 import datetime
-from unittest.mock import Mock, call, patch, sentinel
+import threading
+from unittest.mock import AsyncMock, Mock, call, patch, sentinel
 
 from dateutil.tz import tzutc
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from edx_ace.channel import ChannelType
-from edx_ace.delivery import deliver
+from edx_ace.delivery import RetryScheduler, adeliver, deliver
 from edx_ace.errors import FatalChannelDeliveryError, RecoverableChannelDeliveryError
 from edx_ace.message import Message
 from edx_ace.recipient import Recipient
@@ -118,3 +119,171 @@ class TestDelivery(TestCase):  # pylint: disable=missing-class-docstring
         deliver(mock_push_channel, sentinel.rendered_email, self.message)
         # check if ACE_MESSAGE_SENT is raised
         mock_ace_message_sent.assert_called_once_with(mock_push_channel, self.message)
+
+
+class TestAsyncDelivery(TestCase):  # pylint: disable=missing-class-docstring
+    def setUp(self):
+        super().setUp()
+
+        self.mock_channel = Mock(
+            name='test_channel',
+            channel_type=ChannelType.EMAIL,
+            adeliver=AsyncMock(),
+        )
+        self.message = Message(
+            app_label=str(sentinel.app_label),
+            name=str(sentinel.name),
+            recipient=Recipient(lms_user_id=123),
+        )
+        self.current_time = datetime.datetime.utcnow().replace(tzinfo=tzutc())
+
+    @patch('edx_ace.delivery.send_ace_message_sent_signal')
+    async def test_happy_path(self, mock_ace_message_sent):
+        assert await adeliver(self.mock_channel, sentinel.rendered_email, self.message) is True
+        self.mock_channel.adeliver.assert_awaited_once_with(self.message, sentinel.rendered_email)
+        assert not self.mock_channel.deliver.called
+        mock_ace_message_sent.assert_called_once_with(self.mock_channel, self.message)
+
+    @patch('edx_ace.delivery.asyncio.sleep', new_callable=AsyncMock)
+    @patch('edx_ace.delivery.time')
+    async def test_retry_uses_asyncio_sleep(self, mock_time, mock_sleep):
+        self.mock_channel.adeliver.side_effect = [
+            RecoverableChannelDeliveryError('Try again later', self.current_time + datetime.timedelta(seconds=10)),
+            None,
+        ]
+        assert await adeliver(self.mock_channel, sentinel.rendered_email, self.message) is True
+        assert self.mock_channel.adeliver.await_count == 2
+        assert mock_sleep.await_count == 1
+        assert not mock_time.sleep.called
+
+    @patch('edx_ace.delivery.asyncio.sleep', new_callable=AsyncMock)
+    async def test_next_attempt_time_after_expiration(self, mock_sleep):
+        self.message.expiration_time = self.current_time + datetime.timedelta(seconds=10)
+        self.mock_channel.adeliver.side_effect = RecoverableChannelDeliveryError(
+            'Try again later', self.current_time + datetime.timedelta(seconds=11),
+        )
+        assert await adeliver(self.mock_channel, sentinel.rendered_email, self.message) is False
+        assert not mock_sleep.called
+
+
+@override_settings(ACE_DELIVERY_RETRY_SCHEDULER_ENABLED=True)
+class TestScheduledDelivery(TestCase):  # pylint: disable=missing-class-docstring
+    def setUp(self):
+        super().setUp()
+
+        self.mock_channel = Mock(
+            name='test_channel',
+            channel_type=ChannelType.EMAIL
+        )
+        self.message = Message(
+            app_label=str(sentinel.app_label),
+            name=str(sentinel.name),
+            recipient=Recipient(lms_user_id=123),
+        )
+        self.message.report = Mock()
+        self.current_time = datetime.datetime.utcnow().replace(tzinfo=tzutc())
+
+        patcher = patch('edx_ace.delivery.retry_scheduler')
+        self.mock_scheduler = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def run_scheduled_retry(self):
+        (_delay, retry), _kwargs = self.mock_scheduler.schedule.call_args
+        self.mock_scheduler.schedule.reset_mock()
+        retry()
+
+    @patch('edx_ace.delivery.send_ace_message_sent_signal')
+    def test_happy_path(self, mock_ace_message_sent):
+        assert deliver(self.mock_channel, sentinel.rendered_email, self.message) is True
+        assert not self.mock_scheduler.schedule.called
+        mock_ace_message_sent.assert_called_once_with(self.mock_channel, self.message)
+
+    @patch('edx_ace.delivery.time')
+    def test_retry_does_not_block(self, mock_time):
+        self.mock_channel.deliver.side_effect = [
+            RecoverableChannelDeliveryError('Try again later', self.current_time + datetime.timedelta(seconds=30)),
+            None,
+        ]
+
+        assert deliver(self.mock_channel, sentinel.rendered_email, self.message) is None
+        assert not mock_time.sleep.called
+        assert self.mock_channel.deliver.call_count == 1
+        delay, _retry = self.mock_scheduler.schedule.call_args[0]
+        assert 28 < delay <= 30
+
+        self.run_scheduled_retry()
+        assert self.mock_channel.deliver.call_count == 2
+        self.message.report.assert_called_with('email_delivery_succeeded', True)
+
+    def test_retry_after_expiration(self):
+        self.message.expiration_time = self.current_time + datetime.timedelta(seconds=10)
+        self.mock_channel.deliver.side_effect = RecoverableChannelDeliveryError(
+            'Try again later', self.current_time + datetime.timedelta(seconds=11),
+        )
+
+        assert deliver(self.mock_channel, sentinel.rendered_email, self.message) is False
+        assert not self.mock_scheduler.schedule.called
+        assert self.message.report.call_args[0][0] == 'email_delivery_expired'
+
+    @patch('edx_ace.delivery.get_current_time')
+    def test_expired_when_retry_is_due(self, mock_get_current_time):
+        mock_get_current_time.return_value = self.current_time
+        self.mock_channel.deliver.side_effect = RecoverableChannelDeliveryError(
+            'Try again later', self.current_time + datetime.timedelta(seconds=1),
+        )
+        deliver(self.mock_channel, sentinel.rendered_email, self.message)
+
+        mock_get_current_time.return_value = self.current_time + datetime.timedelta(days=1)
+        self.run_scheduled_retry()
+        assert self.mock_channel.deliver.call_count == 1
+        assert self.message.report.call_args[0][0] == 'email_delivery_expired'
+
+    def test_fatal_error_on_retry_is_reported(self):
+        self.mock_channel.deliver.side_effect = [
+            RecoverableChannelDeliveryError('Try again later', self.current_time + datetime.timedelta(seconds=1)),
+            FatalChannelDeliveryError('testing'),
+        ]
+        deliver(self.mock_channel, sentinel.rendered_email, self.message)
+
+        self.run_scheduled_retry()
+        self.message.report.assert_called_with('email_error', 'testing')
+
+
+class TestRetryScheduler(TestCase):  # pylint: disable=missing-class-docstring
+    def setUp(self):
+        super().setUp()
+        self.scheduler = RetryScheduler(num_workers=1)
+        self.addCleanup(self.scheduler.shutdown)
+
+    def test_runs_in_due_order(self):
+        ran = []
+        done = threading.Event()
+        self.scheduler.schedule(0.05, lambda: (ran.append('late'), done.set()))
+        self.scheduler.schedule(0.01, lambda: ran.append('early'))
+
+        assert done.wait(5)
+        assert ran == ['early', 'late']
+        assert len(self.scheduler) == 0
+
+    def test_failing_callable_does_not_stop_worker(self):
+        done = threading.Event()
+        self.scheduler.schedule(0, Mock(side_effect=ValueError))
+        self.scheduler.schedule(0, done.set)
+
+        assert done.wait(5)
+
+    def test_shutdown_drops_pending(self):
+        func, on_drop = Mock(), Mock()
+        self.scheduler.schedule(60, func, on_drop=on_drop)
+        self.scheduler.schedule(60, Mock())
+
+        self.scheduler.shutdown()
+
+        on_drop.assert_called_once_with()
+        func.assert_not_called()
+        assert len(self.scheduler) == 0
+
+    def test_schedule_after_shutdown(self):
+        self.scheduler.shutdown()
+        with self.assertRaises(RuntimeError):
+            self.scheduler.schedule(0, Mock())
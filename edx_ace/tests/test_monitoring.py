@@ -0,0 +1,150 @@
+"""
+Tests of :mod:`edx_ace.monitoring`.
+"""
+from unittest.mock import Mock, patch
+
+from django.test import TestCase, override_settings
+
+from edx_ace import ace
+from edx_ace.channel import ChannelMap, ChannelType
+from edx_ace.message import Message
+from edx_ace.monitoring import (TEMPLATE_PROFILER, DryRunReport, Histogram, InProcessMetricsSink, TemplateProfiler,
+                                metrics_sink, template_profiler, time_stage)
+from edx_ace.recipient import Recipient
+from edx_ace.test_utils import StubPolicy, patch_policies
+
+
+class TestHistogram(TestCase):
+    """
+    Tests of :class:`.Histogram`.
+    """
+    def test_empty(self):
+        histogram = Histogram()
+        assert histogram.percentile(50) is None
+        assert histogram.to_dict()['count'] == 0
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for _ in range(98):
+            histogram.observe(0.002)
+        histogram.observe(0.2)
+        histogram.observe(3)
+
+        assert histogram.count == 100
+        assert histogram.min == 0.002
+        assert histogram.max == 3
+        assert histogram.percentile(50) == 0.0025
+        assert histogram.percentile(99) == 0.25
+        assert histogram.percentile(100) == 3
+
+
+class TestDryRunReport(TestCase):
+    """
+    Tests of :class:`.DryRunReport`.
+    """
+    @patch('edx_ace.monitoring.time.perf_counter')
+    def test_summary(self, mock_perf_counter):
+        mock_perf_counter.return_value = 10
+        report = DryRunReport()
+        mock_perf_counter.return_value = 12
+        report.record_render(ChannelType.EMAIL, 0.5, {'subject': 10, 'body_html': 1000})
+        report.record_render(ChannelType.EMAIL, None, {'subject': 20, 'body_html': 2000})
+        report.record_render(ChannelType.PUSH, 0.1, {'body': 30})
+        report.record_message({ChannelType.EMAIL: 'dry_run', ChannelType.PUSH: 'dry_run'})
+        report.record_message({ChannelType.EMAIL: 'dry_run', ChannelType.PUSH: 'template_error'})
+
+        summary = report.summary()
+        assert summary['messages'] == 2
+        assert summary['renders'] == 3
+        assert summary['elapsed_seconds'] == 2
+        assert summary['messages_per_second'] == 1
+        assert summary['outcomes'] == {'dry_run': 3, 'template_error': 1}
+        assert summary['channels']['email']['render_seconds']['count'] == 1
+        assert summary['channels']['email']['bytes']['max'] == 2020
+        assert summary['channels']['email']['field_bytes'] == {'subject': 30, 'body_html': 3000}
+
+    def test_empty(self):
+        summary = DryRunReport().summary()
+        assert summary['messages'] == 0
+        assert summary['messages_per_second'] is None
+
+
+class TestTemplateProfiler(TestCase):
+    """
+    Tests of :class:`.TemplateProfiler`.
+    """
+    def test_slowest(self):
+        profiler = TemplateProfiler()
+        profiler.record('a/subject.txt', 0.001)
+        profiler.record('a/body.html', 0.5)
+        profiler.record('b/body.html', 0.01)
+        profiler.record('b/body.html', 2)
+
+        assert [name for name, _ in profiler.slowest()] == ['b/body.html', 'a/body.html', 'a/subject.txt']
+        assert [name for name, _ in profiler.slowest(1)] == ['b/body.html']
+        assert profiler.slowest()[0][1]['count'] == 2
+
+        with override_settings(ACE_SLOW_TEMPLATE_REPORT_SIZE=2):
+            assert len(profiler.slowest()) == 2
+
+        profiler.reset()
+        assert not profiler.slowest()
+
+    def test_disabled_by_default(self):
+        assert template_profiler() is None
+        with override_settings(ACE_TEMPLATE_PROFILING_ENABLED=True):
+            assert template_profiler() is TEMPLATE_PROFILER
+
+
+class TestMetricsSink(TestCase):
+    """
+    Tests of :func:`.time_stage` and :class:`.InProcessMetricsSink`.
+    """
+    def setUp(self):
+        super().setUp()
+        self.sink = InProcessMetricsSink()
+        patcher = patch('edx_ace.monitoring._configured_sink', return_value=self.sink)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.msg = Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=123),
+        )
+
+    def test_disabled_by_default(self):
+        assert metrics_sink() is None
+        with time_stage('presentation.render', self.msg, ChannelType.EMAIL):
+            pass
+        assert not self.sink.snapshot()
+
+    @override_settings(ACE_METRICS_ENABLED=True)
+    def test_time_stage(self):
+        with time_stage('presentation.render', self.msg, ChannelType.EMAIL):
+            pass
+
+        histogram = self.sink.histogram('presentation.render', 'email', 'testapp.testmessage')
+        assert histogram.count == 1
+        assert histogram.min >= 0
+
+        self.sink.reset()
+        assert not self.sink.snapshot()
+
+    @override_settings(ACE_METRICS_ENABLED=True)
+    def test_send_pipeline_stages(self):
+        patch_policies(self, [StubPolicy([ChannelType.PUSH])])
+        mock_channel = Mock(
+            channel_type=ChannelType.EMAIL,
+            action_links=[],
+            get_action_links=[],
+            tracker_image_sources=[],
+        )
+        with patch('edx_ace.channel.channels', return_value=ChannelMap([['sailthru_email', mock_channel]])):
+            ace.send(self.msg)
+
+        assert set(self.sink.snapshot()) == {
+            ('policy.channels_for', None, 'testapp.testmessage'),
+            ('get_channel_for_message', 'email', 'testapp.testmessage'),
+            ('presentation.render', 'email', 'testapp.testmessage'),
+            ('channel.deliver', 'email', 'testapp.testmessage'),
+        }
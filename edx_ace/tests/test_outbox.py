@@ -0,0 +1,174 @@
+"""
+Tests of :mod:`edx_ace.outbox`.
+"""
+import datetime
+import os
+import tempfile
+from unittest.mock import Mock, patch, sentinel
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from edx_ace import ace
+from edx_ace.channel import ChannelMap, ChannelType
+from edx_ace.delivery import RetryScheduler, deliver
+from edx_ace.errors import FatalChannelDeliveryError, RecoverableChannelDeliveryError
+from edx_ace.message import Message
+from edx_ace.outbox import SQLiteBackend, drain
+from edx_ace.recipient import Recipient
+from edx_ace.utils.date import get_current_time
+
+
+class OutboxTestCase(TestCase):
+    """
+    Base class of tests with an empty SQLite outbox.
+    """
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.backend = SQLiteBackend(os.path.join(directory.name, 'outbox.sqlite3'))
+        patcher = patch('edx_ace.outbox.outbox_backend', return_value=self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestSQLiteBackend(OutboxTestCase):
+    """
+    Tests of :class:`.SQLiteBackend`.
+    """
+    def test_entries(self):
+        self.backend.add(ChannelType.EMAIL, 'braze_email', 'first', 'expired')
+        self.backend.add(ChannelType.PUSH, 'push_notification', 'second', 'expired')
+        self.backend.add(ChannelType.EMAIL, 'braze_email', 'third', 'expired')
+
+        first, second, third = self.backend.pending()
+        assert (first.channel_type, first.channel_name, first.message) == (ChannelType.EMAIL, 'braze_email', 'first')
+        assert second.channel_type == ChannelType.PUSH
+        assert [entry.message for entry in self.backend.pending(limit=2)] == ['first', 'second']
+        assert self.backend.pending(channel_names=['braze_email']) == [first, third]
+
+        self.backend.record_failure(first.id, 'failed again')
+        self.backend.remove(second.id)
+        assert [(entry.message, entry.reason, entry.attempts) for entry in self.backend.pending()] == [
+            ('first', 'failed again', 1),
+            ('third', 'expired', 0),
+        ]
+        assert self.backend.pending(max_attempts=1) == [third]
+
+    def test_path_setting(self):
+        with override_settings(ACE_OUTBOX_SQLITE_PATH=self.backend.path):
+            assert SQLiteBackend().path == self.backend.path
+        with override_settings(ACE_OUTBOX_ENABLED=True, ACE_OUTBOX_SQLITE_PATH=None):
+            with self.assertRaises(ImproperlyConfigured):
+                SQLiteBackend()
+
+
+@override_settings(ACE_OUTBOX_ENABLED=True)
+class TestOutbox(OutboxTestCase):
+    """
+    Tests of saving undelivered messages and redelivering them.
+    """
+    def setUp(self):
+        super().setUp()
+        self.channel = Mock(
+            channel_type=ChannelType.EMAIL, action_links=[], get_action_links=[], tracker_image_sources=[],
+        )
+        self.channel_map = ChannelMap([['braze_email', self.channel]])
+        patcher = patch('edx_ace.outbox.channels', return_value=self.channel_map)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_message(self, **kwargs):
+        return Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=123, email_address='mr@robot.io'),
+            context={'course_name': 'Demo'},
+            **kwargs
+        )
+
+    def test_saves_undelivered_messages(self):
+        expiring = self.make_message()
+        self.channel.deliver.side_effect = RecoverableChannelDeliveryError(
+            'Try again later', get_current_time() + datetime.timedelta(days=1),
+        )
+        assert not deliver(self.channel, sentinel.rendered_message, expiring)
+
+        failing = self.make_message()
+        self.channel.deliver.side_effect = FatalChannelDeliveryError('boom')
+        with self.assertRaises(FatalChannelDeliveryError):
+            deliver(self.channel, sentinel.rendered_message, failing)
+
+        with override_settings(ACE_OUTBOX_ENABLED=False):
+            with self.assertRaises(FatalChannelDeliveryError):
+                deliver(self.channel, sentinel.rendered_message, self.make_message())
+
+        entries = self.backend.pending()
+        assert [(entry.channel_name, entry.reason) for entry in entries] == [
+            ('braze_email', 'email_delivery_expired'),
+            ('braze_email', 'FatalChannelDeliveryError: boom'),
+        ]
+        saved = Message.from_string(entries[0].message)
+        assert (saved.uuid, saved.context, saved.recipient) == (expiring.uuid, expiring.context, expiring.recipient)
+
+    def test_saves_circuit_open_messages(self):
+        message = self.make_message()
+        with patch('edx_ace.ace.get_channel_for_message', return_value=self.channel), \
+                patch('edx_ace.ace.get_channels_for_message', return_value=[self.channel]), \
+                patch('edx_ace.ace.circuitbreaker.is_open', return_value=True):
+            outcomes = ace._send_to_channels(message, [ChannelType.EMAIL])  # pylint: disable=protected-access
+
+        assert outcomes == {ChannelType.EMAIL: ace.SendOutcome.CIRCUIT_OPEN}
+        self.channel.deliver.assert_not_called()
+        [entry] = self.backend.pending()
+        assert (entry.channel_name, entry.reason) == (
+            'braze_email', 'CircuitOpenError: The braze_email circuit breaker is open.',
+        )
+
+    def test_saves_dropped_retries(self):
+        scheduler = RetryScheduler(num_workers=1)
+        self.addCleanup(scheduler.shutdown)
+        self.channel.deliver.side_effect = RecoverableChannelDeliveryError(
+            'Try again later', get_current_time() + datetime.timedelta(seconds=60),
+        )
+        message = self.make_message()
+        with patch('edx_ace.delivery.retry_scheduler', return_value=scheduler):
+            assert deliver(self.channel, sentinel.rendered_message, message, use_retry_scheduler=True) is None
+
+        scheduler.shutdown()
+        assert [entry.reason for entry in self.backend.pending()] == ['email_delivery_retry_dropped']
+
+    def test_drain(self):
+        messages = [self.make_message() for _ in range(3)]
+        for message in messages:
+            self.backend.add(ChannelType.EMAIL, 'braze_email', str(message), 'email_delivery_expired')
+        self.backend.add(ChannelType.EMAIL, 'sailthru_email', str(self.make_message()), 'email_delivery_expired')
+        self.channel.deliver.side_effect = [None, FatalChannelDeliveryError('boom'), None]
+
+        outcomes = drain()
+
+        assert outcomes == {'delivered': 2, 'failed': 2}
+        assert [call.args[0].uuid for call in self.channel.deliver.call_args_list] == [
+            message.uuid for message in messages
+        ]
+        # The messages that failed again stay in the outbox, once.
+        assert [(entry.reason, entry.attempts) for entry in self.backend.pending()] == [
+            ('FatalChannelDeliveryError: boom', 1),
+            ('The sailthru_email channel is not enabled.', 1),
+        ]
+
+        self.channel.deliver.side_effect = None
+        assert not drain(channel_names=['braze_email'], max_attempts=1)
+        assert drain(channel_names=['braze_email'], rate=100) == {'delivered': 1}
+        assert len(self.backend.pending()) == 1
+
+    def test_drain_only_reports_missing_channels(self):
+        self.backend.add(ChannelType.EMAIL, 'braze_email', str(self.make_message()), 'email_delivery_expired')
+        self.channel.deliver.side_effect = KeyError('dispatch_id')
+
+        with self.assertRaises(KeyError):
+            drain()
+
+        [entry] = self.backend.pending()
+        assert (entry.reason, entry.attempts) == ('email_delivery_expired', 0)
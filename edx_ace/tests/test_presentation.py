@@ -2,10 +2,28 @@
 Tests of :mod:`edx_ace.presentation`.
 """
 from unittest import TestCase
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
+import attr
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.test import TestCase as DjangoTestCase
+from django.test import override_settings
+from django.utils import translation
+
+from edx_ace import presentation
+from edx_ace.channel import ChannelType
+from edx_ace.channel.file import FileEmailChannel
 from edx_ace.errors import UnsupportedChannelError
-from edx_ace.presentation import render
+from edx_ace.message import Message, MessageType
+from edx_ace.presentation import (CONTEXT_VARIABLES_CACHE, RENDER_CACHE, RenderCache, context_variables,
+                                  discover_message_templates, precompile_templates, prewarm_translations, prune_context,
+                                  render, render_cache_key, render_many, render_process_pool)
+from edx_ace.recipient import Recipient
+from edx_ace.renderers import TEMPLATE_CACHE
+from edx_ace.test_utils import StubPolicy
 
 
 class TestRender(TestCase):
@@ -22,3 +40,311 @@ class TestRender(TestCase):
 
         with self.assertRaises(UnsupportedChannelError):
             render(channel, message)
+
+
+class SubjectOnlyChannel(FileEmailChannel):
+    rendered_fields = ('subject',)
+
+
+@override_settings(ACE_RENDER_CACHE_ENABLED=True)
+class TestRenderCache(DjangoTestCase):
+    """
+    Tests of the rendered message cache.
+    """
+    def setUp(self):
+        super().setUp()
+        RENDER_CACHE.clear()
+        self.addCleanup(RENDER_CACHE.clear)
+        self.channel = FileEmailChannel()
+        self.renderer = presentation.RENDERERS[ChannelType.EMAIL]
+        patcher = patch.object(self.renderer, 'render', wraps=self.renderer.render)
+        self.mock_render = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_message(self, user_id=1, **context):
+        return Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=user_id),
+            language='en',
+            context={'course_name': 'Demo', **context},
+        )
+
+    def test_identical_contexts_share_rendering(self):
+        first = render(self.channel, self.make_message(1))
+        second = render(self.channel, self.make_message(2))
+
+        assert first == second
+        assert first is not second
+        assert self.mock_render.call_count == 1
+        assert len(RENDER_CACHE) == 1
+
+    def test_keyed_by_context_and_language(self):
+        render(self.channel, self.make_message())
+        render(self.channel, self.make_message(course_name='Other'))
+        render(self.channel, attr.evolve(self.make_message(), language='fr'))
+        assert self.mock_render.call_count == 3
+
+    @override_settings(ACE_RENDER_CACHE_PER_RECIPIENT_KEYS=['first_name'])
+    def test_per_recipient_keys_force_a_miss(self):
+        render(self.channel, self.make_message(first_name='Ada'))
+        render(self.channel, self.make_message(first_name='Ada'))
+        assert self.mock_render.call_count == 2
+        assert not RENDER_CACHE
+
+    @override_settings(ACE_RENDER_CACHE_IGNORED_KEYS=['tracking_id'])
+    def test_ignored_keys(self):
+        render(self.channel, self.make_message(tracking_id=1))
+        render(self.channel, self.make_message(tracking_id=2))
+        assert self.mock_render.call_count == 1
+
+    @override_settings(ACE_RENDER_CACHE_ENABLED=False)
+    def test_disabled(self):
+        render(self.channel, self.make_message())
+        render(self.channel, self.make_message())
+        assert self.mock_render.call_count == 2
+        assert not RENDER_CACHE
+
+    def test_byte_limit(self):
+        size = RenderCache.entry_size(render(self.channel, self.make_message()))
+        with override_settings(ACE_RENDER_CACHE_MAX_BYTES=size * 2):
+            RENDER_CACHE.clear()
+            for index in range(3):
+                render(self.channel, self.make_message(course_name=f'Course {index}'))
+            assert len(RENDER_CACHE) == 2
+            assert RENDER_CACHE.total_bytes <= size * 2
+
+    def test_cached_renderings_are_finished(self):
+        channel = SubjectOnlyChannel()
+        first = render(channel, self.make_message(1))
+        # The message that was rendered only renders the fields its channel reads...
+        assert set(first.rendered_fields()) == {'subject'}
+        # ...but the cache keeps every field rendered, rather than the first message to render them from.
+        cached = RENDER_CACHE.get(render_cache_key(channel, self.make_message(1), 'en'))
+        assert set(cached.rendered_fields()) == {field.name for field in attr.fields(type(cached))}
+        assert RENDER_CACHE.total_bytes == RenderCache.entry_size(cached) > len('template subject.txt')
+
+        second = render(channel, self.make_message(2))
+        assert second.body == 'template body.txt'
+        assert 'body' not in first.rendered_fields()
+        assert self.mock_render.call_count == 1
+
+    def test_unserializable_context_is_not_cached(self):
+        render(self.channel, self.make_message(course=object()))
+        assert not RENDER_CACHE
+
+
+class TestTranslations(DjangoTestCase):
+    """
+    Tests of language activation while rendering.
+    """
+    def make_message(self, language):
+        return Message(app_label='testapp', name='testmessage', recipient=Recipient(lms_user_id=1), language=language)
+
+    def test_active_language_is_not_reactivated(self):
+        override = translation.override
+        with patch('edx_ace.presentation.translation.override', wraps=override) as mock_override:
+            with override('fr'):
+                render(FileEmailChannel(), self.make_message('fr'))
+            assert not mock_override.called
+
+            render(FileEmailChannel(), self.make_message('fr'))
+            mock_override.assert_called_once_with('fr')
+
+    @override_settings(LANGUAGES=[('en', 'English'), ('fr', 'French')])
+    def test_prewarm_translations(self):
+        with patch('edx_ace.presentation.translation.override', wraps=translation.override) as mock_override:
+            prewarm_translations()
+            prewarm_translations(['de'])
+        assert [call.args for call in mock_override.call_args_list] == [('en',), ('fr',), ('de',)]
+
+    @override_settings(USE_I18N=False)
+    def test_prewarm_translations_without_i18n(self):
+        with patch('edx_ace.presentation.translation.override') as mock_override:
+            prewarm_translations()
+        assert not mock_override.called
+
+    @patch('edx_ace.presentation.prewarm_translations')
+    def test_prewarmed_when_ready(self, mock_prewarm):
+        app_config = apps.get_app_config('edx_ace')
+        app_config.ready()
+        assert not mock_prewarm.called
+
+        with override_settings(ACE_PREWARM_TRANSLATIONS=True):
+            app_config.ready()
+        with override_settings(ACE_PREWARM_TRANSLATIONS=['fr']):
+            app_config.ready()
+        assert [call.args for call in mock_prewarm.call_args_list] == [(None,), (['fr'],)]
+
+
+class TestPrecompileTemplates(DjangoTestCase):
+    """
+    Tests of discovering and precompiling message templates.
+    """
+    def setUp(self):
+        super().setUp()
+        TEMPLATE_CACHE.clear()
+        self.addCleanup(TEMPLATE_CACHE.clear)
+
+    def test_discover_message_templates(self):
+        assert discover_message_templates() == [
+            ('testapp', 'brokenmessage', ChannelType.EMAIL),
+            ('testapp', 'singlemessage', ChannelType.EMAIL),
+            ('testapp', 'testmessage', ChannelType.EMAIL),
+        ]
+
+    def test_precompile_templates(self):
+        problems = precompile_templates()
+
+        assert [(path, type(error)) for path, error in problems] == [
+            ('testapp/edx_ace/brokenmessage/email/subject.txt', TemplateSyntaxError),
+            ('testapp/edx_ace/brokenmessage/email/body.txt', TemplateDoesNotExist),
+        ]
+        # Every template lookup except the broken one is now cached, including misses for message.html.
+        assert len(TEMPLATE_CACHE) == 13
+
+    @override_settings(ACE_PRECOMPILE_TEMPLATES=True)
+    def test_precompiled_when_ready(self):
+        with self.assertLogs('edx_ace.apps', 'ERROR') as logs:
+            apps.get_app_config('edx_ace').ready()
+        assert len(logs.records) == 2
+        assert len(TEMPLATE_CACHE) == 13
+
+    @override_settings(ACE_PRECOMPILE_TEMPLATES='strict')
+    def test_strict_precompilation(self):
+        with self.assertLogs('edx_ace.apps', 'ERROR'):
+            with self.assertRaises(ImproperlyConfigured):
+                apps.get_app_config('edx_ace').ready()
+
+
+class TestContextPruning(DjangoTestCase):
+    """
+    Tests of :func:`.prune_context`.
+    """
+    def setUp(self):
+        super().setUp()
+        CONTEXT_VARIABLES_CACHE.clear()
+        self.addCleanup(CONTEXT_VARIABLES_CACHE.clear)
+
+    def make_message(self, name='singlemessage', **context):
+        return Message(
+            app_label='testapp',
+            name=name,
+            recipient=Recipient(lms_user_id=123),
+            context=dict(context, course_name='Demo', push_notification_extra_context={'a': 1}),
+        )
+
+    def test_context_variables(self):
+        message = self.make_message()
+        assert context_variables(message) == {'course_name', 'greeting', 'message'}
+        with patch.object(presentation, '_context_variables') as mock_context_variables:
+            context_variables(message)
+        assert not mock_context_variables.called
+
+        assert context_variables(self.make_message('brokenmessage')) is None
+        assert context_variables(self.make_message('nosuchmessage')) is None
+
+    def test_disabled_by_default(self):
+        message = self.make_message(unused='x')
+        prune_context(message)
+        assert 'unused' in message.context
+
+    @override_settings(ACE_PRUNE_MESSAGE_CONTEXT=True, ACE_CONTEXT_ALWAYS_KEPT_KEYS=['kept'])
+    def test_prune_context(self):
+        context = {'unused': 'x', 'kept': 'y'}
+        message = self.make_message(**context)
+        shared_context = message.context
+        prune_context(message)
+
+        assert message.context == {'course_name': 'Demo', 'kept': 'y', 'push_notification_extra_context': {'a': 1}}
+        assert 'unused' in shared_context
+        assert render(FileEmailChannel(), message).body == 'Demo body text\n'
+
+        # Messages whose templates can't be analyzed keep everything.
+        message = self.make_message('nosuchmessage', **context)
+        prune_context(message)
+        assert 'unused' in message.context
+
+    @override_settings(ACE_PRUNE_MESSAGE_CONTEXT=True)
+    def test_policy_keys(self):
+        declaring = StubPolicy([])
+        declaring.context_keys = ('course_ids',)
+        with patch('edx_ace.policy.policies', return_value=[declaring]):
+            message = self.make_message(course_ids=[1], unused='x')
+            prune_context(message)
+        assert message.context['course_ids'] == [1]
+        assert 'unused' not in message.context
+
+        # Policies that don't declare what they read may read anything, until they have been checked.
+        with patch('edx_ace.policy.policies', return_value=[declaring, StubPolicy([])]):
+            message = self.make_message(course_ids=[1], unused='x')
+            prune_context(message)
+            assert {'course_ids', 'unused'} <= set(message.context)
+            prune_context(message, policies_checked=True)
+        assert message.context == {'course_name': 'Demo', 'push_notification_extra_context': {'a': 1}}
+
+    @override_settings(ACE_PRUNE_MESSAGE_CONTEXT=True)
+    def test_personalize(self):
+        message_type = MessageType(context={'course_name': 'Demo', 'unused': 'x'}, app_label='testapp')
+        message_type.name = 'singlemessage'
+        message = message_type.personalize(Recipient(lms_user_id=123), 'en', {'first_name': 'Ada'})
+        assert message.context == {'course_name': 'Demo'}
+
+
+class TestRenderMany(DjangoTestCase):
+    """
+    Tests of rendering batches of messages, optionally in a process pool.
+    """
+    def setUp(self):
+        super().setUp()
+        self.channel = FileEmailChannel()
+
+    def make_message(self, user_id, name='testmessage', **context):
+        return Message(
+            app_label='testapp',
+            name=name,
+            recipient=Recipient(lms_user_id=user_id, email_address=f'learner{user_id}@example.com'),
+            language='en',
+            context={'course_name': f'Course {user_id}', **context},
+        )
+
+    def make_items(self):
+        return [
+            (self.channel, self.make_message(1)),
+            (self.channel, self.make_message(2, name='singlemessage')),
+            (self.channel, self.make_message(3, name='nosuchmessage')),
+            # Can't be serialized, so it's rendered in this process.
+            (self.channel, self.make_message(4, name='singlemessage', unserializable=object())),
+        ]
+
+    @patch('edx_ace.presentation.render_process_pool')
+    def test_in_process(self, mock_pool):
+        items = self.make_items()
+        results = render_many(items, return_exceptions=True)
+
+        assert not mock_pool.called
+        assert results[0] == render(*items[0])
+        assert results[1].subject == 'Welcome to Course 2'
+        assert isinstance(results[2], TemplateDoesNotExist)
+        assert results[3].from_name == 'Course 4'
+
+    def test_raises_first_error(self):
+        with self.assertRaises(TemplateDoesNotExist):
+            render_many(self.make_items())
+
+    @override_settings(ACE_RENDER_PROCESSES=2)
+    def test_process_pool(self):
+        # A pool like the process-wide one, whose processes aren't forked.
+        pool = render_process_pool.__wrapped__()
+        self.addCleanup(pool.shutdown)
+        items = self.make_items()
+
+        with patch('edx_ace.presentation.render_process_pool', return_value=pool):
+            with patch('edx_ace.presentation.render', wraps=render) as mock_render:
+                results = render_many(items, return_exceptions=True)
+
+        # Only the unserializable message was rendered in this process.
+        mock_render.assert_called_once_with(*items[3])
+        assert results[:2] == [render(*items[0]), render(*items[1])]
+        assert isinstance(results[2], TemplateDoesNotExist)
+        assert results[3].from_name == 'Course 4'
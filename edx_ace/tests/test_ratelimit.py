@@ -0,0 +1,156 @@
+"""
+Tests of :mod:`edx_ace.ratelimit`.
+"""
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import AsyncMock, Mock, patch, sentinel
+
+from django.test import TestCase, override_settings
+
+from edx_ace.channel import ChannelMap, ChannelType
+from edx_ace.delivery import adeliver, deliver
+from edx_ace.errors import RateLimitExceeded
+from edx_ace.message import Message
+from edx_ace.ratelimit import FileLockBackend, LocalBackend, Pacer, check_rate_limit
+from edx_ace.recipient import Recipient
+
+
+def take_token(directory):
+    return FileLockBackend(directory).take('braze_email', 0.001, 5)
+
+
+class TestLocalBackend(TestCase):
+    """
+    Tests of :class:`.LocalBackend`.
+    """
+    @patch('edx_ace.ratelimit.time.monotonic')
+    def test_token_bucket(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        backend = LocalBackend()
+
+        assert [backend.take('a', 2, 3) for _ in range(4)] == [0, 0, 0, 0.5]
+        assert backend.take('b', 2, 3) == 0
+
+        # Tokens are added at the rate, up to the burst size.
+        mock_monotonic.return_value = 100.5
+        assert backend.take('a', 2, 3) == 0
+        assert backend.take('a', 2, 3) == 0.5
+        mock_monotonic.return_value = 200
+        assert [backend.take('a', 2, 3) for _ in range(4)] == [0, 0, 0, 0.5]
+
+
+class TestPacer(TestCase):
+    """
+    Tests of :class:`.Pacer`.
+    """
+    @patch('edx_ace.ratelimit.time.time')
+    def test_spreads_remaining_requests(self, mock_time):
+        mock_time.return_value = 100
+        pacer = Pacer()
+        assert pacer.delay() == 0
+
+        pacer.update(remaining=4, reset_time=120)
+        assert pacer.delay() == 5
+        mock_time.return_value = 105
+        assert pacer.delay() == 0
+        # 3 requests left for the last 15 seconds.
+        assert pacer.delay() == 5
+
+        pacer.update(remaining=0, reset_time=120)
+        assert pacer.delay() == 15
+        mock_time.return_value = 120
+        assert pacer.delay() == 0
+
+    @patch('edx_ace.ratelimit.time.time', return_value=100)
+    def test_concurrency(self, _mock_time):
+        pacer = Pacer(concurrency=4)
+        pacer.update(remaining=101, reset_time=110)
+        assert pacer.delay() == 0
+        self.assertAlmostEqual(pacer.delay(), 0.4)
+
+
+class TestFileLockBackend(TestCase):
+    """
+    Tests of :class:`.FileLockBackend`.
+    """
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_shared_between_instances(self):
+        first, second = FileLockBackend(self.directory), FileLockBackend(self.directory)
+        assert first.take('braze_email', 0.001, 2) == 0
+        assert second.take('braze_email', 0.001, 2) == 0
+        assert first.take('braze_email', 0.001, 2) > 0
+        assert second.take('sailthru/email', 0.001, 2) == 0
+
+    def test_shared_between_processes(self):
+        with ProcessPoolExecutor(max_workers=3) as pool:
+            waits = list(pool.map(take_token, [self.directory] * 12))
+        assert waits.count(0) == 5
+
+    def test_directory_setting(self):
+        with override_settings(ACE_RATE_LIMIT_DIR=self.directory):
+            assert FileLockBackend().path('braze_email').startswith(self.directory)
+
+
+class TestCheckRateLimit(TestCase):
+    """
+    Tests of :func:`.check_rate_limit` and rate limited delivery.
+    """
+    def setUp(self):
+        super().setUp()
+        patcher = patch('edx_ace.ratelimit.rate_limit_backend', return_value=LocalBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.channel = Mock(channel_type=ChannelType.EMAIL)
+        ChannelMap([['braze_email', self.channel]])
+
+    def test_channel_name(self):
+        assert self.channel.channel_name == 'braze_email'
+
+    def test_unlimited(self):
+        for _ in range(10):
+            check_rate_limit(self.channel)
+
+    @override_settings(ACE_CHANNEL_RATE_LIMITS={'braze_email': {'rate': 0.5, 'burst': 2}})
+    def test_limited(self):
+        check_rate_limit(self.channel)
+        check_rate_limit(self.channel)
+        with self.assertRaises(RateLimitExceeded) as context:
+            check_rate_limit(self.channel)
+        assert context.exception.next_attempt_time is not None
+
+    @override_settings(ACE_CHANNEL_RATE_LIMITS={'braze_email': {'rate': 1, 'burst': 3}})
+    @patch('edx_ace.ratelimit.time.monotonic', side_effect=[0, 0, 0, 0, 1])
+    @patch('edx_ace.delivery.time')
+    def test_delivery_waits(self, mock_time, _mock_monotonic):
+        message = Message(app_label='testapp', name='testmessage', recipient=Recipient(lms_user_id=123))
+        for _ in range(4):
+            assert deliver(self.channel, sentinel.rendered_message, message)
+
+        assert self.channel.deliver.call_count == 4
+        assert mock_time.sleep.call_count == 1
+        assert 0 < mock_time.sleep.call_args[0][0] <= 1
+
+    def test_async_delivery_checks_off_loop(self):
+        message = Message(app_label='testapp', name='testmessage', recipient=Recipient(lms_user_id=123))
+        self.channel.adeliver = AsyncMock()
+        loop_threads, check_threads = [], []
+
+        async def send():
+            loop_threads.append(threading.get_ident())
+            return await adeliver(self.channel, sentinel.rendered_message, message)
+
+        def check(_channel):
+            check_threads.append(threading.get_ident())
+
+        with patch('edx_ace.delivery.ratelimit.check_rate_limit', side_effect=check) as mock_check:
+            assert asyncio.run(send())
+
+        mock_check.assert_called_once_with(self.channel)
+        assert check_threads[0] != loop_threads[0]
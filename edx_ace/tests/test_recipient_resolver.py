@@ -0,0 +1,99 @@
+"""
+Tests of :mod:`edx_ace.recipient_resolver`.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from edx_ace.message import MessageType
+from edx_ace.recipient import Recipient
+from edx_ace.recipient_resolver import StreamingRecipientResolver, iter_queryset_by_key
+
+User = get_user_model()
+
+
+class UserResolver(StreamingRecipientResolver):
+    """
+    Streams every user, recording checkpoints.
+    """
+    max_in_flight = 2
+
+    def __init__(self):
+        self.checkpoints = []
+
+    def get_recipients(self, msg_type, *args, after=None, **kwargs):
+        for user in iter_queryset_by_key(User.objects.all(), after=after, chunk_size=3):
+            yield Recipient(lms_user_id=user.id, email_address=user.email), 'en', {'username': user.username}
+
+    def checkpoint(self, msg_type, cursor):
+        self.checkpoints.append(cursor)
+
+
+class TestStreamingRecipientResolver(TestCase):
+    """
+    Tests of :class:`.StreamingRecipientResolver`.
+    """
+    def setUp(self):
+        super().setUp()
+        self.users = [User.objects.create(username=f'user{i}', email=f'user{i}@example.com') for i in range(5)]
+        self.msg_type = MessageType(app_label='testapp', name='testmessage', context={'course': 'demo'})
+
+    @patch('edx_ace.recipient_resolver.ace.send_many')
+    def test_send_in_windows(self, mock_send_many):
+        windows = []
+        mock_send_many.side_effect = self._record_window(windows)
+        resolver = UserResolver()
+
+        assert resolver.send(self.msg_type) == 5
+        assert [len(window) for window in windows] == [2, 2, 1]
+        assert resolver.checkpoints == [self.users[1].id, self.users[3].id, self.users[4].id]
+
+        message = windows[0][0]
+        assert message.recipient.lms_user_id == self.users[0].id
+        assert message.context == {'course': 'demo', 'username': 'user0'}
+        assert message.send_uuid == self.msg_type.uuid
+
+    @patch('edx_ace.recipient_resolver.ace.send_many')
+    def test_resume_from_cursor(self, mock_send_many):
+        windows = []
+        mock_send_many.side_effect = self._record_window(windows)
+
+        assert UserResolver().send(self.msg_type, after=self.users[2].id) == 2
+        assert [message.recipient.lms_user_id for message in windows[0]] == [self.users[3].id, self.users[4].id]
+
+    @staticmethod
+    def _record_window(windows):
+        """
+        Returns a stand-in for ``ace.send_many`` that appends each window of messages it is given to ``windows``.
+        """
+        def send_many(messages):
+            windows.append(list(messages))
+            return windows[-1]
+        return send_many
+
+
+class TestIterQuerysetByKey(TestCase):
+    """
+    Tests of :func:`.iter_queryset_by_key`.
+    """
+    def setUp(self):
+        super().setUp()
+        self.users = [User.objects.create(username=f'user{i}') for i in range(7)]
+
+    def test_iterates_in_chunks(self):
+        with self.assertNumQueries(3):
+            assert list(iter_queryset_by_key(User.objects.all(), chunk_size=3)) == self.users
+
+    def test_exact_multiple_of_chunk_size(self):
+        self.users.pop().delete()
+        with self.assertNumQueries(3):
+            assert list(iter_queryset_by_key(User.objects.all(), chunk_size=3)) == self.users
+
+    def test_after(self):
+        users = iter_queryset_by_key(User.objects.all(), after=self.users[4].pk, chunk_size=3)
+        assert list(users) == self.users[5:]
+
+    def test_other_key(self):
+        users = iter_queryset_by_key(User.objects.all(), key='username', after='user3', chunk_size=2)
+        assert list(users) == self.users[4:]
@@ -0,0 +1,408 @@
+"""
+Tests of :mod:`edx_ace.renderers`.
+"""
+import itertools
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.template import Context, Engine, Template, TemplateDoesNotExist, TemplateSyntaxError, loader
+from django.test import TestCase, override_settings
+from django.utils import translation
+from django.utils.autoreload import file_changed
+
+from edx_ace.channel.file import FileEmailChannel
+from edx_ace.errors import RenderTimeBudgetExceeded
+from edx_ace.message import Message, MessageType
+from edx_ace.monitoring import TEMPLATE_PROFILER
+from edx_ace.recipient import Recipient
+from edx_ace.renderers import FRAGMENT_CACHE, TEMPLATE_CACHE, EmailRenderer, RenderedEmail
+
+
+class TestTemplateCache(TestCase):
+    """
+    Tests of the compiled template cache used by :class:`.AbstractRenderer`.
+    """
+    def setUp(self):
+        super().setUp()
+        TEMPLATE_CACHE.clear()
+        self.addCleanup(TEMPLATE_CACHE.clear)
+        self.renderer = EmailRenderer()
+        self.channel = FileEmailChannel()
+        self.message = Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=123),
+        )
+
+    def get_template(self, filename, message=None):
+        return self.renderer.get_template_for_message(self.channel, message or self.message, filename)
+
+    def test_templates_are_loaded_once(self):
+        with patch('edx_ace.renderers.loader.get_template', wraps=loader.get_template) as mock_get:
+            first = self.get_template('subject.txt')
+            second = self.get_template('subject.txt')
+            self.get_template('body.txt')
+
+        assert first is second
+        assert mock_get.call_count == 2
+
+    def test_missing_templates_are_cached(self):
+        message = Message(app_label='testapp', name='nosuchmessage', recipient=Recipient(lms_user_id=123))
+
+        with patch('edx_ace.renderers.loader.get_template', wraps=loader.get_template) as mock_get:
+            for _ in range(3):
+                with self.assertRaisesRegex(TemplateDoesNotExist, 'nosuchmessage/email/subject.txt'):
+                    self.get_template('subject.txt', message)
+
+        assert mock_get.call_count == 1
+
+    @override_settings(ACE_TEMPLATE_CACHE_SIZE=2)
+    def test_least_recently_used_are_evicted(self):
+        subject = self.get_template('subject.txt')
+        self.get_template('body.txt')
+        assert self.get_template('subject.txt') is subject
+        self.get_template('from_name.txt')
+
+        assert len(TEMPLATE_CACHE) == 2
+        with patch('edx_ace.renderers.loader.get_template', wraps=loader.get_template) as mock_get:
+            self.get_template('subject.txt')
+            self.get_template('body.txt')
+        assert mock_get.call_count == 1
+
+    @override_settings(ACE_TEMPLATE_CACHE_SIZE=0)
+    def test_disabled(self):
+        self.get_template('subject.txt')
+        assert not TEMPLATE_CACHE
+
+    def test_cleared_by_signals(self):
+        self.get_template('subject.txt')
+        setting_changed.send(sender=None, setting='TEMPLATES', value=None, enter=True)
+        assert not TEMPLATE_CACHE
+
+        self.get_template('subject.txt')
+        file_changed.send(sender=None, file_path=Path('body.html'))
+        assert not TEMPLATE_CACHE
+
+
+class TestSingleTemplateRendering(TestCase):
+    """
+    Tests of rendering several fields from the blocks of a single ``message.html`` template.
+    """
+    def setUp(self):
+        super().setUp()
+        TEMPLATE_CACHE.clear()
+        self.addCleanup(TEMPLATE_CACHE.clear)
+        self.renderer = EmailRenderer()
+        self.channel = FileEmailChannel()
+
+    def make_message(self, name='singlemessage'):
+        return Message(
+            app_label='testapp',
+            name=name,
+            recipient=Recipient(lms_user_id=123, email_address='learner@example.com'),
+            context={'course_name': 'Demo & Co'},
+        )
+
+    def test_blocks_and_fallback(self):
+        rendered = self.renderer.render(self.channel, self.make_message())
+
+        assert rendered == RenderedEmail(
+            from_name='Demo &amp; Co',
+            subject='Welcome to Demo &amp; Co',
+            head_html='<title>Demo &amp; Co</title>',
+            body_html='<p>Hello learner@example.com, Demo &amp; Co</p>',
+            body='Demo &amp; Co body text\n',
+        )
+
+    def test_templates_are_shared_through_cache(self):
+        templates = {}
+        first = self.renderer.render(self.channel, self.make_message(), templates=templates)
+        with patch.object(self.renderer, 'get_template_for_message') as mock_get:
+            second = self.renderer.render(self.channel, self.make_message(), templates=templates)
+
+        assert first == second
+        assert set(templates) == {'message.html', 'body.txt'}
+        mock_get.assert_not_called()
+
+    def test_per_file_layout_without_single_template(self):
+        templates = {}
+        rendered = self.renderer.render(self.channel, self.make_message('testmessage'), templates=templates)
+
+        assert rendered.subject == 'template subject.txt'
+        assert templates['message.html'] is None
+
+
+class TestBatchInvariantFragments(TestCase):
+    """
+    Tests of the ``{% ace_batch_invariant %}`` template tag.
+    """
+    def setUp(self):
+        super().setUp()
+        FRAGMENT_CACHE.clear()
+        self.addCleanup(FRAGMENT_CACHE.clear)
+        self.channel = FileEmailChannel()
+        self.template = Template(
+            '{% load acetags %}'
+            '{% ace_batch_invariant %}'
+            '{{ course_name }}:{% for i in items %}{{ i }}{% endfor %}'
+            '{% endace_batch_invariant %}'
+            ' {{ first_name }}'
+        )
+        self.msg_type = MessageType(app_label='testapp', name='testmessage', context={
+            'course_name': 'Demo', 'items': [1, 2, 3],
+        })
+
+    def render(self, message):
+        return self.template.render(Context({'message': message, 'channel': self.channel, **message.context}))
+
+    def personalize(self, first_name, language='en', msg_type=None):
+        return (msg_type or self.msg_type).personalize(Recipient(lms_user_id=1), language, {'first_name': first_name})
+
+    def test_rendered_once_per_batch(self):
+        assert self.render(self.personalize('Ada')) == 'Demo:123 Ada'
+        # Pretend the batch context changed, to show the cached fragment is reused.
+        self.msg_type.context['course_name'] = 'Changed'
+        assert self.render(self.personalize('Grace')) == 'Demo:123 Grace'
+        assert len(FRAGMENT_CACHE) == 1
+
+        other_batch = MessageType(app_label='testapp', name='testmessage', context=self.msg_type.context)
+        assert self.render(self.personalize('Alan', msg_type=other_batch)) == 'Changed:123 Alan'
+
+    def test_cached_per_language(self):
+        self.render(self.personalize('Ada'))
+        with translation.override('fr'):
+            self.render(self.personalize('Ada', language='fr'))
+        assert len(FRAGMENT_CACHE) == 2
+
+    def test_not_cached_without_send_uuid(self):
+        message = Message(
+            app_label='testapp', name='testmessage', recipient=Recipient(lms_user_id=1),
+            context={'course_name': 'Demo', 'items': [], 'first_name': 'Ada'},
+        )
+        assert self.render(message) == 'Demo: Ada'
+        assert not FRAGMENT_CACHE
+
+    @override_settings(ACE_BATCH_INVARIANT_CACHE_SIZE=0)
+    def test_disabled(self):
+        self.render(self.personalize('Ada'))
+        assert not FRAGMENT_CACHE
+
+    def test_inside_loop(self):
+        self.template = Template(
+            '{% load acetags %}'
+            '{% for i in items %}[{% ace_batch_invariant %}{{ i }}{% endace_batch_invariant %}]{% endfor %}'
+        )
+        assert self.render(self.personalize('Ada')) == '[1][2][3]'
+        assert self.render(self.personalize('Grace')) == '[1][2][3]'
+        # The loop state can't be part of the cache key, so the contents are rendered every time.
+        assert not FRAGMENT_CACHE
+
+    def test_local_variables(self):
+        engine = Engine(
+            loaders=[('django.template.loaders.cached.Loader', [('django.template.loaders.locmem.Loader', {
+                'fragment.html': '{% load acetags %}{% ace_batch_invariant %}{{ label }}{% endace_batch_invariant %}',
+            })])],
+            libraries={'acetags': 'edx_ace.templatetags.acetags'},
+        )
+        self.template = engine.from_string(
+            '{% include "fragment.html" with label="a" %}'
+            '{% include "fragment.html" with label="b" %}'
+            '{% include "fragment.html" with label="c" message=message only %}'
+            '{% with label="a" %}{% include "fragment.html" %}{% endwith %}'
+        )
+        assert self.render(self.personalize('Ada')) == 'abca'
+        assert len(FRAGMENT_CACHE) == 3
+
+    def test_takes_no_arguments(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template('{% load acetags %}{% ace_batch_invariant foo %}{% endace_batch_invariant %}')
+
+
+class SubjectOnlyChannel(FileEmailChannel):
+    rendered_fields = ('subject',)
+
+
+class TestLazyRendering(TestCase):
+    """
+    Tests of deferring the rendering of fields that a channel doesn't declare in ``rendered_fields``.
+    """
+    def setUp(self):
+        super().setUp()
+        TEMPLATE_CACHE.clear()
+        self.addCleanup(TEMPLATE_CACHE.clear)
+        self.renderer = EmailRenderer()
+
+    def make_message(self, name='testmessage'):
+        return Message(
+            app_label='testapp',
+            name=name,
+            recipient=Recipient(lms_user_id=123, email_address='learner@example.com'),
+            context={'course_name': 'Demo'},
+        )
+
+    def render(self, channel, name='testmessage'):
+        with patch('django.template.base.Template.render', autospec=True, side_effect=Template.render) as mock_render:
+            rendered = self.renderer.render(channel, self.make_message(name))
+        return rendered, mock_render
+
+    def test_only_declared_fields_are_rendered(self):
+        rendered, mock_render = self.render(SubjectOnlyChannel())
+
+        assert mock_render.call_count == 1
+        assert rendered.subject == 'template subject.txt'
+        assert rendered.body == 'template body.txt'
+        assert rendered == self.renderer.render(FileEmailChannel(), self.make_message())
+
+    def test_all_fields_rendered_by_default(self):
+        _, mock_render = self.render(FileEmailChannel())
+        assert mock_render.call_count == 5
+
+    def test_deferred_fields_render_in_message_language(self):
+        message = self.make_message('singlemessage')
+        with translation.override('fr'):
+            rendered = self.renderer.render(SubjectOnlyChannel(), message)
+        with patch('edx_ace.renderers.translation.override', wraps=translation.override) as mock_override:
+            assert rendered.from_name == 'Demo'
+        mock_override.assert_called_once_with('fr')
+
+    def test_missing_templates_are_still_reported(self):
+        with self.assertRaises(TemplateDoesNotExist):
+            self.renderer.render(SubjectOnlyChannel(), self.make_message('nosuchmessage'))
+
+    def test_pickling_renders_everything(self):
+        rendered = self.renderer.render(SubjectOnlyChannel(), self.make_message())
+        assert pickle.loads(pickle.dumps(rendered)) == rendered
+
+
+class TestRenderTiming(TestCase):
+    """
+    Tests of the template profiling and render time budget of :class:`.AbstractRenderer`.
+    """
+    def setUp(self):
+        super().setUp()
+        TEMPLATE_CACHE.clear()
+        self.addCleanup(TEMPLATE_CACHE.clear)
+        TEMPLATE_PROFILER.reset()
+        self.addCleanup(TEMPLATE_PROFILER.reset)
+        self.renderer = EmailRenderer()
+        self.message = Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=123),
+        )
+        # Every template takes one second to render.
+        patcher = patch('edx_ace.renderers.time')
+        patcher.start().perf_counter.side_effect = itertools.count()
+        self.addCleanup(patcher.stop)
+
+    def test_not_timed_by_default(self):
+        with patch.object(self.message, 'report') as mock_report:
+            self.renderer.render(FileEmailChannel(), self.message)
+        assert not mock_report.called
+        assert not TEMPLATE_PROFILER.slowest()
+
+    @override_settings(ACE_TEMPLATE_PROFILING_ENABLED=True)
+    def test_profiling(self):
+        with patch.object(self.message, 'report') as mock_report:
+            rendered = self.renderer.render(SubjectOnlyChannel(), self.message)
+
+        mock_report.assert_any_call('render_seconds', 1.0)
+        mock_report.assert_any_call('slowest_template', 'testapp/edx_ace/testmessage/email/subject.txt')
+        assert [name for name, _ in TEMPLATE_PROFILER.slowest()] == ['testapp/edx_ace/testmessage/email/subject.txt']
+
+        # Deferred fields are profiled when they are rendered.
+        assert rendered.body == 'template body.txt'
+        assert len(TEMPLATE_PROFILER.slowest()) == 2
+
+    @override_settings(ACE_RENDER_TIME_BUDGET=2.5)
+    def test_budget_exceeded(self):
+        with self.assertRaises(RenderTimeBudgetExceeded) as context:
+            self.renderer.render(FileEmailChannel(), self.message)
+
+        assert context.exception.elapsed == 3
+        assert context.exception.template_name == 'testapp/edx_ace/testmessage/email/body.html'
+        assert not TEMPLATE_PROFILER.slowest()
+
+    @override_settings(ACE_RENDER_TIME_BUDGET=5)
+    def test_within_budget(self):
+        with patch.object(self.message, 'report') as mock_report:
+            self.renderer.render(FileEmailChannel(), self.message)
+        mock_report.assert_any_call('render_seconds', 5.0)
+
+
+JINJA2_TEMPLATES = [
+    settings.TEMPLATES[0],
+    {
+        'NAME': 'ace_jinja2',
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [Path(__file__).parent / 'test_jinja2_templates'],
+        'OPTIONS': {'environment': 'edx_ace.jinja2_environment.environment'},
+    },
+]
+
+
+class LinkedFileEmailChannel(FileEmailChannel):
+    def get_action_links(self, omit_unsubscribe_link=False):
+        return [] if omit_unsubscribe_link else [('https://example.com/unsubscribe', 'Unsubscribe')]
+
+
+@override_settings(TEMPLATES=JINJA2_TEMPLATES)
+class TestJinja2Rendering(TestCase):
+    """
+    Tests of rendering messages with the Jinja2 template backend.
+    """
+    def setUp(self):
+        super().setUp()
+        TEMPLATE_CACHE.clear()
+        self.addCleanup(TEMPLATE_CACHE.clear)
+        self.renderer = EmailRenderer()
+        self.channel = LinkedFileEmailChannel()
+
+    def make_message(self, name='testmessage', **options):
+        return Message(
+            app_label='testapp',
+            name=name,
+            recipient=Recipient(lms_user_id=123, email_address='learner@example.com'),
+            context={'course_name': 'Demo & Co'},
+            options=options,
+        )
+
+    def test_django_by_default(self):
+        assert self.renderer.render(self.channel, self.make_message()).subject == 'template subject.txt'
+
+    @override_settings(ACE_TEMPLATE_ENGINE='ace_jinja2')
+    def test_engine_setting(self):
+        rendered = self.renderer.render(self.channel, self.make_message())
+
+        assert rendered.from_name == 'jinja2 Demo &amp; Co'
+        assert rendered.subject == 'jinja2 subject.txt'
+        assert rendered.body_html == '<a href="https://example.com/unsubscribe">Unsubscribe</a>'
+
+    def test_engine_option(self):
+        rendered = self.renderer.render(self.channel, self.make_message(template_engine='ace_jinja2'))
+        assert rendered.subject == 'jinja2 subject.txt'
+        # Templates from each engine are cached separately.
+        assert self.renderer.render(self.channel, self.make_message()).subject == 'template subject.txt'
+
+    def test_single_template_blocks(self):
+        rendered = self.renderer.render(self.channel, self.make_message('singlemessage', template_engine='ace_jinja2'))
+
+        assert rendered == RenderedEmail(
+            from_name='Demo &amp; Co',
+            subject='Welcome to Demo &amp; Co',
+            head_html='<title>Demo &amp; Co</title>',
+            body_html='<p>Hello learner@example.com, Demo &amp; Co</p>',
+            body='Demo &amp; Co body text',
+        )
+
+    def test_bytecode_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Engines are only rebuilt when TEMPLATES changes.
+            with override_settings(ACE_JINJA2_BYTECODE_CACHE_DIR=cache_dir, TEMPLATES=JINJA2_TEMPLATES):
+                self.renderer.render(self.channel, self.make_message(template_engine='ace_jinja2'))
+                assert len(os.listdir(cache_dir)) == 5
@@ -0,0 +1,83 @@
+"""
+Tests of :mod:`edx_ace.transforms`.
+"""
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from edx_ace import presentation
+from edx_ace.channel.file import FileEmailChannel
+from edx_ace.message import Message
+from edx_ace.recipient import Recipient
+from edx_ace.tests.test_renderers import SubjectOnlyChannel
+from edx_ace.transforms import TRANSFORM_CACHE, apply_transforms, minify_html
+
+MINIFIED_FIELDS = {
+    'head_html': ['edx_ace.transforms.minify_html'],
+    'body_html': ['edx_ace.transforms.minify_html'],
+}
+
+
+def shout(text):
+    return text.upper()
+
+
+class TestMinifyHtml(TestCase):
+    """
+    Tests of :func:`.minify_html`.
+    """
+    def test_collapses_whitespace(self):
+        html = '  <p>Hi   there,\n      friend</p>\n\n  <p>Bye</p>  '
+        assert minify_html(html) == '<p>Hi there,\nfriend</p>\n<p>Bye</p>'
+
+    def test_removes_comments(self):
+        assert minify_html('<p>a</p><!-- note\n -->\n<p>b</p>') == '<p>a</p>\n<p>b</p>'
+        conditional = '<!--[if mso]><table><![endif]--><!--[if !mso]><!--><div><!--<![endif]-->'
+        assert minify_html(conditional) == conditional
+
+    def test_preserves_pre(self):
+        html = '<div>\n  <pre>  two  spaces\n    indented</pre>\n  <TEXTAREA rows="2">a  b</TEXTAREA>  </div>'
+        assert minify_html(html) == (
+            '<div>\n<pre>  two  spaces\n    indented</pre>\n<TEXTAREA rows="2">a  b</TEXTAREA> </div>'
+        )
+
+
+class TestPostRenderTransforms(TestCase):
+    """
+    Tests of applying ``ACE_POST_RENDER_TRANSFORMS`` to rendered messages.
+    """
+    def setUp(self):
+        super().setUp()
+        TRANSFORM_CACHE.clear()
+        self.addCleanup(TRANSFORM_CACHE.clear)
+        self.message = Message(
+            app_label='testapp',
+            name='testmessage',
+            recipient=Recipient(lms_user_id=123),
+        )
+
+    def test_not_transformed_by_default(self):
+        rendered = presentation.render(FileEmailChannel(), self.message)
+        assert rendered.body_html == 'template body.html\n\n\n\n\n'
+
+    @override_settings(ACE_POST_RENDER_TRANSFORMS=MINIFIED_FIELDS)
+    def test_transformed(self):
+        rendered = presentation.render(FileEmailChannel(), self.message)
+
+        assert rendered.body_html == 'template body.html'
+        assert rendered.head_html == 'template head.html'
+        assert rendered.body == 'template body.txt'
+
+    @override_settings(ACE_POST_RENDER_TRANSFORMS={'body': [f'{__name__}.shout']})
+    def test_deferred_fields(self):
+        rendered = presentation.render(SubjectOnlyChannel(), self.message)
+        assert 'body' not in vars(rendered)
+        assert rendered.body == 'TEMPLATE BODY.TXT'
+
+    def test_cached_by_text(self):
+        paths = (f'{__name__}.shout',)
+        with patch(f'{__name__}.shout', side_effect=shout) as mock_shout:
+            assert apply_transforms(paths, 'a') == 'A'
+            assert apply_transforms(paths, 'a') == 'A'
+            assert apply_transforms(paths, 'b') == 'B'
+        assert mock_shout.call_count == 2
@@ -0,0 +1,86 @@
+"""
+Tests of :mod:`edx_ace.utils.template_variables`.
+"""
+import jinja2
+
+from django import template
+from django.template import engines
+from django.test import TestCase
+
+from edx_ace.utils.template_variables import template_variables
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def undeclared_tag(context):
+    return context.get('anything')
+
+
+class TestDjangoTemplateVariables(TestCase):
+    """
+    Tests of :func:`.template_variables` with Django templates.
+    """
+    def variables(self, source):
+        engine = engines['django']
+        engine.engine.template_builtins.append(register)
+        try:
+            return template_variables(engine.from_string(source))
+        finally:
+            engine.engine.template_builtins.remove(register)
+
+    def test_variables(self):
+        assert self.variables(
+            '{{ first_name|default:fallback }} {% for course in courses %}{{ course.title }}{% endfor %}'
+            '{% if show_footer and not hidden %}footer{% endif %}'
+        ) == {'first_name', 'fallback', 'courses', 'course', 'show_footer', 'hidden'}
+
+    def test_blocktranslate(self):
+        assert self.variables(
+            '{% load i18n %}{% blocktranslate with name=user.name %}Hi {{ name }} from {{ platform }}'
+            '{% endblocktranslate %}'
+        ) == {'user', 'name', 'platform'}
+
+    def test_message_context(self):
+        assert self.variables('{{ message.context.course_name }} {{ message.recipient.email_address }}') == {
+            'course_name', 'message',
+        }
+        assert self.variables('{{ message.context }}') is None
+        assert self.variables('{{ message }}') is None
+
+    def test_context_tags(self):
+        assert self.variables('{% load acetags %}{% get_action_links channel as links %}') == {
+            'channel', 'omit_unsubscribe_link',
+        }
+        assert self.variables('{% undeclared_tag %}') is None
+
+    def test_include(self):
+        assert self.variables(
+            '{% include "testapp/edx_ace/singlemessage/email/body.txt" with extra=value %}'
+        ) == {'course_name', 'value'}
+        assert self.variables('{% include template_name %}') is None
+
+
+class TestJinja2TemplateVariables(TestCase):
+    """
+    Tests of :func:`.template_variables` with Jinja2 templates.
+    """
+    def variables(self, source, **templates):
+        environment = jinja2.Environment(loader=jinja2.DictLoader(dict(templates, main=source)))
+        return template_variables(environment.get_template('main'))
+
+    def test_variables(self):
+        assert self.variables(
+            '{% set greeting = "Hi" %}{{ greeting }} {{ first_name }}{% for c in courses %}{{ c }}{% endfor %}'
+        ) == {'first_name', 'courses'}
+
+    def test_message_context(self):
+        assert self.variables(
+            "{{ message.context.course_name }} {{ message.context['platform'] }} {{ message.recipient }}"
+        ) == {'course_name', 'platform', 'message'}
+        assert self.variables('{{ message.context }}') is None
+        assert self.variables('{{ f(message) }}') is None
+
+    def test_include(self):
+        assert self.variables('{% include "footer" %}{{ a }}', footer='{{ b }}') == {'a', 'b'}
+        assert self.variables('{% include name %}') is None
@@ -0,0 +1,101 @@
+"""
+:mod:`edx_ace.transforms` contains post-render transforms: functions that take the rendered
+text of a message field and return a new version of it, such as :func:`minify_html`.
+
+Transforms are configured per rendered field with the ``ACE_POST_RENDER_TRANSFORMS`` setting,
+as a list of import paths that are applied in order, for example::
+
+    ACE_POST_RENDER_TRANSFORMS = {
+        'head_html': ['edx_ace.transforms.minify_html'],
+        'body_html': ['edx_ace.transforms.minify_html'],
+    }
+
+Messages often render to the same text (a batch without personalized content, for example), so
+the result of each transform is cached by a hash of its input text. At most
+``ACE_POST_RENDER_CACHE_SIZE`` results are kept, least recently used first out.
+"""
+import functools
+import re
+from hashlib import sha256
+
+import attr
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from edx_ace.renderers import LazyFieldsMixin, LRUCache
+
+DEFAULT_POST_RENDER_CACHE_SIZE = 256
+
+TRANSFORM_CACHE = LRUCache('ACE_POST_RENDER_CACHE_SIZE', DEFAULT_POST_RENDER_CACHE_SIZE)
+
+# Elements whose text is shown (or run) exactly as written.
+_PRESERVED_ELEMENTS = re.compile(r'(<(pre|textarea|script)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+# Comments, apart from the conditional comments that Outlook reads (``<!--[if mso]>``, ``<!-->``, ``<!--<![endif]-->``).
+_COMMENTS = re.compile(r'<!--(?!\[if|<!|>).*?-->', re.DOTALL)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def minify_html(html):
+    """
+    Shrink ``html`` without changing how it displays: comments are removed, and each run of whitespace
+    is collapsed to a single newline (if it contained one) or space. The contents of ``<pre>``,
+    ``<textarea>`` and ``<script>`` elements are left alone.
+
+    Newlines are kept so that lines stay short enough for email transports.
+    """
+    parts = _PRESERVED_ELEMENTS.split(html)
+    minified = []
+    # ``split`` returns the text between preserved elements, then each element and its tag name.
+    for index in range(0, len(parts), 3):
+        text = _COMMENTS.sub('', parts[index])
+        minified.append(_WHITESPACE.sub(_collapse, text))
+        if index + 1 < len(parts):
+            minified.append(parts[index + 1])
+    return ''.join(minified).strip()
+
+
+def _collapse(match):
+    return '\n' if '\n' in match.group() else ' '
+
+
+def post_render_transforms():
+    """
+    Returns: dict
+        The transforms configured by ``ACE_POST_RENDER_TRANSFORMS``, as a tuple of import paths
+        for each field that has any.
+    """
+    configured = getattr(settings, 'ACE_POST_RENDER_TRANSFORMS', None) or {}
+    return {field: tuple(paths) for field, paths in configured.items() if paths}
+
+
+def transform_rendered(rendered):
+    """
+    Apply the configured transforms to the fields of ``rendered``, a rendered message.
+    Fields whose rendering is deferred are transformed when they are rendered.
+    """
+    for field, paths in post_render_transforms().items():
+        if isinstance(rendered, LazyFieldsMixin) and field in attr.fields_dict(type(rendered)):
+            rendered.transform_field(field, functools.partial(apply_transforms, paths))
+    return rendered
+
+
+def apply_transforms(paths, text):
+    """
+    Arguments:
+        paths (tuple): Import paths of the transforms to apply, in order.
+        text (str): The rendered text of a field.
+
+    Returns: str
+        The transformed text.
+    """
+    if not isinstance(text, str):
+        return text
+    key = (paths, sha256(text.encode('utf-8')).hexdigest())
+    transformed = TRANSFORM_CACHE.get(key)
+    if transformed is None:
+        transformed = text
+        for path in paths:
+            transformed = import_string(path)(transformed)
+        TRANSFORM_CACHE.put(key, transformed)
+    return transformed
@@ -0,0 +1,203 @@
+"""
+:mod:`edx_ace.utils.template_variables` finds the context variables that a template reads,
+so that context the templates never use can be left out of a message.
+
+The analysis is conservative: when a template does something whose context use can't be
+worked out statically (a template tag that takes the whole context, an ``{% include %}`` of a
+variable template name, passing ``message.context`` around as a whole, ...), the result is
+``None``, meaning "any variable may be read".
+
+Template tags that take the context can declare the variables they read by setting an
+``ace_context_keys`` attribute on the tag function (or ``Node`` class)::
+
+    @register.simple_tag(takes_context=True)
+    def greeting(context):
+        return f"Hi {context['first_name']}"
+
+    greeting.ace_context_keys = ('first_name',)
+"""
+from django.template import Template
+from django.template.base import FilterExpression, Node, Token, TokenType, Variable
+from django.template.library import InclusionNode, SimpleNode
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from django.template.smartif import TokenBase
+
+# The render context variable that gives templates access to the whole message.
+MESSAGE_VARIABLE = 'message'
+
+# Modules whose template nodes only read the variables that appear in their arguments.
+_BUILTIN_NODE_MODULES = ('django.template.', 'django.templatetags.', 'edx_ace.templatetags.')
+
+
+class UnknownVariables(Exception):
+    """
+    Raised during the analysis of a template that may read variables that can't be found statically.
+    """
+
+
+def template_variables(template):
+    """
+    Arguments:
+        template: A compiled template from the Django or Jinja2 template backend.
+
+    Returns: frozenset
+        The names of the top-level context variables that ``template`` (and any template it extends or includes)
+        may read, including the keys of ``message.context`` it reads through ``message``.
+        ``None`` if that can't be determined.
+    """
+    compiled = getattr(template, 'template', template)
+    try:
+        if isinstance(compiled, Template):
+            return frozenset(_django_variables(compiled, set()))
+        if hasattr(compiled, 'environment'):
+            return frozenset(_jinja2_variables(compiled.environment, compiled.name, set()))
+    except UnknownVariables:
+        return None
+    return None
+
+
+def _django_variables(template, seen):
+    """
+    The variables read by a Django template and the templates it extends or includes, skipping those in ``seen``.
+    """
+    if template.name in seen:
+        return set()
+    seen.add(template.name)
+
+    names = set()
+    for node in template.nodelist.get_nodes_by_type(Node):
+        names.update(_node_variables(node))
+        if isinstance(node, ExtendsNode):
+            names.update(_django_variables(_constant_template(template, node.parent_name), seen))
+        elif isinstance(node, IncludeNode):
+            names.update(_django_variables(_constant_template(template, node.template), seen))
+    return names
+
+
+def _constant_template(template, name_expression):
+    """
+    Returns the template named by ``name_expression`` if it is a string literal.
+    """
+    name = getattr(name_expression, 'var', None)
+    if not isinstance(name, str):
+        raise UnknownVariables(f'{template.name} extends or includes a template chosen at render time')
+    return template.engine.get_template(name)
+
+
+def _node_variables(node):
+    """
+    The variables read by the arguments of a single node (not by the nodes nested inside it).
+    """
+    declared = getattr(node, 'ace_context_keys', None)
+    if isinstance(node, (SimpleNode, InclusionNode)) and node.takes_context:
+        declared = getattr(node.func, 'ace_context_keys', None)
+        if declared is None:
+            raise UnknownVariables(f'{node.func.__name__} takes the context without declaring ace_context_keys')
+    elif declared is None and not type(node).__module__.startswith(_BUILTIN_NODE_MODULES):
+        raise UnknownVariables(f'{type(node).__name__} may read any context variable')
+
+    names = set(declared or ())
+    for attribute, value in vars(node).items():
+        if attribute not in ('token', 'origin') and attribute not in node.child_nodelists:
+            _collect(value, names)
+    return names
+
+
+def _collect(value, names):
+    """
+    Add the variables read by ``value``, a part of a parsed Django template node, to ``names``.
+    """
+    if isinstance(value, Variable):
+        if value.lookups:
+            names.update(_lookup_variables(value.lookups))
+    elif isinstance(value, Token):
+        # ``{% blocktranslate %}`` keeps its text, including ``{{ name }}`` placeholders, as tokens.
+        if value.token_type == TokenType.VAR:
+            names.add(value.contents)
+    else:
+        for part in _parts(value):
+            _collect(part, names)
+
+
+def _parts(value):
+    """
+    Returns: list
+        The parts of ``value`` that may read variables, when it is a filter expression, an ``{% if %}``
+        condition or a container of such parts.
+    """
+    if isinstance(value, FilterExpression):
+        return [value.var] + [argument for _filter, arguments in value.filters for _lookup, argument in arguments]
+    if isinstance(value, TokenBase):
+        # ``{% if %}`` conditions.
+        return [getattr(value, part, None) for part in ('first', 'second', 'value')]
+    if isinstance(value, dict):
+        return list(value.values())
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return []
+
+
+def _lookup_variables(lookups):
+    """
+    The top-level variables read by a variable lookup such as ``course.name`` or ``message.context.course``.
+    """
+    if lookups[0] != MESSAGE_VARIABLE:
+        return [lookups[0]]
+    if len(lookups) == 1 or (lookups[1] == 'context' and len(lookups) == 2):
+        raise UnknownVariables('message.context is used as a whole')
+    if lookups[1] == 'context':
+        return [lookups[2]]
+    return [MESSAGE_VARIABLE]
+
+
+def _jinja2_variables(environment, name, seen):
+    """
+    The variables read by the Jinja2 template ``name`` and the templates it references, skipping those in ``seen``.
+    """
+    from jinja2 import meta, nodes  # pylint: disable=import-outside-toplevel
+
+    if name in seen:
+        return set()
+    seen.add(name)
+
+    source, _filename, _uptodate = environment.loader.get_source(environment, name)
+    ast = environment.parse(source)
+    names = set(meta.find_undeclared_variables(ast))
+
+    if MESSAGE_VARIABLE in names:
+        # Only ``message.<attribute>`` and ``message.context.<key>`` (or ``message.context['<key>']``) are understood.
+        message_nodes = [node for node in ast.find_all(nodes.Name) if node.name == MESSAGE_VARIABLE]
+        attributes = [
+            node for node in ast.find_all((nodes.Getattr, nodes.Getitem))
+            if any(node.node is message for message in message_nodes)
+        ]
+        if len(attributes) != len(message_nodes):
+            raise UnknownVariables(f'{name} uses message as a whole')
+        for attribute in attributes:
+            if _jinja2_key(attribute) == 'context':
+                keys = [
+                    _jinja2_key(node) for node in ast.find_all((nodes.Getattr, nodes.Getitem))
+                    if node.node is attribute
+                ]
+                if len(keys) != 1 or keys[0] is None:
+                    raise UnknownVariables(f'{name} uses message.context as a whole')
+                names.add(keys[0])
+
+    for referenced in meta.find_referenced_templates(ast):
+        if referenced is None:
+            raise UnknownVariables(f'{name} extends or includes a template chosen at render time')
+        names.update(_jinja2_variables(environment, referenced, seen))
+    return names
+
+
+def _jinja2_key(node):
+    """
+    The attribute or constant string key that a Jinja2 ``Getattr`` or ``Getitem`` node looks up, or ``None``.
+    """
+    from jinja2 import nodes  # pylint: disable=import-outside-toplevel
+
+    if hasattr(node, 'attr'):
+        return node.attr
+    if isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, str):
+        return node.arg.value
+    return None
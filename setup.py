@@ -143,6 +143,8 @@ setup(
     extras_require={
         'sailthru':  ["sailthru-client>2.2,<2.3"],
         'push_notifications':  ["django-push-notifications[FCM]"],
+        'jinja2':  ["jinja2"],
+        'async':  ["httpx"],
     },
     license="AGPL 3.0",
     zip_safe=False,